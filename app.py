@@ -1,26 +1,67 @@
 from fastapi import FastAPI, HTTPException, Depends, Query, UploadFile, File, Path
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from typing import List, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Date, Float
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import Boolean, Column, Integer, LargeBinary, String, Date, DateTime, Float, ForeignKey, Index, JSON, inspect, or_, delete, false, func, insert, select, text, true, update
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from datetime import datetime, timedelta
 from typing import List, Optional
 from datetime import date
+import base64
 import csv
+import io
+import json
 import logging
+import os
+import zlib
+
+import anyio
+
+from database import DATABASE_URL, add_missing_columns, build_async_engine, build_engine, rebuild_table
+from invalidation import GenerationCounter
+from rearrangement import StoredItem, plan_rearrangements
+from placement import CONTAINER_ORDERS, PackContainer, PackItem, box_to_position, plan_placements, position_to_box
+from spatial_index import OccupancyIndex, volume as box_volume
+from return_planner import WasteCandidate, solve_return_plan
+from csv_import import stream_import
+from audit_log import AuditLogWriter
+from catalog_cache import Catalog, snapshot
+from bulk_ingest import bulk_insert, key_chunk_size
+from expiry_schedule import ExpirySchedule
+from name_index import NameIndex
+from zone_index import ZoneIndex
+from station_model import StationModel
+from simulation import NEVER, NO_EXPIRY, NO_LIMIT, simulate_days
+from scenarios import fork_station, run_scenarios
+from metrics import Metrics, MetricsMiddleware, instrument_engine
+from mission_log import ADDED, DELETED, EXPIRY, UNDOCKED, USAGE, MissionState, added_details, event_row, replay
+import numpy as np
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
-DATABASE_URL = "sqlite:///./test.db"  # Consider environment variables for production
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class StationSession(Session):
+    """Sessions on the station database; their writes bump the generation counter."""
+
+
+engine = build_engine(DATABASE_URL)  # Configured from the environment, see database.py
+SessionLocal = sessionmaker(class_=StationSession, autocommit=False, autoflush=False, bind=engine)
+async_engine = build_async_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, sync_session_class=StationSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+# Per-route latency and SQL statement counts, served at /metrics
+metrics = Metrics(query_warn_threshold=int(os.getenv("METRICS_QUERY_WARN_THRESHOLD", "50")))
+instrument_engine(engine, metrics)
+instrument_engine(async_engine.sync_engine, metrics)
+
 
 class Item(Base):
     __tablename__ = "items"
@@ -33,8 +74,16 @@ class Item(Base):
     mass = Column(Float, nullable=False)  # Use Float for mass
     priority = Column(Integer, index=True, nullable=False)
     expiryDate = Column(Date)
-    usageLimit = Column(Integer, nullable=False, default=0)  # Default usage
+    usageLimit = Column(Integer)  # None: no limit on uses
     preferredZone = Column(String, nullable=False)
+    # Expired or out of uses; set by retrieve, simulation and the daily expiry sweep
+    is_waste = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    __table_args__ = (
+        # Partial indexes: waste listing reads only waste rows, the expiry sweep only live ones
+        Index("ix_items_waste", "id", sqlite_where=is_waste == true(), postgresql_where=is_waste == true()),
+        Index("ix_items_live_expiry", "expiryDate", sqlite_where=is_waste == false(), postgresql_where=is_waste == false()),
+    )
 
 
 class Container(Base):
@@ -45,12 +94,524 @@ class Container(Base):
     width = Column(Integer, nullable=False)
     depth = Column(Integer, nullable=False)
     height = Column(Integer, nullable=False)
+    # Set once the container's undocking is completed; it takes no new placements
+    is_undocking = Column(Boolean, nullable=False, default=False, server_default=false())
+
+
+class ItemPlacement(Base):
+    __tablename__ = "item_placements"
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    container_id = Column(Integer, ForeignKey("containers.id"), nullable=False)
+    # Box corners, end exclusive; see placement.box_to_position
+    start_width = Column(Integer, nullable=False)
+    start_depth = Column(Integer, nullable=False)
+    start_height = Column(Integer, nullable=False)
+    end_width = Column(Integer, nullable=False)
+    end_depth = Column(Integer, nullable=False)
+    end_height = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # An item is in at most one place; also serves the item_id foreign key
+        Index("ux_item_placements_item", "item_id", unique=True),
+        # Covers a container's whole layout (occupancy loads, undocking, export by
+        # container) without touching the table; also serves the container_id foreign key
+        Index("ix_item_placements_container_coords", "container_id", "start_width", "start_depth",
+              "start_height", "end_width", "end_depth", "end_height", "item_id"),
+    )
+
+    @property
+    def box(self) -> tuple:
+        return (self.start_width, self.start_depth, self.start_height,
+                self.end_width, self.end_depth, self.end_height)
+
+    @property
+    def position(self) -> dict:
+        return box_to_position(self.box)
+
+
+# Box columns in placement order, for selecting coordinates without loading rows
+PLACEMENT_BOX = (
+    ItemPlacement.start_width, ItemPlacement.start_depth, ItemPlacement.start_height,
+    ItemPlacement.end_width, ItemPlacement.end_depth, ItemPlacement.end_height,
+)
+
+
+def placement_columns(box) -> dict:
+    return {column.key: int(value) for column, value in zip(PLACEMENT_BOX, box)}
+
+
+class Log(Base):
+    __tablename__ = "logs"
+    id = Column(Integer, primary_key=True, index=True)
+    timestamp = Column(DateTime, nullable=False, default=datetime.now)
+    user_id = Column("userId", String)
+    action_type = Column("actionType", String, nullable=False)
+    item_id = Column("itemId", String)
+    container_id = Column("containerId", String)
+    details = Column(JSON)
+
+    # One composite index per filter the /api/logs endpoint supports, each
+    # ending in (timestamp, id) so filtered pages come back in keyset order.
+    __table_args__ = (
+        Index("ix_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_logs_itemId_timestamp_id", "itemId", "timestamp", "id"),
+        Index("ix_logs_userId_timestamp_id", "userId", "timestamp", "id"),
+        Index("ix_logs_actionType_timestamp_id", "actionType", "timestamp", "id"),
+    )
+
+
+class MissionClock(Base):
+    __tablename__ = "mission_clock"
+    id = Column(Integer, primary_key=True)  # single row, id 1
+    day = Column(Date, nullable=False)
+
+
+class StationGeneration(Base):
+    """Bumped by every commit that writes items, containers or placements, see invalidation.py."""
+    __tablename__ = "station_generation"
+    id = Column(Integer, primary_key=True)  # single row, id 1
+    value = Column(Integer, nullable=False)
+
+
+# Other worker processes notice this process's writes through the counter, and it theirs
+generation = GenerationCounter(
+    StationGeneration.__table__,
+    (Item.__tablename__, Container.__tablename__, ItemPlacement.__tablename__)
+)
+generation.install(StationSession)
+
+
+class SimulationEvent(Base):
+    """Append-only log of simulated state changes, see mission_log.py."""
+    __tablename__ = "simulation_events"
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    event_type = Column("eventType", String, nullable=False)
+    item_id = Column("itemId", String, nullable=False, index=True)
+    uses = Column(Integer)
+    details = Column(JSON)
+
+
+class SimulationSnapshot(Base):
+    __tablename__ = "simulation_snapshots"
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, nullable=False, index=True)  # last event included in the state
+    day = Column(Date, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    state = Column(LargeBinary, nullable=False)  # MissionState.to_bytes()
 
 
 Base.metadata.create_all(bind=engine)
+if "is_waste" in add_missing_columns(engine, Item.__table__):
+    with engine.begin() as conn:
+        conn.execute(update(Item).where(Item.usageLimit == 0).values(is_waste=True))
+add_missing_columns(engine, Container.__table__)
+
+
+def migrate_usage_limit():
+    """Drop the old NOT NULL on items.usageLimit, which rejected every item without a limit."""
+    usage = next(c for c in inspect(engine).get_columns("items") if c["name"] == "usageLimit")
+    if usage["nullable"]:
+        return
+    if engine.dialect.name == "sqlite":
+        rebuild_table(engine, Item.__table__)
+    else:
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE items ALTER COLUMN "usageLimit" DROP NOT NULL'))
+    logging.info("Made items.usageLimit nullable")
+
+
+migrate_usage_limit()
+
+
+def legacy_log_row(row: dict) -> dict:
+    """Log column values for a row of the old logs table, whose timestamp and details are text."""
+    details = row["details"]
+    if isinstance(details, str):
+        try:
+            details = json.loads(details)
+        except ValueError:
+            details = {"text": details}
+    try:
+        timestamp = datetime.fromisoformat(str(row["timestamp"]).strip().replace("Z", "+00:00"))
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)  # stored as naive local time, like new entries
+    except ValueError:
+        # Kept, first in time order, with the original text in its details
+        logging.warning(f"Log entry {row['id']} has an unreadable timestamp {row['timestamp']!r}")
+        details = {"details": details, "originalTimestamp": row["timestamp"]}
+        timestamp = datetime.min
+    return {
+        "id": row["id"],
+        "timestamp": timestamp,
+        "userId": row["userId"],
+        "actionType": row["actionType"],
+        "itemId": row["itemId"],
+        "containerId": row.get("containerId"),
+        "details": details if details is not None else {},
+    }
+
+
+def migrate_legacy_logs():
+    """Rebuild a logs table from before the Log model: VARCHAR timestamps, no containerId column."""
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns("logs")}
+    if "containerId" in columns and isinstance(columns.get("timestamp"), DateTime):
+        return
+    copied = rebuild_table(engine, Log.__table__, legacy_log_row)
+    logging.info(f"Migrated {copied} log entries to timestamp columns")
+
+
+migrate_legacy_logs()
+for index in [*Log.__table__.indexes, *Item.__table__.indexes, *ItemPlacement.__table__.indexes]:
+    index.create(bind=engine, checkfirst=True)  # create_all skips indexes of existing tables
+
+# Snapshot the simulation state once this many events have been logged since the last one
+SNAPSHOT_EVERY_EVENTS = int(os.getenv("SIMULATION_SNAPSHOT_EVERY", "5000"))
+
+
+def mission_day(db: Session) -> date:
+    return db.execute(select(MissionClock.day).where(MissionClock.id == 1)).scalar_one()
+
+
+async def mission_day_async(db: AsyncSession) -> date:
+    return (await db.execute(select(MissionClock.day).where(MissionClock.id == 1))).scalar_one()
+
+
+def log_events(db: Session, rows: List[dict]):
+    """Append simulation events in the caller's transaction."""
+    if rows:
+        db.execute(insert(SimulationEvent.__table__), rows)
+
+
+def take_snapshot(db: Session) -> SimulationSnapshot:
+    """Snapshot the current item state; the caller commits."""
+    last_event = db.execute(select(func.max(SimulationEvent.id))).scalar() or 0
+    state = MissionState(mission_day(db), last_event)
+    for item_id, expiry, usage, waste in db.execute(
+        select(Item.itemId, Item.expiryDate, Item.usageLimit, Item.is_waste).execution_options(yield_per=10000)
+    ):
+        state.items[item_id] = [expiry.toordinal() if expiry else None, usage, bool(waste)]
+    snapshot = SimulationSnapshot(event_id=last_event, day=state.day, state=state.to_bytes())
+    db.add(snapshot)
+    return snapshot
+
+
+def load_mission_state(db: Session, day: Optional[date] = None, event_id: Optional[int] = None):
+    """
+    State after `event_id`, or at the end of mission day `day`, or now: the
+    nearest earlier snapshot plus the events logged after it.
+    Returns (state, snapshot event id, events replayed), or None before the first snapshot.
+    """
+    target = event_id
+    if target is None:
+        latest = select(func.max(SimulationEvent.id))
+        if day is not None:
+            latest = latest.where(SimulationEvent.day <= day)
+        target = db.execute(latest).scalar() or 0
+    snapshot = db.execute(
+        select(SimulationSnapshot)
+        .where(SimulationSnapshot.event_id <= target)
+        .order_by(SimulationSnapshot.event_id.desc(), SimulationSnapshot.id.desc())
+        .limit(1)
+    ).scalars().first()
+    if snapshot is None or (day is not None and snapshot.day > day):
+        return None
+    state = MissionState.from_bytes(snapshot.state)
+    events = db.execute(
+        select(SimulationEvent.id, SimulationEvent.day, SimulationEvent.event_type, SimulationEvent.item_id,
+               SimulationEvent.uses, SimulationEvent.details)
+        .where(SimulationEvent.id > snapshot.event_id, SimulationEvent.id <= target)
+        .order_by(SimulationEvent.id)
+        .execution_options(yield_per=10000)
+    )
+    replayed = target - snapshot.event_id
+    return replay(state, events), snapshot.event_id, replayed
+
+
+# The clock starts at today's date; the first snapshot is the baseline every replay starts from
+with SessionLocal() as db:
+    if db.get(MissionClock, 1) is None:
+        db.add(MissionClock(id=1, day=datetime.now().date()))
+        db.flush()
+    if db.get(StationGeneration, 1) is None:
+        db.add(StationGeneration(id=1, value=0))
+    if db.execute(select(SimulationSnapshot.id).limit(1)).first() is None:
+        take_snapshot(db)
+    db.commit()
+
+# Audit rows are written in batches off the request path; AUDIT_LOG_SYNC=1 writes them inline
+audit_log = AuditLogWriter(
+    SessionLocal,
+    Log,
+    flush_interval=float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "0.5")),
+    batch_size=int(os.getenv("AUDIT_LOG_BATCH_SIZE", "500")),
+    synchronous=os.getenv("AUDIT_LOG_SYNC", "0") == "1"
+)
+
+
+def load_container_occupancy(container_id: str):
+    """
+    Loader for the occupancy index: container dimensions plus the boxes of
+    every item currently placed in it.
+    """
+    db = SessionLocal()
+    try:
+        container = db.query(Container).filter(Container.containerId == container_id).first()
+        if not container:
+            return None
+        rows = db.execute(
+            select(Item.itemId, *PLACEMENT_BOX)
+            .join(ItemPlacement, ItemPlacement.item_id == Item.id)
+            .where(ItemPlacement.container_id == container.id)
+        ).all()
+        placed = [(row[0], tuple(row[1:])) for row in rows]
+        return (container.width, container.depth, container.height), placed
+    finally:
+        db.close()
+
+
+def load_container_occupancies(container_ids: List[str]) -> dict:
+    """Bulk loader for the occupancy index: the same for many containers, one query per chunk of ids."""
+    db = SessionLocal()
+    try:
+        loaded = {}
+        size = key_chunk_size(db)
+        for start in range(0, len(container_ids), size):
+            rows = db.execute(
+                select(Container.containerId, Container.width, Container.depth, Container.height, Item.itemId, *PLACEMENT_BOX)
+                .outerjoin(ItemPlacement, ItemPlacement.container_id == Container.id)
+                .outerjoin(Item, Item.id == ItemPlacement.item_id)
+                .where(Container.containerId.in_(container_ids[start:start + size]))
+            )
+            for container_id, width, depth, height, item_id, *box in rows:
+                _, placed = loaded.setdefault(container_id, ((width, depth, height), []))
+                if item_id is not None:
+                    placed.append((item_id, tuple(box)))
+        return loaded
+    finally:
+        db.close()
+
+
+# In-memory R-tree and blocks-access graph per container, kept in sync with item_placements
+occupancy = OccupancyIndex(load_container_occupancy, load_container_occupancies)
+
+
+def load_zone_containers():
+    """Loader for the zone index: every container that is not being undocked."""
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(Container.containerId, Container.zone, Container.width, Container.depth, Container.height)
+            .where(Container.is_undocking == false())
+        ).all()
+    finally:
+        db.close()
+
+
+# Containers by zone, ordered by free volume, with free-box bounds for pruning placement candidates
+zone_index = ZoneIndex(load_zone_containers, occupancy)
+
+def load_item_names():
+    """Loader for the name index: (itemId, name) of every item, streamed."""
+    db = SessionLocal()
+    try:
+        yield from db.execute(select(Item.itemId, Item.name).execution_options(yield_per=10000))
+    finally:
+        db.close()
+
+
+# Prefix/substring/fuzzy index over item names, kept in sync by the item write endpoints
+name_index = NameIndex(load_item_names)
+
+
+def load_station_rows(item_ids=None):
+    """Loader for the station model: every item (or the given ones) with its placement, streamed."""
+    statement = (
+        select(
+            Item.id, Item.itemId, Item.name, Item.width, Item.depth, Item.height, Item.mass, Item.priority,
+            Item.expiryDate, Item.usageLimit, Item.preferredZone, Item.is_waste, Container.containerId, *PLACEMENT_BOX
+        )
+        .outerjoin(ItemPlacement, ItemPlacement.item_id == Item.id)
+        .outerjoin(Container, Container.id == ItemPlacement.container_id)
+    )
+    db = SessionLocal()
+    try:
+        if item_ids is None:
+            yield from db.execute(statement.execution_options(yield_per=10000))
+        else:
+            yield from rows_for_items(db, statement, item_ids)
+    finally:
+        db.close()
+
+
+# Columnar copy of the items and their placements for vectorized scans, kept in sync like the catalog
+station = StationModel(load_station_rows)
+
+def load_item_expiries():
+    """Loader for the expiry schedule: items that can still expire."""
+    db = SessionLocal()
+    try:
+        yield from db.execute(
+            select(Item.itemId, Item.expiryDate)
+            .where(Item.is_waste == false(), Item.expiryDate.isnot(None))
+            .execution_options(yield_per=10000)
+        )
+    finally:
+        db.close()
+
+
+# Live items by expiry date, so time queries pop only the items that expire
+expiry_schedule = ExpirySchedule(load_item_expiries)
+
+# Read-only snapshots of items/containers by their public id; writers invalidate after commit
+catalog = Catalog(
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "300"))
+)
+
+
+def get_item_record(db: Session, item_id: str):
+    generation = catalog.items.generation
+    record = catalog.items.get(item_id)
+    if record is None:
+        row = db.query(Item).filter(Item.itemId == item_id).first()
+        if row is not None:
+            record = snapshot(row)
+            catalog.items.put(item_id, record, generation)
+    return record
+
+
+def get_container_record(db: Session, container_id: str):
+    generation = catalog.containers.generation
+    record = catalog.containers.get(container_id)
+    if record is None:
+        row = db.query(Container).filter(Container.containerId == container_id).first()
+        if row is not None:
+            record = snapshot(row)
+            catalog.containers.put(container_id, record, generation)
+    return record
+
+
+async def get_item_record_async(db: AsyncSession, item_id: str):
+    generation = catalog.items.generation
+    record = catalog.items.get(item_id)
+    if record is None:
+        row = (await db.execute(select(Item).where(Item.itemId == item_id))).scalars().first()
+        if row is not None:
+            record = snapshot(row)
+            catalog.items.put(item_id, record, generation)
+    return record
+
+
+def plan_retrieval(container_id: str, target_ids):
+    """
+    Items to take out of a container to reach `target_ids`, front to back,
+    plus the subsets that are targets and blockers.
+    """
+    occ = occupancy.get(container_id)
+    if occ is None:
+        return [], set(), set()
+    targets = {t for t in target_ids if t in occ}
+    blockers = occ.blockers_of(targets)
+    return occ.removal_order(targets | blockers), targets, blockers
+
+
+def build_retrieval_steps(db: Session, container_id: str, target_ids, start_step: int = 1) -> List[dict]:
+    """
+    Steps to pull `target_ids` out of a container: every item in front of
+    them is removed (front to back), the targets are retrieved, and the
+    blockers are placed back in reverse order.
+    """
+    order, targets, blockers = plan_retrieval(container_id, target_ids)
+    names = dict(db.query(Item.itemId, Item.name).filter(Item.itemId.in_(order)).all()) if order else {}
+    return format_retrieval_steps(order, targets, blockers, names, start_step)
+
+
+async def build_retrieval_steps_async(db: AsyncSession, container_id: str, target_ids, start_step: int = 1) -> List[dict]:
+    # A cold container is loaded from the database, so plan off the event loop
+    order, targets, blockers = await run_in_threadpool(plan_retrieval, container_id, target_ids)
+    names = {}
+    if order:
+        names = dict((await db.execute(select(Item.itemId, Item.name).where(Item.itemId.in_(order)))).all())
+    return format_retrieval_steps(order, targets, blockers, names, start_step)
+
+
+def format_retrieval_steps(order, targets, blockers, names: dict, start_step: int = 1) -> List[dict]:
+    steps = []
+    for item_id in order:
+        action = "retrieve" if item_id in targets else "remove"
+        steps.append({"step": start_step + len(steps), "action": action, "itemId": item_id, "itemName": names.get(item_id)})
+    for item_id in reversed(order):
+        if item_id in blockers:
+            steps.append({"step": start_step + len(steps), "action": "placeBack", "itemId": item_id, "itemName": names.get(item_id)})
+    return steps
+
+
+# The in-memory indexes hold their locks while they load from the database,
+# so async endpoints call these through run_in_threadpool.
+def items_added(rows: List[dict]):
+    """Index new items from their committed column values."""
+    item_ids = [row["itemId"] for row in rows]
+    catalog.items.invalidate(item_ids)
+    station.invalidate(item_ids)
+    for row in rows:
+        name_index.add(row["itemId"], row["name"])
+        if not row["is_waste"]:
+            expiry_schedule.add(row["itemId"], row.get("expiryDate"))
+
+
+def forget_item(item_id: str):
+    """Drop a deleted item from the in-memory indexes."""
+    catalog.items.invalidate([item_id])
+    station.invalidate([item_id])
+    name_index.remove(item_id)
+    expiry_schedule.remove([item_id])
+    occupancy.remove(item_id)
+
+
+def forget_container(container_id: str):
+    """Drop a deleted container, and the placements it held, from the in-memory indexes."""
+    catalog.containers.invalidate([container_id])
+    zone_index.clear()
+    station.invalidate_container(container_id)
+    occupancy.drop_container(container_id)
+
+
+def item_retrieved(item_id: str, used_up: bool):
+    """The item left its container; `used_up` if that was its last use."""
+    catalog.items.invalidate([item_id])
+    station.invalidate([item_id])
+    if used_up:
+        expiry_schedule.remove([item_id])  # Now waste
+    occupancy.remove(item_id)
+
+
+def drop_indexes():
+    """Another process wrote: forget everything, each index reloads on next use."""
+    catalog.clear()
+    occupancy.clear()
+    zone_index.clear()
+    station.clear()
+    name_index.clear()
+    expiry_schedule.clear()
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+def configure_threadpool():
+    # Sync endpoints (imports, export, placement, simulation) run on this pool;
+    # the async read paths never wait for a slot in it.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("THREADPOOL_SIZE", "64"))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await run_in_threadpool(audit_log.stop)
+    await async_engine.dispose()
+
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -60,8 +621,21 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def sync_with_other_workers(request, call_next):
+    async with async_engine.connect() as conn:
+        value = (await conn.execute(generation.current())).scalar_one()
+    if generation.sync(value):
+        await run_in_threadpool(drop_indexes)
+    return await call_next(request)
+
+
 
 # Dependency
+#
+# Endpoints either take `get_async_db` and are `async def` end to end, or take
+# `get_db` and are plain `def`, which FastAPI runs in the thread pool. Blocking
+# calls must never be made from an `async def` endpoint.
 def get_db():
     db = SessionLocal()
     try:
@@ -73,11 +647,23 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
 @app.get("/")
-def home():
+async def home():
     return {"message": "Space Cargo API is running!", "frontend": "/static/index.html"}
 
 
+REARRANGEMENT_TIME_BUDGET_MS = int(os.getenv("REARRANGEMENT_TIME_BUDGET_MS", "1000"))
+
+
 # API Models
 class ItemSchema(BaseModel):
     itemId: str = Field(..., example="item001")
@@ -88,7 +674,7 @@ class ItemSchema(BaseModel):
     mass: float = Field(..., example=0.5)
     priority: int = Field(..., example=1)
     expiryDate: Optional[date] = Field(None, example="2025-12-25")
-    usageLimit: Optional[int] = Field(default=None, example=50)  # ✅ This line
+    usageLimit: Optional[int] = Field(default=None, ge=0, example=50)  # None: no limit on uses
     preferredZone: str = Field(..., example="ZoneA")
 
 
@@ -103,6 +689,8 @@ class ContainerSchema(BaseModel):
 class PlacementRequest(BaseModel):
     items: List[ItemSchema]
     containers: Optional[List[ContainerSchema]] = Field(default=None, example=[])
+    rearrange: bool = Field(True)  # move lower-priority items to fit items outside their preferred zone
+    timeBudgetMs: Optional[int] = Field(REARRANGEMENT_TIME_BUDGET_MS, example=1000)
 
 
 class PlacementResponse(BaseModel):
@@ -118,6 +706,12 @@ class SearchResponse(BaseModel):
     retrievalSteps: Optional[List[dict]]
 
 
+class NameSearchResponse(BaseModel):
+    success: bool
+    total: int
+    results: List[dict]
+
+
 class RetrieveRequest(BaseModel):
     itemId: str = Field(..., example="item001")
     userId: Optional[str] = Field(None, example="astronaut1")
@@ -145,6 +739,9 @@ class WasteReturnPlanRequest(BaseModel):
     undockingContainerId: str = Field(..., example="container001")
     undockingDate: str = Field(..., example="2025-04-01")
     maxWeight: Optional[float] = Field(None, example=100.0)
+    objective: Optional[str] = Field("volume", example="volume")  # "volume" or "mass" freed
+    retrievalCostWeight: Optional[float] = Field(0.1, example=0.1)  # penalty per blocking item moved
+    timeBudgetMs: Optional[int] = Field(500, example=500)
 
 
 class WasteReturnPlanResponse(BaseModel):
@@ -152,11 +749,13 @@ class WasteReturnPlanResponse(BaseModel):
     returnPlan: Optional[List[dict]] = None
     retrievalSteps: Optional[List[dict]] = None
     returnManifest: Optional[dict] = None
+    optimal: Optional[bool] = None  # False when the solver ran out of time budget
 
 
 class CompleteUndockingRequest(BaseModel):
     undockingContainerId: str = Field(..., example="container001")
     timestamp: Optional[str] = Field(None, example="2025-04-02T12:00:00")
+    itemIds: Optional[List[str]] = Field(None, example=["item004"])  # return plan items stowed elsewhere
 
 
 class ApiResponse(BaseModel):
@@ -175,13 +774,28 @@ class TimeSimulationResponse(BaseModel):
     changes: dict = Field(..., example={"itemsUsed": [{"itemId": "item002", "name": "Test Item", "remainingUses": 49}], "itemsExpired": [], "itemsDepletedToday": []})
 
 
+class ScenarioSpec(BaseModel):
+    name: str = Field(..., example="double usage")
+    numOfDays: int = Field(0, ge=0, example=30)
+    itemsToBeUsedPerDay: List[dict] = Field(default_factory=list, example=[{"itemId": "item002"}])
+    resupply: List[ItemSchema] = Field(default_factory=list)  # items to stow after the window
+    placementStrategy: str = Field("emptiest", example="fullest")  # see placement.CONTAINER_ORDERS
+    undocking: Optional[dict] = Field(None, example={"undockingContainerId": "contA", "maxWeight": 100.0})
+
+
+class ScenarioRequest(BaseModel):
+    scenarios: List[ScenarioSpec] = Field(..., min_length=1)
+    workers: Optional[int] = Field(None, ge=1)
+
+
 class ImportResponse(BaseModel):
     success: bool
     itemsImported: int = Field(..., example=10)
     errors: Optional[List[dict]] = Field(
         default=None,
-        example=[{"row": {"itemId": "bad_id"}, "message": "Invalid data"}]
+        example=[{"line": 2, "row": {"itemId": "bad_id"}, "message": "Invalid data"}]
     )
+    rowsPerSecond: Optional[float] = Field(default=None, example=25000.0)
 
 class ConfirmPlacementRequest(BaseModel):
     itemId: str = Field(..., example="item001")
@@ -209,36 +823,40 @@ from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 
 @app.post("/api/containers")
-def add_containers(containers: List[ContainerSchema], db: Session = Depends(get_db)):
+def add_containers(
+    containers: List[ContainerSchema],
+    partial: bool = Query(False, description="Insert the new containers and report the conflicting ones"),
+    db: Session = Depends(get_db)
+):
     try:
-        added_containers = []
-
-        for container in containers:
-            existing = db.query(Container).filter(Container.containerId == container.containerId).first()
-            if existing:
-                return JSONResponse(
-                    status_code=400,
-                    content={
-                        "success": False,
-                        "message": f"Container {container.containerId} already exists.",
-                        "containersAdded": 0
-                    }
-                )
-
-            db_container = Container(**container.dict())
-            db.add(db_container)
-            added_containers.append(container.containerId)
+        result = bulk_insert(db, Container, "containerId", (c.model_dump() for c in containers), partial=partial)
+        if result.conflicts and not partial:
+            db.rollback()
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "success": False,
+                    "message": f"{len(result.conflicts)} container(s) already exist or are repeated in the request.",
+                    "containersAdded": 0,
+                    "containerIds": [],
+                    "conflicts": result.conflicts
+                }
+            )
 
         db.commit()
+        catalog.containers.invalidate(result.inserted)
+        zone_index.clear()
 
         return {
             "success": True,
             "message": "Containers added successfully",
-            "containersAdded": len(added_containers),
-            "containerIds": added_containers
+            "containersAdded": len(result.inserted),
+            "containerIds": result.inserted,
+            "conflicts": result.conflicts
         }
 
     except Exception as e:
+        db.rollback()
         logging.error(f"Error adding containers: {e}")
         return {
             "success": False,
@@ -249,44 +867,63 @@ def add_containers(containers: List[ContainerSchema], db: Session = Depends(get_
 
 
 # API: Add New Cargo Items
-    @app.post("/api/items")
-    def add_items(items: List[ItemSchema], db: Session = Depends(get_db)):
-        try:
-            added_items = []
-
-            for item in items:
-                db_item = Item(**item.dict())
-                db.add(db_item)
-                added_items.append(item.itemId)
-
-            db.commit()
-
-            return {
-                "success": True,
-                "message": "Items added successfully",
-                "itemsAdded": len(added_items),
-                "itemIds": added_items
-            }
-
-        except Exception as e:
-            logging.error(f"Error adding items: {e}")
+@app.post("/api/items")
+def add_items(
+    items: List[ItemSchema],
+    partial: bool = Query(False, description="Insert the new items and report the conflicting ones"),
+    db: Session = Depends(get_db)
+):
+    try:
+        today = mission_day(db)
+        rows = [with_waste_flag(item.model_dump(), today) for item in items]
+        result = bulk_insert(db, Item, "itemId", rows, partial=partial)
+        if result.conflicts and not partial:
+            db.rollback()
             return JSONResponse(
-                status_code=500,
+                status_code=400,
                 content={
                     "success": False,
-                    "message": "An error occurred while adding items.",
+                    "message": f"{len(result.conflicts)} item(s) already exist or are repeated in the request.",
                     "itemsAdded": 0,
-                    "itemIds": []
+                    "itemIds": [],
+                    "conflicts": result.conflicts
                 }
             )
 
+        inserted = set(result.inserted)
+        added = [row for row in rows if row["itemId"] in inserted]
+        log_events(db, added_events(added, today))
+        db.commit()
+        items_added(added)
+
+        return {
+            "success": True,
+            "message": "Items added successfully",
+            "itemsAdded": len(result.inserted),
+            "itemIds": result.inserted,
+            "conflicts": result.conflicts
+        }
+
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Error adding items: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "success": False,
+                "message": "An error occurred while adding items.",
+                "itemsAdded": 0,
+                "itemIds": []
+            }
+        )
+
 
 # API: Get All Containers
 @app.get("/api/containers")
-def get_containers(db: Session = Depends(get_db)):
+async def get_containers(db: AsyncSession = Depends(get_async_db)):
     try:
-        containers = db.query(Container).all()
-        container_data = [ContainerSchema.model_validate(c).dict() for c in containers]
+        containers = (await db.execute(select(Container))).scalars().all()
+        container_data = [ContainerSchema.model_validate(c, from_attributes=True).model_dump() for c in containers]
 
         return {
             "success": True,
@@ -306,17 +943,22 @@ def get_containers(db: Session = Depends(get_db)):
 
 
 @app.delete("/api/items/{item_id}")
-async def delete_item(item_id: str, db: Session = Depends(get_db)):
+async def delete_item(item_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
-        item = db.query(Item).filter(Item.itemId == item_id).first()
+        item = (await db.execute(select(Item).where(Item.itemId == item_id))).scalars().first()
         if not item:
             return {
                 "success": False,
                 "message": f"Item with ID '{item_id}' not found"
             }
 
-        db.delete(item)
-        db.commit()
+        await db.execute(delete(ItemPlacement).where(ItemPlacement.item_id == item.id))
+        await db.delete(item)
+        await db.execute(insert(SimulationEvent.__table__).values(
+            **event_row(await mission_day_async(db), DELETED, item_id)
+        ))
+        await db.commit()
+        await run_in_threadpool(forget_item, item_id)
         return {
             "success": True,
             "message": f"Item with ID '{item_id}' deleted successfully"
@@ -331,40 +973,48 @@ async def delete_item(item_id: str, db: Session = Depends(get_db)):
 
     
 @app.delete("/api/containers/{container_id}", response_model=ApiResponse)
-def delete_container(container_id: str, db: Session = Depends(get_db)):
+async def delete_container(container_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_container = db.query(Container).filter(Container.containerId == container_id).first()
+        db_container = (await db.execute(select(Container).where(Container.containerId == container_id))).scalars().first()
         if not db_container:
             return {
                 "success": False,
                 "message": f"Container with ID '{container_id}' not found"
             }
 
-        db.delete(db_container)
-        db.commit()
+        await db.execute(delete(ItemPlacement).where(ItemPlacement.container_id == db_container.id))
+        await db.delete(db_container)
+        await db.commit()
+        await run_in_threadpool(forget_container, container_id)
         return {
             "success": True,
             "message": f"Container with ID '{container_id}' deleted successfully"
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logging.error(f"Error deleting container '{container_id}': {e}")
         return {
             "success": False,
             "message": f"Failed to delete container '{container_id}' due to internal error"
         }
 
+def list_items() -> List[dict]:
+    with station.read() as view:
+        return view.item_dicts(view.live(view.alive))
+
+
 @app.get("/api/items")
-def get_items(db: Session = Depends(get_db)):
+async def get_items():
     try:
-        items = db.query(Item).all()
-        item_list = [ItemSchema.model_validate(item).model_dump() for item in items]
-        return {
+        # Straight from the station model's columns, no ORM rows or per-item validation
+        item_list = await run_in_threadpool(list_items)
+        # Already JSON types, so skip FastAPI's per-value encoder
+        return JSONResponse(content={
             "success": True,
             "items": item_list,
             "total": len(item_list)
-        }
+        })
     except Exception as e:
         logging.error(f"Error getting items: {e}")
         return {
@@ -376,54 +1026,180 @@ def get_items(db: Session = Depends(get_db)):
 
 # API: Get a Specific Item by ID
 @app.get("/api/items/{item_id}", response_model=ItemSchema)
-def get_item(item_id: str, db: Session = Depends(get_db)):
+async def get_item(item_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
-        logging.info(f"Getting item with ID: {item_id}")
-        item = db.query(Item).filter(Item.itemId == item_id).first()
+        item = await get_item_record_async(db, item_id)
         if item:
-            return ItemSchema.model_validate(item)
+            return ItemSchema.model_validate(item, from_attributes=True)
         logging.warning(f"Item with ID {item_id} not found")
         raise HTTPException(status_code=404, detail="Item not found")
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting item: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
+
+def rearrange_for_zones(db: Session, items: List[PackItem], containers: List[PackContainer],
+                        placements: List[dict], unplaced: List[str], time_budget: float, station: bool = False):
+    """
+    Items the packer left out of their preferred zone get a chance to move in
+    by relocating lower-priority stored items. With `station`, `containers`
+    are the pruned station containers and the ones the moves can touch are
+    added. Returns the updated placements, the items still unplaced and the
+    rearrangement steps.
+    """
+    zone_of = {c.containerId: c.zone for c in containers}
+    placed_in = {p["itemId"]: p["containerId"] for p in placements}
+    zones = zone_index.zones() if station else set(zone_of.values())
+    targets = [
+        i for i in items
+        if i.preferredZone in zones and (i.itemId not in placed_in or zone_of[placed_in[i.itemId]] != i.preferredZone)
+    ]
+    if not targets:
+        return placements, unplaced, []
+
+    # Stored items that could make room: lower priority than some target, in a target zone
+    target_zones = {t.preferredZone for t in targets}
+    batch_ids = {i.itemId for i in items}
+    rows = db.execute(
+        select(Item.itemId, Item.priority, Item.preferredZone, Container.containerId, *PLACEMENT_BOX)
+        .join(ItemPlacement, ItemPlacement.item_id == Item.id)
+        .join(Container, Container.id == ItemPlacement.container_id)
+        .where(Container.zone.in_(target_zones), Item.priority < max(t.priority for t in targets))
+    ).all()
+    stored = {
+        row[0]: StoredItem(row[0], row[3], tuple(row[4:]), row[1], row[2])
+        for row in rows if row[0] not in batch_ids
+    }
+    if station:
+        containers = rearrangement_containers(containers, batch_ids, stored)
+
+    plan = plan_rearrangements(targets, containers, stored, placed_in, time_budget=time_budget)
+    if not plan.complete:
+        logging.info(f"Rearrangement search stopped at its {time_budget:.2f}s budget")
+    if not plan.placements:
+        return placements, unplaced, []
+
+    placements = [p for p in placements if p["itemId"] not in plan.placements]
+    placements += [
+        {"itemId": item_id, "containerId": container_id, "position": box_to_position(box)}
+        for item_id, (container_id, box) in plan.placements.items()
+    ]
+    unplaced = [i for i in unplaced if i not in plan.placements]
+    rearrangements = [
+        {
+            "step": step,
+            "action": "move",
+            "itemId": move.itemId,
+            "fromContainer": move.fromContainer,
+            "fromPosition": box_to_position(move.fromBox),
+            "toContainer": move.toContainer,
+            "toPosition": box_to_position(move.toBox),
+        }
+        for step, move in enumerate(plan.moves, 1)
+    ]
+    return placements, unplaced, rearrangements
+
+
+def requested_containers(db: Session, specs: List[ContainerSchema], batch_ids: Set[str]) -> List[PackContainer]:
+    """Packer containers for the containers described in a placement request."""
+    # Existing occupancy of stored containers; items in the batch are being re-planned
+    requested_ids = [c.containerId for c in specs]
+    stored_ids = {cid for (cid,) in db.query(Container.containerId).filter(Container.containerId.in_(requested_ids))}
+    occupancies = occupancy.get_many(stored_ids)
+    containers = []
+    for c in specs:
+        occ = occupancies.get(c.containerId)
+        if occ is not None and (occ.width, occ.depth, occ.height) != (c.width, c.depth, c.height):
+            occ = None  # Request describes a different container under the same id
+        fit = zone_index.fit(c.containerId, batch_ids) if occ is not None else None
+        containers.append(PackContainer(c.containerId, c.zone, c.width, c.depth, c.height, occ, batch_ids, fit))
+    return containers
+
+
+def smallest(dimensions: List[Tuple[int, int, int]]) -> Tuple[int, Tuple[int, int, int]]:
+    """Smallest volume and component-wise smallest sorted dimensions among (width, depth, height)s."""
+    volume = min(w * d * h for w, d, h in dimensions)
+    return volume, tuple(min(d) for d in zip(*(sorted(dims) for dims in dimensions)))
+
+
+def pack_containers(entries, batch_ids: Set[str]) -> List[PackContainer]:
+    """Packer containers for zone index entries, their occupancy loaded together."""
+    occupancies = occupancy.get_many(e.containerId for e in entries)
+    return [
+        PackContainer(e.containerId, e.zone, e.width, e.depth, e.height, occupancies.get(e.containerId), batch_ids,
+                      zone_index.fit(e.containerId, batch_ids))
+        for e in entries
+    ]
+
+
+def station_containers(items: List[PackItem], batch_ids: Set[str]) -> List[PackContainer]:
+    """
+    Packer containers for the station, emptiest first: only the containers
+    that could take at least one item of the batch, with enough free volume
+    for the smallest item and a free-box bound admitting the smallest sorted
+    dimensions.
+    """
+    volume, dims = smallest([(i.width, i.depth, i.height) for i in items])
+    # Containers holding items of the batch get that space back, so they always stay in
+    holding = {occupancy.container_of(i) for i in batch_ids} - {None}
+    return pack_containers(zone_index.candidates(volume, dims, include=holding), batch_ids)
+
+
+def rearrangement_containers(containers: List[PackContainer], batch_ids: Set[str],
+                             stored: Dict[str, StoredItem]) -> List[PackContainer]:
+    """
+    The station containers a rearrangement can touch: the packer's own, those
+    holding `stored` items it may move, and those with room for the smallest
+    of them. Every other container is full for each item involved. The
+    packer's containers keep their planned layout.
+    """
+    if not stored:
+        return containers
+    packed = {c.containerId: c for c in containers}
+    volume, dims = smallest([s.dims for s in stored.values()])
+    entries = zone_index.candidates(volume, dims, include=set(packed) | {s.containerId for s in stored.values()})
+    added = {c.containerId: c for c in pack_containers([e for e in entries if e.containerId not in packed], batch_ids)}
+    return [packed.get(e.containerId) or added[e.containerId] for e in entries]
+
+
 @app.post("/api/placement", response_model=PlacementResponse)
 def calculate_placement_recommendations(req: PlacementRequest, db: Session = Depends(get_db)):
     try:
         if not req.items:
             raise HTTPException(status_code=400, detail="Item data is required.")
 
-        item = req.items[0]  # Assuming single item for simplicity
-        db_item = db.query(Item).filter(Item.itemId == item.itemId).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail=f"Item with ID '{item.itemId}' not found.")
-
-        container = db.query(Container).first()
-        if not container:
+        batch_ids = {item.itemId for item in req.items}
+        items = [
+            PackItem(i.itemId, i.width, i.depth, i.height, i.priority, i.preferredZone)
+            for i in req.items
+        ]
+        if not req.containers and not len(zone_index):
             return PlacementResponse(
                 success=False,
                 placements=[],
                 rearrangements=[]
             )
-
-        placement = {
-            "itemId": item.itemId,
-            "containerId": container.containerId,
-            "position": {
-                "startCoordinates": {"width": 0, "depth": 0, "height": 0},
-                "endCoordinates": {
-                    "width": item.width,
-                    "depth": item.depth,
-                    "height": item.height
-                }
-            }
-        }
+        if req.containers:
+            containers = requested_containers(db, req.containers, batch_ids)
+        else:
+            containers = station_containers(items, batch_ids)
+
+        placements, unplaced = plan_placements(items, containers)
+        rearrangements = []
+        if req.rearrange:
+            placements, unplaced, rearrangements = rearrange_for_zones(
+                db, items, containers, placements, unplaced, (req.timeBudgetMs or 0) / 1000,
+                station=not req.containers
+            )
+        if unplaced:
+            logging.warning(f"No space found for {len(unplaced)} of {len(items)} items")
 
         return PlacementResponse(
             success=True,
-            placements=[placement],
-            rearrangements=[]
+            placements=placements,
+            rearrangements=rearrangements
         )
 
     except HTTPException as http_exc:
@@ -443,19 +1219,21 @@ def calculate_placement_recommendations(req: PlacementRequest, db: Session = Dep
 @app.post("/api/place", response_model=ApiResponse)
 def confirm_placement(req: ConfirmPlacementRequest, db: Session = Depends(get_db)):
     try:
-        logging.info(f"Placement Confirmation Request received: {req}")
+        logging.debug("Placement confirmation for item %s in container %s", req.itemId, req.containerId)
 
         # Validate presence of required fields
         if not req.itemId or not req.containerId or not req.position:
             raise HTTPException(status_code=400, detail="Missing required placement fields.")
 
-        item = db.query(Item).filter(Item.itemId == req.itemId).first()
-        container = db.query(Container).filter(Container.containerId == req.containerId).first()
+        item = get_item_record(db, req.itemId)
+        container = get_container_record(db, req.containerId)
 
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {req.itemId} not found")
         if not container:
             raise HTTPException(status_code=404, detail=f"Container with ID {req.containerId} not found")
+        if container.is_undocking:
+            raise HTTPException(status_code=409, detail=f"Container {req.containerId} has been undocked")
 
         # Defensive check for coordinates
         try:
@@ -471,18 +1249,29 @@ def confirm_placement(req: ConfirmPlacementRequest, db: Session = Depends(get_db
         if not is_valid_position(req.position, container):
             raise HTTPException(status_code=400, detail="Invalid position within container")
 
-        # Record placement
-        item_placement = ItemPlacement(
-            item_id=item.id,
-            container_id=container.id,
-            start_coordinates=start,
-            end_coordinates=end
-        )
-        db.add(item_placement)
+        box = position_to_box(req.position)
+        # Concurrent placements into this container wait here until this one is stored
+        with occupancy.reserve(container.containerId):
+            # Validate that placement does not overlap items already in the container
+            occ = occupancy.get(container.containerId)
+            blocking = occ.collisions(box, ignore={req.itemId})
+            if blocking:
+                raise HTTPException(status_code=400, detail=f"Position overlaps with item(s): {', '.join(blocking[:10])}")
+
+            # Record placement, replacing any previous one for this item
+            db.query(ItemPlacement).filter(ItemPlacement.item_id == item.id).delete(synchronize_session=False)
+            item_placement = ItemPlacement(
+                item_id=item.id,
+                container_id=container.id,
+                **placement_columns(box)
+            )
+            db.add(item_placement)
+            db.commit()
+            occupancy.place(container.containerId, req.itemId, box)
+        station.invalidate([req.itemId])
 
         # Create log
         create_log_entry(
-            db,
             user_id=req.userId,
             action_type="placement",
             item_id=req.itemId,
@@ -490,7 +1279,6 @@ def confirm_placement(req: ConfirmPlacementRequest, db: Session = Depends(get_db
             details=req.position
         )
 
-        db.commit()
         return {"success": True}
 
     except HTTPException as e:
@@ -503,7 +1291,7 @@ def confirm_placement(req: ConfirmPlacementRequest, db: Session = Depends(get_db
         raise HTTPException(status_code=500, detail="Failed to confirm placement")
 
 
-def is_valid_position(position: dict, container: Container) -> bool:
+def is_valid_position(position: dict, container) -> bool:
     """
     Helper function to validate if the given position is within the container's bounds.
     """
@@ -526,7 +1314,6 @@ def is_valid_position(position: dict, container: Container) -> bool:
 
 
 def create_log_entry(
-    db: Session,
     user_id: str,
     action_type: str,
     item_id: str = None,
@@ -534,39 +1321,39 @@ def create_log_entry(
     details: dict = None
 ):
     """
-    Safely create a log entry with error handling to prevent API failure.
+    Queue an audit log entry. The row is written by the background audit log
+    writer, outside the caller's transaction; failures there are logged and
+    never break the calling API route.
     """
-    try:
-        log_entry = Log(
-            user_id=user_id,
-            action_type=action_type,
-            item_id=item_id,
-            container_id=container_id,
-            details=details or {}  # Ensure it's always a dict
-        )
-        db.add(log_entry)
-        db.commit()
-        return log_entry
-    except Exception as e:
-        db.rollback()  # Very important for transactional integrity
-        logging.error(f"Failed to create log entry: {e}", exc_info=True)
-        # Do not raise here — avoid breaking the calling API route
-        return None
+    audit_log.submit({
+        "timestamp": datetime.now(),
+        "userId": user_id,
+        "actionType": action_type,
+        "itemId": item_id,
+        "containerId": container_id,
+        "details": details or {}  # Ensure it's always a dict
+    })
 
 
 # API: Item Search and Retrieval
 @app.get("/api/search", response_model=SearchResponse)
-def search_item(
+async def search_item(
     itemId: Optional[str] = Query(None),
     itemName: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         if not itemId and not itemName:
             raise HTTPException(status_code=400, detail="Either itemId or itemName must be provided")
 
-        query = db.query(Item)
-        item = query.filter(Item.itemId == itemId).first() if itemId else query.filter(Item.name == itemName).first()
+        if not itemId:
+            # Exact name first, otherwise the best ranked partial or misspelled match
+            matches = await run_in_threadpool(name_index.exact, itemName)
+            if not matches:
+                _, page = await run_in_threadpool(name_index.search, itemName, 1)
+                matches = [m.itemId for m in page]
+            itemId = matches[0] if matches else None
+        item = await get_item_record_async(db, itemId) if itemId else None
 
         if not item:
             return {
@@ -576,22 +1363,39 @@ def search_item(
                 "retrievalSteps": []
             }
 
+        location = (await db.execute(
+            select(Container.containerId, Container.zone, ItemPlacement)
+            .join(ItemPlacement, ItemPlacement.container_id == Container.id)
+            .where(ItemPlacement.item_id == item.id)
+            .limit(1)
+        )).first()
+        if not location:
+            # Known item that is not currently stowed anywhere
+            return {
+                "success": True,
+                "found": True,
+                "item": {
+                    "itemId": item.itemId,
+                    "name": item.name,
+                    "containerId": None,
+                    "zone": item.preferredZone,
+                    "position": None
+                },
+                "retrievalSteps": []
+            }
+
+        container_id, zone, placement = location
         return {
             "success": True,
             "found": True,
             "item": {
                 "itemId": item.itemId,
                 "name": item.name,
-                "containerId": "contA",  # Placeholder
-                "zone": item.preferredZone,
-                "position": {
-                    "startCoordinates": {"width": 0, "depth": 0, "height": 0},
-                    "endCoordinates": {"width": item.width, "depth": item.depth, "height": item.height}
-                }
+                "containerId": container_id,
+                "zone": zone,
+                "position": placement.position
             },
-            "retrievalSteps": [
-                {"step": 1, "action": "retrieve", "itemId": item.itemId, "itemName": item.name}
-            ]
+            "retrievalSteps": await build_retrieval_steps_async(db, container_id, [item.itemId])
         }
 
     except HTTPException as e:
@@ -601,79 +1405,138 @@ def search_item(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+# API: Ranked item name search
+@app.get("/api/search/items", response_model=NameSearchResponse)
+def search_item_names(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    total, page = name_index.search(q, limit=limit, offset=offset)
+    return {
+        "success": True,
+        "total": total,
+        "results": [{"itemId": m.itemId, "name": m.name, "match": m.match} for m in page]
+    }
+
+
 # API: Retrieve Item
 @app.post("/api/retrieve", response_model=ApiResponse)
-def retrieve_item(req: RetrieveRequest, db: Session = Depends(get_db)):
+async def retrieve_item(req: RetrieveRequest, db: AsyncSession = Depends(get_async_db)):
     try:
-        logging.info(f"Retrieve request received: {req}")
+        logging.debug("Retrieve request for item %s", req.itemId)
 
-        item = db.query(Item).filter(Item.itemId == req.itemId).first()
+        item = await get_item_record_async(db, req.itemId)
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {req.itemId} not found")
 
-        # 1. Update usageLimit if applicable and not None
-        if item.usageLimit is not None and item.usageLimit > 0:
-            item.usageLimit -= 1
-            db.commit()
-            logging.info(f"Usage limit decremented for item {req.itemId}. New usageLimit: {item.usageLimit}")
-        else:
-            logging.info(f"No usage limit update needed for item {req.itemId} (usageLimit={item.usageLimit})")
+        # 1. Use up one of the item's uses, if it has a limit and any are left.
+        # Decrement in SQL so concurrent retrievals never lose a use; the row
+        # decides, since the cached record may be stale.
+        remaining = (await db.execute(
+            update(Item)
+            .where(Item.id == item.id, Item.usageLimit > 0)
+            .values(usageLimit=Item.usageLimit - 1, is_waste=or_(Item.is_waste, Item.usageLimit == 1))
+            .returning(Item.usageLimit)
+        )).scalar_one_or_none()
+        if remaining is not None:
+            await db.execute(insert(SimulationEvent.__table__).values(
+                **event_row(await mission_day_async(db), USAGE, req.itemId, uses=1)
+            ))
+
+        # The item leaves its container; it comes back through /api/place
+        await db.execute(delete(ItemPlacement).where(ItemPlacement.item_id == item.id))
+        await db.commit()
+        await run_in_threadpool(item_retrieved, req.itemId, remaining == 0)
 
         # 2. Create a log entry
         create_log_entry(
-            db,
             user_id=req.userId,
             action_type="retrieval",
             item_id=req.itemId,
             details={"timestamp": req.timestamp}
         )
-        logging.info(f"Log entry created for item {req.itemId} retrieval")
 
         return {"success": True}
 
     except HTTPException as e:
-        db.rollback()
+        await db.rollback()
         raise e
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logging.error(f"Error retrieving item: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve item")
 
 
-# API: Identify Waste Items
-@app.get("/api/waste/identify", response_model=WasteIdentifyResponse)
-def identify_waste_items(db: Session = Depends(get_db)):
-    try:
-        today = datetime.now().date()
-        waste_items = []
-        items = db.query(Item).all()
+def with_waste_flag(values: dict, today: date) -> dict:
+    """Column values for a new item, flagged if it arrives already expired or used up."""
+    expiry = values.get("expiryDate")
+    values["is_waste"] = values.get("usageLimit") == 0 or bool(expiry and expiry < today)
+    return values
 
-        for item in items:
-            reason = None
 
-            # Handle expiry date
-            if item.expiryDate and item.expiryDate < today:
-                reason = "Expired"
+def added_events(rows: List[dict], today: date) -> List[dict]:
+    return [
+        event_row(today, ADDED, row["itemId"], details=added_details(row.get("expiryDate"), row.get("usageLimit"), row["is_waste"]))
+        for row in rows
+    ]
 
-            # Handle usage limit only if not None
-            elif item.usageLimit is not None and item.usageLimit == 0:
-                reason = "Out of Uses"
 
-            if reason:
-                waste_items.append({
-                    "itemId": item.itemId,
-                    "name": item.name,
-                    "reason": reason,
-                    "containerId": "contA",  # Placeholder
-                    "position": {
-                        "startCoordinates": {"width": 0, "depth": 0, "height": 0},
-                        "endCoordinates": {
-                            "width": item.width,
-                            "depth": item.depth,
-                            "height": item.height
-                        }
-                    }
-                })
+def rows_for_items(db: Session, statement, item_ids) -> list:
+    """Run `statement` restricted to the given itemIds, in IN (...) chunks the backend accepts."""
+    item_ids = list(item_ids)
+    size = key_chunk_size(db)
+    rows = []
+    for start in range(0, len(item_ids), size):
+        rows += db.execute(statement.where(Item.itemId.in_(item_ids[start:start + size]))).all()
+    return rows
+
+
+def sweep_expired_items(db: Session, today: date):
+    """Flag the items whose expiry date has passed, popping them off the expiry schedule."""
+    expired = expiry_schedule.advance(today)
+    if not expired:
+        return
+    item_ids = [item_id for _, item_id in expired]
+    try:
+        size = key_chunk_size(db)
+        for start in range(0, len(item_ids), size):
+            db.execute(
+                update(Item)
+                .where(Item.itemId.in_(item_ids[start:start + size]), Item.is_waste == false())
+                .values(is_waste=True)
+            )
+        log_events(db, [event_row(today, EXPIRY, item_id) for item_id in item_ids])
+        db.commit()
+    except Exception:
+        db.rollback()
+        for expiry, item_id in expired:
+            expiry_schedule.add(item_id, expiry)  # Try again on the next sweep
+        raise
+    catalog.items.invalidate(item_ids)
+    station.invalidate(item_ids)
+
+
+# API: Identify Waste Items
+@app.get("/api/waste/identify", response_model=WasteIdentifyResponse)
+def identify_waste_items(db: Session = Depends(get_db)):
+    try:
+        today = mission_day(db)
+        sweep_expired_items(db, today)
+
+        with station.read() as view:
+            rows = view.live(view.waste)
+            expired = view.expiry[rows] < today.toordinal()
+            waste_items = [
+                {
+                    "itemId": view.item_ids[row],
+                    "name": view.names[view.name[row]],
+                    "reason": "Expired" if is_expired else "Out of Uses",
+                    "containerId": view.container_of(row),
+                    "position": view.position_of(row)
+                }
+                for row, is_expired in zip(rows.tolist(), expired.tolist())
+            ]
 
         return {
             "success": True,
@@ -705,30 +1568,82 @@ def generate_waste_return_plan(req: WasteReturnPlanRequest, db: Session = Depend
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        # Filter items with a valid expiry date that is before the undocking date
-        expired_items = db.query(Item).filter(
-            Item.expiryDate.isnot(None),
-            Item.expiryDate < undocking_date
-        ).all()
+        if req.objective not in (None, "volume", "mass"):
+            raise HTTPException(status_code=400, detail="objective must be 'volume' or 'mass'")
 
-        for item in expired_items:
-            volume = (item.width or 0) * (item.depth or 0) * (item.height or 0)
-            weight = item.mass or 0
+        undocking_container = get_container_record(db, req.undockingContainerId)
+        if not undocking_container:
+            raise HTTPException(status_code=404, detail=f"Container with ID {req.undockingContainerId} not found")
 
+        # Waste candidates: already waste, or expiring before the undocking date
+        with station.read() as view:
+            rows = view.live(view.waste | (view.expiry < undocking_date.toordinal()))
+            volumes = (view.width[rows].astype(np.int64) * view.depth[rows] * view.height[rows]).tolist()
+            waste = {
+                view.item_ids[row]: (view.names[view.name[row]], int(view.expiry[row]), view.container_of(row))
+                for row in rows.tolist()
+            }
+            masses = view.mass[rows].tolist()
+
+        candidates = []
+        for (item_id, (_, _, container_id)), volume, mass in zip(waste.items(), volumes, masses):
+            blockers = 0
+            if container_id and container_id != req.undockingContainerId:
+                occ = occupancy.get(container_id)
+                blockers = len(occ.blockers_of([item_id])) if occ is not None else 0
+            candidates.append(WasteCandidate(itemId=item_id, volume=volume, mass=mass, blockers=blockers))
+
+        # Room left in the undocking container: items already in it that are not waste stay there
+        capacity = undocking_container.width * undocking_container.depth * undocking_container.height
+        occ = occupancy.get(req.undockingContainerId)
+        if occ is not None:
+            capacity -= sum(box_volume(box) for _, box in occ.boxes(ignore=waste))
+        result = solve_return_plan(
+            candidates,
+            max_volume=capacity,
+            max_weight=req.maxWeight,
+            objective=req.objective or "volume",
+            retrieval_cost=req.retrievalCostWeight if req.retrievalCostWeight is not None else 0.1,
+            time_budget=max(req.timeBudgetMs or 0, 1) / 1000
+        )
+
+        by_container = {}
+        for candidate in result.selected:
+            name, expiry, container_id = waste[candidate.itemId]
+            return_plan.append({
+                "step": len(return_plan) + 1,
+                "itemId": candidate.itemId,
+                "itemName": name,
+                "fromContainer": container_id,
+                "toContainer": req.undockingContainerId
+            })
             return_manifest["returnItems"].append({
-                "itemId": item.itemId,
-                "name": item.name,
-                "expiryDate": item.expiryDate.strftime("%Y-%m-%d"),
-                "containerId": req.undockingContainerId  # Still placeholder
+                "itemId": candidate.itemId,
+                "name": name,
+                "reason": "Expired" if expiry < undocking_date.toordinal() else "Out of Uses",
+                "expiryDate": date.fromordinal(expiry).strftime("%Y-%m-%d") if expiry != NO_EXPIRY else None,
+                "containerId": container_id
             })
-            return_manifest["totalVolume"] += volume
-            return_manifest["totalWeight"] += weight
+            return_manifest["totalVolume"] += candidate.volume
+            return_manifest["totalWeight"] += candidate.mass
+            if container_id and container_id != req.undockingContainerId:
+                by_container.setdefault(container_id, []).append(candidate.itemId)
+
+        # Removal sequences for pulling the selected items out of their containers
+        for container_id, item_ids in by_container.items():
+            retrieval_steps += build_retrieval_steps(db, container_id, item_ids, start_step=len(retrieval_steps) + 1)
+
+        logging.info(
+            f"Return plan for {req.undockingContainerId}: {len(result.selected)} of {len(candidates)} candidates, "
+            f"optimal={result.optimal}, nodes={result.nodes}"
+        )
 
         return {
             "success": True,
             "returnPlan": return_plan,
             "retrievalSteps": retrieval_steps,
-            "returnManifest": return_manifest
+            "returnManifest": return_manifest,
+            "optimal": result.optimal
         }
 
     except HTTPException:
@@ -746,11 +1661,56 @@ def complete_undocking(req: CompleteUndockingRequest, db: Session = Depends(get_
         if not req.undockingContainerId or not req.timestamp:
             raise HTTPException(status_code=400, detail="Both container ID and timestamp are required.")
 
-        # Placeholder logic - assume 5 items removed
-        removed_count = 5  # Replace with real count once logic is implemented
+        container = db.execute(
+            select(Container.id).where(Container.containerId == req.undockingContainerId)
+        ).scalar()
+        if container is None:
+            raise HTTPException(status_code=404, detail=f"Container with ID {req.undockingContainerId} not found")
+
+        # Claim the container first: a second or concurrent undock finds the flag set and stops here
+        claimed = db.execute(
+            update(Container)
+            .where(Container.id == container, Container.is_undocking == false())
+            .values(is_undocking=True)
+        ).rowcount
+        if not claimed:
+            raise HTTPException(status_code=409, detail=f"Container {req.undockingContainerId} is already undocked")
+
+        # Everything stowed in the container, plus return plan items still elsewhere
+        in_container = select(ItemPlacement.item_id).where(ItemPlacement.container_id == container)
+        rows = db.execute(select(Item.id, Item.itemId).where(Item.id.in_(in_container))).all()
+        aboard = {item_id for _, item_id in rows}
+        others = rows_for_items(db, select(Item.id, Item.itemId), set(req.itemIds or ()) - aboard)
+        elsewhere = [item_id for _, item_id in others]
+
+        # Placements before the items they reference, so the item_id foreign key holds throughout
+        db.execute(delete(ItemPlacement).where(ItemPlacement.container_id == container))
+        size = key_chunk_size(db)
+        ids = [row_id for row_id, _ in others]
+        for start in range(0, len(ids), size):
+            db.execute(delete(ItemPlacement).where(ItemPlacement.item_id.in_(ids[start:start + size])))
+        ids += [row_id for row_id, _ in rows]
+        for start in range(0, len(ids), size):
+            db.execute(delete(Item).where(Item.id.in_(ids[start:start + size])).execution_options(synchronize_session=False))
+        today = mission_day(db)
+        log_events(db, [event_row(today, UNDOCKED, item_id) for _, item_id in rows + others])
+        db.commit()
 
-        # Optional logging
-        logging.info(f"Undocking completed for container {req.undockingContainerId} at {req.timestamp}, items removed: {removed_count}")
+        removed = [*aboard, *elsewhere]
+        catalog.items.invalidate(removed)
+        station.invalidate(removed)
+        catalog.containers.invalidate([req.undockingContainerId])
+        zone_index.clear()
+        expiry_schedule.remove(removed)
+        for item_id in removed:
+            name_index.remove(item_id)
+        occupancy.drop_container(req.undockingContainerId)
+        for item_id in elsewhere:
+            occupancy.remove(item_id)
+
+        create_log_entry(None, "undocking", container_id=req.undockingContainerId,
+                         details={"itemsRemoved": len(removed), "timestamp": req.timestamp})
+        logging.info(f"Undocking completed for container {req.undockingContainerId} at {req.timestamp}, items removed: {len(removed)}")
 
         return {"success": True}  # Ensure only fields defined in ApiResponse are returned
 
@@ -765,7 +1725,7 @@ def complete_undocking(req: CompleteUndockingRequest, db: Session = Depends(get_
 @app.post("/api/simulate/day", response_model=TimeSimulationResponse)
 def simulate_time(req: TimeSimulationRequest, db: Session = Depends(get_db)):
     try:
-        today = datetime.now().date()
+        today = mission_day(db)  # Simulated time continues from the persistent mission clock
         new_date = None
         if req.numOfDays:
             new_date = today + timedelta(days=req.numOfDays)
@@ -774,25 +1734,88 @@ def simulate_time(req: TimeSimulationRequest, db: Session = Depends(get_db)):
         else:
             raise HTTPException(status_code=400, detail="Either numOfDays or toTimestamp must be provided")
 
-        items_used = []
-        items_expired = []
-        items_depleted = []
-
-        items = db.query(Item).all()
-        for item in items:
-            if item.expiryDate and item.expiryDate < new_date:
-                items_expired.append({"itemId": item.itemId, "name": item.name})
-            if item.usageLimit == 0:
-                items_depleted.append({"itemId": item.itemId, "name": item.name})
-
-        #  Simulate item usage (Placeholder - Requires actual logic)
-        #  This is just a basic example:
-        for used_item in req.itemsToBeUsedPerDay:
-            item_from_db = db.query(Item).filter(Item.itemId == used_item["itemId"]).first()
-            if item_from_db:
-                item_from_db.usageLimit = max(0, item_from_db.usageLimit - 1)  #  Decrement usage
-                db.commit()
-                items_used.append({"itemId": item_from_db.itemId, "name": item_from_db.name, "remainingUses": item_from_db.usageLimit})
+        num_days = (new_date - today).days
+        if num_days < 0:
+            raise HTTPException(status_code=400, detail="Cannot simulate backwards in time")
+
+        # Only items that are used or expire inside the window can change
+        sweep_expired_items(db, today)
+        wanted = {item_id for _, item_id in expiry_schedule.expiring_before(new_date)}
+        with station.read() as view:
+            used_ids = []
+            for used_item in req.itemsToBeUsedPerDay:
+                item_id = used_item.get("itemId")
+                if item_id not in view.row_of and used_item.get("name"):
+                    matches = name_index.exact(used_item["name"])
+                    item_id = matches[0] if matches else None
+                used_ids.append(item_id)
+            wanted.update(i for i in used_ids if i)
+
+            selected = view.rows(wanted)
+            selected = selected[np.argsort(view.pk[selected], kind="stable")]
+            ids = view.pk[selected]
+            item_ids = [view.item_ids[row] for row in selected.tolist()]
+            names = [view.names[code] for code in view.name[selected].tolist()]
+            expiry = view.expiry[selected]
+            remaining = view.remaining[selected]
+            was_waste = view.waste[selected]
+        row_of = {item_id: i for i, item_id in enumerate(item_ids)}
+
+        # Daily usage profile; entries may name the item by itemId or by name
+        uses_per_day = np.zeros(len(item_ids), dtype=np.int64)
+        for item_id in used_ids:
+            row = row_of.get(item_id)
+            if row is not None:
+                uses_per_day[row] += 1
+
+        result = simulate_days(expiry, remaining, uses_per_day, today, num_days)
+
+        def day_str(day):
+            return (today + timedelta(days=int(day))).strftime("%Y-%m-%d")
+
+        items_used = [
+            {"itemId": item_ids[i], "name": names[i], "remainingUses": None if remaining[i] == NO_LIMIT else int(result.remaining[i])}
+            for i in np.flatnonzero(result.uses > 0)
+        ]
+        items_expired = [
+            {"itemId": item_ids[i], "name": names[i], "expiredOn": day_str(result.expired_day[i])}
+            for i in np.flatnonzero(result.expired_day != NEVER)
+        ]
+        items_depleted = [
+            {"itemId": item_ids[i], "name": names[i], "depletedOn": day_str(result.depleted_day[i])}
+            for i in np.flatnonzero(result.depleted_day != NEVER)
+        ]
+
+        # Write back all changed usage counters and new waste flags, one executemany UPDATE each
+        changed = np.flatnonzero((result.uses > 0) & (remaining != result.remaining))
+        now_waste = (result.expired_day != NEVER) | ((remaining != NO_LIMIT) & (result.remaining == 0))
+        flagged = np.flatnonzero(now_waste & ~was_waste)
+        if len(changed):
+            db.execute(
+                update(Item),
+                [{"id": int(ids[i]), "usageLimit": int(result.remaining[i])} for i in changed]
+            )
+        if len(flagged):
+            db.execute(update(Item), [{"id": int(ids[i]), "is_waste": True} for i in flagged])
+
+        # Event log in day order: expiries on their day, then the window's usage at its end
+        events = [
+            event_row(today + timedelta(days=int(result.expired_day[i])), EXPIRY, item_ids[i])
+            for i in np.flatnonzero((result.expired_day != NEVER) & ~was_waste)
+        ]
+        events.sort(key=lambda e: e["day"])
+        events += [event_row(new_date, USAGE, item_ids[i], uses=int(result.uses[i])) for i in np.flatnonzero(result.uses > 0)]
+        log_events(db, events)
+        db.execute(update(MissionClock).where(MissionClock.id == 1).values(day=new_date))
+        since = db.execute(select(func.max(SimulationSnapshot.event_id))).scalar() or 0
+        last_event = db.execute(select(func.max(SimulationEvent.id))).scalar() or 0
+        if last_event - since >= SNAPSHOT_EVERY_EVENTS:
+            take_snapshot(db)
+        db.commit()
+        touched = [item_ids[i] for i in np.union1d(changed, flagged)]
+        catalog.items.invalidate(touched)
+        station.invalidate(touched)
+        expiry_schedule.remove(item_ids[i] for i in flagged)
 
         return {
             "success": True,
@@ -810,43 +1833,131 @@ def simulate_time(req: TimeSimulationRequest, db: Session = Depends(get_db)):
         raise
 
 
+# API: Mission clock and simulation state
+@app.get("/api/simulate/clock")
+def get_mission_clock(db: Session = Depends(get_db)):
+    return {
+        "success": True,
+        "currentDate": mission_day(db).strftime("%Y-%m-%d"),
+        "eventId": db.execute(select(func.max(SimulationEvent.id))).scalar() or 0
+    }
+
+
+@app.get("/api/simulate/state")
+def get_simulation_state(
+    date_: Optional[date] = Query(None, alias="date", description="End of this mission day"),
+    eventId: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
+    loaded = load_mission_state(db, day=date_, event_id=eventId)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="No snapshot covers that point of the mission")
+    state, snapshot_event, replayed = loaded
+    return {
+        "success": True,
+        "date": state.day.strftime("%Y-%m-%d"),
+        "eventId": state.event_id,
+        "snapshotEventId": snapshot_event,
+        "replayedEvents": replayed,
+        "items": len(state.items),
+        "wasteItems": len(state.waste_ids())
+    }
+
+
+@app.post("/api/simulate/snapshot")
+def create_simulation_snapshot(db: Session = Depends(get_db)):
+    snapshot = take_snapshot(db)
+    db.commit()
+    return {
+        "success": True,
+        "eventId": snapshot.event_id,
+        "date": snapshot.day.strftime("%Y-%m-%d")
+    }
+
+
+SCENARIO_WORKERS = int(os.getenv("SCENARIO_WORKERS", "0")) or None  # 0: one per CPU
+
+
+# API: What-if scenarios, run on a read-only fork of the station
+@app.post("/api/scenarios/run")
+def run_what_if_scenarios(req: ScenarioRequest, db: Session = Depends(get_db)):
+    for spec in req.scenarios:
+        if spec.placementStrategy not in CONTAINER_ORDERS:
+            raise HTTPException(status_code=400, detail=f"placementStrategy must be one of {', '.join(CONTAINER_ORDERS)}")
+
+    # One consistent read of the catalog; the workers never see the database
+    start = mission_day(db)
+    items = db.execute(select(
+        Item.itemId, Item.name, Item.width, Item.depth, Item.height, Item.mass,
+        Item.expiryDate, Item.usageLimit, Item.is_waste
+    )).all()
+    containers = db.execute(select(
+        Container.containerId, Container.zone, Container.width, Container.depth, Container.height
+    )).all()
+    placements = [
+        (row[0], row[1], tuple(row[2:]))
+        for row in db.execute(
+            select(Item.itemId, Container.containerId, *PLACEMENT_BOX)
+            .join(ItemPlacement, ItemPlacement.item_id == Item.id)
+            .join(Container, ItemPlacement.container_id == Container.id)
+        ).all()
+    ]
+    db.rollback()
+
+    fork, shared = fork_station(start, items, containers, placements)
+    try:
+        results = run_scenarios(fork, shared, [spec.model_dump() for spec in req.scenarios], req.workers or SCENARIO_WORKERS)
+    finally:
+        shared.close()
+    return {"success": True, "baseDate": start.strftime("%Y-%m-%d"), "results": results}
+
+
+def parse_item_row(row: dict) -> dict:
+    #  Validate data types from CSV
+    item_data = {}
+    item_data["itemId"] = row["itemId"]
+    item_data["name"] = row["name"]
+    item_data["width"] = int(row["width"])
+    item_data["depth"] = int(row["depth"])
+    item_data["height"] = int(row["height"])
+    item_data["mass"] = float(row["mass"])
+    item_data["priority"] = int(row["priority"])
+    if row.get("expiryDate"):
+        item_data["expiryDate"] = date.fromisoformat(row["expiryDate"])
+    item_data["usageLimit"] = int(row["usageLimit"]) if row.get("usageLimit") else None  # blank: no limit
+    item_data["preferredZone"] = row["preferredZone"]
+    return ItemSchema(**item_data).model_dump()
+
+
+def parse_container_row(row: dict) -> dict:
+    container_data = {
+        "containerId": (row.get("containerId") or "").strip(),
+        "zone": (row.get("zone") or "").strip(),
+        "width": int(row["width"]) if row.get("width") else 0,
+        "depth": int(row["depth"]) if row.get("depth") else 0,
+        "height": int(row["height"]) if row.get("height") else 0
+    }
+    return ContainerSchema(**container_data).model_dump()
+
+
 # API: Import Items from CSV
 @app.post("/api/import/items", response_model=ImportResponse)
 def import_items(file: UploadFile = File(...), db: Session = Depends(get_db)):
     try:
-        contents = file.file.read().decode('utf-8')
-        reader = csv.DictReader(contents.splitlines())
-        items_imported = 0
-        errors = []
-
-        for row in reader:
-            try:
-                #  Validate data types from CSV
-                item_data = {}
-                item_data["itemId"] = row["itemId"]
-                item_data["name"] = row["name"]
-                item_data["width"] = int(row["width"])
-                item_data["depth"] = int(row["depth"])
-                item_data["height"] = int(row["height"])
-                item_data["mass"] = float(row["mass"])
-                item_data["priority"] = int(row["priority"])
-                if row.get("expiryDate"):
-                    item_data["expiryDate"] = datetime.strptime(row["expiryDate"], "%Y-%m-%d").date()
-                item_data["usageLimit"] = int(row["usageLimit"])
-                item_data["preferredZone"] = row["preferredZone"]
-
-                item = ItemSchema(**item_data)
-                db_item = Item(**item.dict())
-                db.add(db_item)
-                db.commit()
-                items_imported += 1
-            except (ValueError, KeyError) as e:
-                errors.append({"row": row, "message": str(e)})
+        today = mission_day(db)
+        stats = stream_import(
+            db, file.file, Item,
+            lambda row: with_waste_flag(parse_item_row(row), today),
+            on_insert=lambda session, rows: log_events(session, added_events(rows, today)),
+            on_commit=items_added
+        )
+        logging.info(f"Imported {stats.imported} items ({stats.rows_per_second} rows/s, {len(stats.errors)} errors)")
 
         return {
             "success": True,
-            "itemsImported": items_imported,
-            "errors": errors
+            "itemsImported": stats.imported,
+            "errors": stats.errors,
+            "rowsPerSecond": stats.rows_per_second
         }
     except Exception as e:
         logging.error(f"Error importing items: {e}")
@@ -857,108 +1968,183 @@ def import_items(file: UploadFile = File(...), db: Session = Depends(get_db)):
 @app.post("/api/import/containers", response_model=ImportResponse)
 def import_containers(file: UploadFile = File(...), db: Session = Depends(get_db)):
     try:
-        contents = file.file.read().decode('utf-8')
-        reader = csv.DictReader(contents.splitlines())
-        containers_imported = 0
-        errors = []
-
-        for row in reader:
-            try:
-                container_data = {
-                    "containerId": row.get("containerId", "").strip(),
-                    "zone": row.get("zone", "").strip(),
-                    "width": int(row["width"]) if row.get("width") else 0,
-                    "depth": int(row["depth"]) if row.get("depth") else 0,
-                    "height": int(row["height"]) if row.get("height") else 0
-                }
-
-                container = ContainerSchema(**container_data)
-                db_container = Container(**container.dict())
-                db.add(db_container)
-                db.commit()
-                containers_imported += 1
-
-            except (ValueError, KeyError, Exception) as e:
-                db.rollback()
-                errors.append({"row": row, "message": str(e)})
+        stats = stream_import(db, file.file, Container, parse_container_row)
+        catalog.containers.clear()
+        zone_index.clear()
+        logging.info(f"Imported {stats.imported} containers ({stats.rows_per_second} rows/s, {len(stats.errors)} errors)")
 
         return ImportResponse(
             success=True,
-            itemsImported=containers_imported,  # Reuse `itemsImported` for compatibility
-            errors=errors
+            itemsImported=stats.imported,  # Reuse `itemsImported` for compatibility
+            errors=stats.errors,
+            rowsPerSecond=stats.rows_per_second
         )
 
     except Exception as e:
         logging.error(f"Error importing containers: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to import containers")
 
-# API: Export Current Arrangement to CSV
-@app.get("/api/export/arrangement")
-def export_arrangement(db: Session = Depends(get_db)):
-    try:
-        rows = [["ItemID", "ContainerID", "Start Coordinates", "End Coordinates"]]  # Header row
+def format_coordinates(width: Optional[int], depth: Optional[int], height: Optional[int]) -> str:
+    if width is None:
+        return "N/A"
+    return f"({width},{depth},{height})"
+
+
+# Selectable export columns: query name -> (CSV header, value from an export row)
+EXPORT_COLUMNS = {
+    "itemId": ("ItemID", lambda r: r.itemId or "N/A"),
+    "name": ("Name", lambda r: r.name),
+    "containerId": ("ContainerID", lambda r: r.containerId or "N/A"),
+    "zone": ("Zone", lambda r: r.zone or "N/A"),
+    "startCoordinates": ("Start Coordinates", lambda r: format_coordinates(r.start_width, r.start_depth, r.start_height)),
+    "endCoordinates": ("End Coordinates", lambda r: format_coordinates(r.end_width, r.end_depth, r.end_height)),
+}
+DEFAULT_EXPORT_COLUMNS = ["itemId", "containerId", "startCoordinates", "endCoordinates"]
+EXPORT_CHUNK_ROWS = 1000
 
-        items = db.query(Item).all()
-        for item in items:
-            try:
-                placement = db.query(ItemPlacement).filter(ItemPlacement.item_id == item.id).first()
-                if placement:
-                    container = db.query(Container).filter(Container.id == placement.container_id).first()
-                    rows.append([
-                        item.itemId or "N/A",
-                        container.containerId if container else "N/A",
-                        str(placement.start_coordinates) if placement.start_coordinates else "N/A",
-                        str(placement.end_coordinates) if placement.end_coordinates else "N/A"
-                    ])
-                else:
-                    rows.append([item.itemId or "N/A", "N/A", "N/A", "N/A"])
-            except Exception as inner_err:
-                logging.warning(f"Skipping item {item.itemId} due to error: {inner_err}")
-                rows.append([item.itemId or "N/A", "Error", "Error", "Error"])
-
-        output = "\n".join([",".join(map(str, row)) for row in rows])
-        return Response(output, media_type="text/csv", headers={"Content-Disposition": "attachment;filename=arrangement.csv"})
 
+def stream_arrangement_csv(columns: List[str], compress: bool):
+    """
+    Yield the arrangement CSV in chunks from a single joined query.
+
+    Runs on its own session because the response body is produced after the
+    request's dependencies have been torn down.
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            select(Item.itemId, Item.name, Container.containerId, Container.zone, *PLACEMENT_BOX)
+            .outerjoin(ItemPlacement, ItemPlacement.item_id == Item.id)
+            .outerjoin(Container, Container.id == ItemPlacement.container_id)
+            .order_by(Item.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        getters = [EXPORT_COLUMNS[c][1] for c in columns]
+        compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([EXPORT_COLUMNS[c][0] for c in columns])
+
+        def drain():
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            return compressor.compress(data) if compressor else data
+
+        for rows in db.execute(query).partitions():
+            writer.writerows([get(row) for get in getters] for row in rows)
+            chunk = drain()
+            if chunk:
+                yield chunk
+        chunk = drain()
+        if compressor:
+            chunk += compressor.flush()
+        if chunk:
+            yield chunk
     except Exception as e:
         logging.error(f"Error exporting arrangement: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Failed to export arrangement")
+        raise
+    finally:
+        db.close()
+
+
+# API: Export Current Arrangement to CSV
+@app.get("/api/export/arrangement")
+def export_arrangement(
+    columns: Optional[str] = Query(None, example="itemId,containerId,startCoordinates,endCoordinates"),
+    compress: bool = Query(False, description="gzip the CSV"),
+):
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else DEFAULT_EXPORT_COLUMNS
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown export column(s): {', '.join(unknown)}. Choose from: {', '.join(EXPORT_COLUMNS)}"
+        )
+
+    filename = "arrangement.csv.gz" if compress else "arrangement.csv"
+    return StreamingResponse(
+        stream_arrangement_csv(selected, compress),
+        media_type="application/gzip" if compress else "text/csv",
+        headers={"Content-Disposition": f"attachment;filename={filename}"}
+    )
+
+def encode_log_cursor(log: Log) -> str:
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_log_cursor(cursor: str):
+    timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(timestamp), int(log_id)
+
 
 # API: Get Logs
 @app.get("/api/logs")
-def get_logs(
+async def get_logs(
     startDate: Optional[str] = Query(None, example="2025-03-10"),
     endDate: Optional[str] = Query(None, example="2025-03-15"),
     itemId: Optional[str] = Query(None, example="item001"),
     userId: Optional[str] = Query(None, example="astronaut1"),
     actionType: Optional[str] = Query(None, example="placement"),
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        query = db.query(Log)
+        query = select(Log)
 
         if startDate:
             try:
-                start_date = datetime.strptime(startDate, "%Y-%m-%d").date()
-                query = query.filter(Log.timestamp >= start_date)
+                start_date = datetime.strptime(startDate, "%Y-%m-%d")
+                query = query.where(Log.timestamp >= start_date)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid startDate format. Use YYYY-MM-DD.")
 
         if endDate:
             try:
-                end_date = datetime.strptime(endDate, "%Y-%m-%d").date()
-                query = query.filter(Log.timestamp <= end_date)
+                end_date = datetime.strptime(endDate, "%Y-%m-%d") + timedelta(days=1)
+                query = query.where(Log.timestamp < end_date)  # endDate is inclusive
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid endDate format. Use YYYY-MM-DD.")
 
         if itemId:
-            query = query.filter(Log.item_id == itemId)
+            query = query.where(Log.item_id == itemId)
         if userId:
-            query = query.filter(Log.user_id == userId)
+            query = query.where(Log.user_id == userId)
         if actionType:
-            query = query.filter(Log.action_type == actionType)
+            query = query.where(Log.action_type == actionType)
+
+        # Keyset pagination, newest first: continue strictly after the cursor row
+        if cursor:
+            try:
+                after_timestamp, after_id = decode_log_cursor(cursor)
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid cursor.")
+            query = query.where(
+                Log.timestamp <= after_timestamp,
+                or_(Log.timestamp < after_timestamp, Log.id < after_id)
+            )
 
-        logs = query.all()
-        return {"logs": logs}
+        query = query.order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit + 1)
+        logs = (await db.execute(query)).scalars().all()
+        next_cursor = encode_log_cursor(logs[limit - 1]) if len(logs) > limit else None
+        logs = logs[:limit]
+
+        return {
+            "logs": [
+                {
+                    "timestamp": log.timestamp.isoformat(),
+                    "userId": log.user_id,
+                    "actionType": log.action_type,
+                    "itemId": log.item_id,
+                    "containerId": log.container_id,
+                    "details": log.details
+                }
+                for log in logs
+            ],
+            "nextCursor": next_cursor
+        }
 
     except HTTPException:
         raise  # Re-raise HTTPExceptions as-is
@@ -966,9 +2152,22 @@ def get_logs(
         logging.error(f"Error getting logs: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve logs")
 
+
+# API: Prometheus metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# API: Catalog cache counters
+@app.get("/api/catalog/stats")
+async def catalog_stats():
+    return {"success": True, **catalog.stats()}
+
+
 # ✅ Test Route
 @app.get("/")
-def home():
+async def home():
     return {"message": "Space Cargo API is running!"}
 
 
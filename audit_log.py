@@ -0,0 +1,111 @@
+"""
+Batched audit-log sink.
+
+Request handlers hand log rows to `AuditLogWriter.submit`, which only puts
+them on an in-process queue. A daemon thread drains the queue and writes
+rows with one executemany INSERT per batch, so request latency no longer
+includes a commit for the audit row. In synchronous mode (meant for tests
+and scripts) every row is written before `submit` returns.
+"""
+from typing import Callable, List, Optional
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    def __init__(self, session_factory: Callable, model, flush_interval: float = 0.5,
+                 batch_size: int = 500, synchronous: bool = False):
+        self.session_factory = session_factory
+        self.table = model.__table__
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.synchronous = synchronous
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, row: dict):
+        if self.synchronous:
+            self._write([row])
+            return
+        self._ensure_started()
+        self._queue.put(row)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until every row submitted so far has been written."""
+        if self._thread is not None:
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Write everything still queued and stop the worker."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch: List[dict] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if stop:
+                # Drain whatever arrived before the stop marker
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif item is not _STOP:
+                        batch.append(item)
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, rows: List[dict]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(self.table), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # Never let audit logging break the caller or kill the worker
+            logging.error(f"Failed to write {len(rows)} audit log entries: {e}", exc_info=True)
+        finally:
+            db.close()
@@ -0,0 +1,315 @@
+"""
+Benchmarks for the cargo API and the algorithms behind it.
+
+Builds a synthetic station in a scratch SQLite database, drives the
+endpoints in-process through FastAPI's TestClient and times the placement,
+simulation, return planning and name search algorithms directly. Every
+benchmark reports p50/p99 latency and throughput; the whole run, including
+the configuration and the commit it ran on, is written as JSON so two runs
+on the same machine can be compared.
+
+    python benchmark.py --containers 200 --items 20000 --zone-skew 1.2 --output before.json
+
+The station is reproducible from --seed. Zone sizes follow a Zipf law
+(--zone-skew 0 spreads items evenly) and expiry dates are drawn from
+--expiry: none, uniform over --expiry-days, or front (most items expire
+early, as with fresh food).
+"""
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+EXPIRY_DISTRIBUTIONS = ("none", "uniform", "front")
+
+
+@dataclass
+class StationSpec:
+    containers: int = 100
+    items: int = 10000
+    zones: int = 8
+    zone_skew: float = 1.0
+    expiry: str = "uniform"
+    expiry_days: int = 365
+    expiring_share: float = 0.6  # share of items that have an expiry date at all
+    seed: int = 42
+
+
+@dataclass
+class BenchResult:
+    name: str
+    kind: str  # "endpoint" or "algorithm"
+    iterations: int
+    errors: int
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput_per_s: float
+
+
+def generate_station(spec: StationSpec, today: date):
+    """Containers and items as /api/containers and /api/items payloads."""
+    rng = random.Random(spec.seed)
+    zones = [f"Zone{z}" for z in range(spec.zones)]
+    weights = [1 / (rank ** spec.zone_skew) for rank in range(1, spec.zones + 1)]
+
+    # Containers are split by the same skew, at least one per zone
+    per_zone = [1] * spec.zones
+    for z in rng.choices(range(spec.zones), weights, k=max(spec.containers - spec.zones, 0)):
+        per_zone[z] += 1
+    containers = []
+    for z, count in enumerate(per_zone):
+        for _ in range(count):
+            containers.append({
+                "containerId": f"cont{len(containers):05d}",
+                "zone": zones[z],
+                "width": rng.choice((100, 150, 200)),
+                "depth": rng.choice((85, 100, 150)),
+                "height": rng.choice((150, 200)),
+            })
+
+    names = ["Food Packet", "Water Bottle", "Oxygen Cylinder", "First Aid Kit", "Medical Kit", "Battery Pack",
+             "Filter Cartridge", "Tool Kit", "Science Sample", "Spare Suit Glove", "Hygiene Kit", "Cable Set"]
+    items = []
+    for i, z in enumerate(rng.choices(range(spec.zones), weights, k=spec.items)):
+        expiry = None
+        if spec.expiry != "none" and rng.random() < spec.expiring_share:
+            if spec.expiry == "front":
+                days = min(int(rng.expovariate(5 / spec.expiry_days)), spec.expiry_days)
+            else:
+                days = rng.randint(0, spec.expiry_days)
+            expiry = (today + timedelta(days=days)).isoformat()
+        items.append({
+            "itemId": f"item{i:07d}",
+            "name": f"{rng.choice(names)} {rng.randint(1, 500)}",
+            "width": rng.randint(5, 40),
+            "depth": rng.randint(5, 40),
+            "height": rng.randint(5, 50),
+            "mass": round(rng.uniform(0.1, 20), 2),
+            "priority": rng.randint(1, 100),
+            "expiryDate": expiry,
+            "usageLimit": rng.choice((1, 5, 10, 50, 100)),
+            "preferredZone": zones[z],
+        })
+    return containers, items
+
+
+def measure(name: str, kind: str, call: Callable[[int], object], iterations: int, warmup: int = 1) -> BenchResult:
+    """Time `call(i)` for i in range(iterations); a falsy or raising call counts as an error."""
+    import numpy as np
+
+    for i in range(warmup):
+        call(-1 - i)
+    timings, errors = [], 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        try:
+            ok = call(i)
+        except Exception:
+            ok = False
+        timings.append(time.perf_counter() - t0)
+        errors += not ok
+    elapsed = time.perf_counter() - started
+    ms = np.array(timings) * 1000
+    return BenchResult(
+        name=name, kind=kind, iterations=iterations, errors=errors,
+        p50_ms=round(float(np.percentile(ms, 50)), 3),
+        p99_ms=round(float(np.percentile(ms, 99)), 3),
+        mean_ms=round(float(ms.mean()), 3),
+        throughput_per_s=round(iterations / elapsed, 1) if elapsed else 0.0,
+    )
+
+
+def load_station(app_module, client, containers: List[dict], items: List[dict]) -> Dict[str, float]:
+    """Ingest through the bulk endpoints, then stow everything the packer can place."""
+    m = app_module
+    timings = {}
+    t0 = time.perf_counter()
+    assert client.post("/api/containers", json=containers).json()["success"]
+    for start in range(0, len(items), 50000):
+        assert client.post("/api/items", json=items[start:start + 50000]).json()["success"]
+    timings["ingest_s"] = round(time.perf_counter() - t0, 3)
+
+    t0 = time.perf_counter()
+    packs = [m.PackContainer(c["containerId"], c["zone"], c["width"], c["depth"], c["height"]) for c in containers]
+    pack_items = [m.PackItem(i["itemId"], i["width"], i["depth"], i["height"], i["priority"], i["preferredZone"])
+                  for i in items]
+    placements, _ = m.plan_placements(pack_items, packs)
+    timings["initial_packing_s"] = round(time.perf_counter() - t0, 3)
+
+    with m.SessionLocal() as db:
+        item_ids = dict(db.execute(m.select(m.Item.itemId, m.Item.id)).all())
+        container_ids = dict(db.execute(m.select(m.Container.containerId, m.Container.id)).all())
+        rows = [
+            {"item_id": item_ids[p["itemId"]], "container_id": container_ids[p["containerId"]],
+             **m.placement_columns(m.position_to_box(p["position"]))}
+            for p in placements
+        ]
+        for start in range(0, len(rows), 20000):
+            db.execute(m.insert(m.ItemPlacement), rows[start:start + 20000])
+        db.commit()
+    m.occupancy.clear()
+    m.station.clear()
+    timings["placed_items"] = len(placements)
+    return timings
+
+
+def endpoint_benchmarks(app_module, client, spec: StationSpec, items: List[dict], iterations: int) -> List[BenchResult]:
+    m = app_module
+    rng = random.Random(spec.seed + 1)
+    ids = [i["itemId"] for i in items]
+    words = sorted({i["name"].split()[0] for i in items})
+    zones = sorted({i["preferredZone"] for i in items})
+    undock = client.get("/api/containers").json()["containers"][0]["containerId"]
+    results = []
+
+    def ok(response):
+        return response.status_code < 400
+
+    def run(name, call, n=iterations):
+        results.append(measure(name, "endpoint", call, n))
+
+    run("GET /api/items", lambda i: ok(client.get("/api/items")), max(iterations // 10, 3))
+    run("GET /api/items/{item_id}", lambda i: ok(client.get(f"/api/items/{rng.choice(ids)}")))
+    run("GET /api/search?itemId", lambda i: ok(client.get("/api/search", params={"itemId": rng.choice(ids)})))
+    run("GET /api/search/items", lambda i: ok(client.get("/api/search/items", params={"q": rng.choice(words)[:4]})))
+    run("POST /api/retrieve", lambda i: ok(client.post("/api/retrieve", json={"itemId": rng.choice(ids), "userId": "bench"})))
+
+    def placement(i):
+        batch = [
+            {**rng.choice(items), "itemId": f"bench{i}_{k}", "preferredZone": rng.choice(zones)}
+            for k in range(10)
+        ]
+        return ok(client.post("/api/placement", json={"items": batch, "timeBudgetMs": 200}))
+
+    run("POST /api/placement (10 items)", placement, max(iterations // 5, 3))
+    run("GET /api/waste/identify", lambda i: ok(client.get("/api/waste/identify")), max(iterations // 5, 3))
+    run("POST /api/waste/return-plan", lambda i: ok(client.post("/api/waste/return-plan", json={
+        "undockingContainerId": undock,
+        "undockingDate": (date.today() + timedelta(days=30)).isoformat(),
+        "maxWeight": 500, "timeBudgetMs": 200,
+    })), max(iterations // 5, 3))
+    run("POST /api/simulate/day", lambda i: ok(client.post("/api/simulate/day", json={
+        "numOfDays": 1, "itemsToBeUsedPerDay": [{"itemId": rng.choice(ids)} for _ in range(20)]
+    })), max(iterations // 5, 3))
+    run("GET /api/export/arrangement", lambda i: ok(client.get("/api/export/arrangement")), max(iterations // 20, 3))
+    run("GET /api/logs", lambda i: ok(client.get("/api/logs", params={"limit": 100})))
+    return results
+
+
+def algorithm_benchmarks(spec: StationSpec, containers: List[dict], items: List[dict], iterations: int) -> List[BenchResult]:
+    import numpy as np
+    from name_index import NameIndex
+    from placement import PackContainer, PackItem, plan_placements
+    from return_planner import WasteCandidate, solve_return_plan
+    from simulation import date_ordinals, simulate_days, usage_array
+
+    rng = random.Random(spec.seed + 2)
+    today = date.today()
+    results = []
+
+    def run(name, call, n):
+        results.append(measure(name, "algorithm", call, n))
+
+    pack_items = [PackItem(i["itemId"], i["width"], i["depth"], i["height"], i["priority"], i["preferredZone"])
+                  for i in items]
+
+    def pack(i):
+        packs = [PackContainer(c["containerId"], c["zone"], c["width"], c["depth"], c["height"]) for c in containers]
+        plan_placements(pack_items, packs)
+        return True
+
+    run(f"plan_placements ({len(items)} items)", pack, max(iterations // 50, 1))
+
+    expiry = date_ordinals(date.fromisoformat(i["expiryDate"]) if i["expiryDate"] else None for i in items)
+    remaining = usage_array(i["usageLimit"] for i in items)
+    uses = np.zeros(len(items), dtype=np.int64)
+    uses[rng.sample(range(len(items)), min(len(items), 500))] = 1
+    run("simulate_days (365 days)", lambda i: simulate_days(expiry, remaining, uses, today, 365) is not None, iterations)
+
+    candidates = [
+        WasteCandidate(i["itemId"], i["width"] * i["depth"] * i["height"], i["mass"], rng.randint(0, 5))
+        for i in rng.sample(items, min(len(items), 2000))
+    ]
+    capacity = sum(c.volume for c in candidates) / 4
+    run(f"solve_return_plan ({len(candidates)} candidates)",
+        lambda i: solve_return_plan(candidates, capacity, 500.0, time_budget=0.2) is not None, max(iterations // 10, 3))
+
+    index = NameIndex(lambda: ((i["itemId"], i["name"]) for i in items))
+    queries = [i["name"].split()[rng.randrange(2)][:rng.randint(3, 6)] for i in rng.sample(items, 50)]
+    run("NameIndex.search", lambda i: index.search(queries[i % len(queries)])[0] >= 0, iterations * 5)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--containers", type=int, default=StationSpec.containers)
+    parser.add_argument("--items", type=int, default=StationSpec.items)
+    parser.add_argument("--zones", type=int, default=StationSpec.zones)
+    parser.add_argument("--zone-skew", type=float, default=StationSpec.zone_skew)
+    parser.add_argument("--expiry", choices=EXPIRY_DISTRIBUTIONS, default=StationSpec.expiry)
+    parser.add_argument("--expiry-days", type=int, default=StationSpec.expiry_days)
+    parser.add_argument("--seed", type=int, default=StationSpec.seed)
+    parser.add_argument("--iterations", type=int, default=200, help="samples per endpoint benchmark")
+    parser.add_argument("--only", choices=("endpoints", "algorithms"), help="run one group only")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    spec = StationSpec(args.containers, args.items, args.zones, args.zone_skew, args.expiry, args.expiry_days,
+                       seed=args.seed)
+
+    today = date.today()
+    containers, items = generate_station(spec, today)
+    report = {
+        "startedAt": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "station": asdict(spec),
+        "setup": {},
+        "results": [],
+    }
+
+    if args.only != "algorithms":
+        # The app reads its database settings at import, so point it at a scratch file first
+        workdir = tempfile.mkdtemp(prefix="cargo-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ.setdefault("METRICS_QUERY_WARN_THRESHOLD", "100000")
+        from fastapi.testclient import TestClient
+        import app as app_module
+
+        with TestClient(app_module.app) as client:
+            report["setup"] = load_station(app_module, client, containers, items)
+            report["results"] += [asdict(r) for r in endpoint_benchmarks(app_module, client, spec, items, args.iterations)]
+    if args.only != "endpoints":
+        report["results"] += [asdict(r) for r in algorithm_benchmarks(spec, containers, items, args.iterations)]
+
+    print(f"{'benchmark':<44} {'n':>6} {'err':>4} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9}")
+    for r in report["results"]:
+        print(f"{r['name']:<44} {r['iterations']:>6} {r['errors']:>4} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['throughput_per_s']:>9.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Bulk inserts for the JSON ingestion endpoints (POST /api/items, /api/containers).
+
+Duplicates are found with one `key IN (...)` query per chunk of keys
+instead of one lookup per row, and the new rows go in as executemany
+INSERTs inside a single transaction. In strict mode any conflict rejects
+the whole batch; in partial mode conflicting rows are skipped and reported.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, List, Set
+import sqlite3
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+INSERT_CHUNK_SIZE = 5000
+
+
+@dataclass
+class BulkResult:
+    inserted: List[str] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)  # already stored, or repeated in the request
+
+
+def key_chunk_size(db: Session) -> int:
+    """How many bound parameters one IN (...) may use on this backend."""
+    if db.get_bind().dialect.name == "sqlite":
+        return 32000 if sqlite3.sqlite_version_info >= (3, 32) else 900
+    return 30000
+
+
+def existing_keys(db: Session, column, keys: List[str]) -> Set[str]:
+    found: Set[str] = set()
+    size = key_chunk_size(db)
+    for start in range(0, len(keys), size):
+        chunk = keys[start:start + size]
+        found.update(k for (k,) in db.execute(select(column).where(column.in_(chunk))))
+    return found
+
+
+@contextmanager
+def undo_on_error(db: Session):
+    """
+    Undo the block's writes if it raises, keeping any the caller made before.
+    pysqlite only opens its transaction at the first write, and a SAVEPOINT
+    taken before that is itself the outermost transaction, which commits on
+    RELEASE. So a SAVEPOINT is used only inside an open transaction; with
+    nothing written yet, a plain rollback undoes the block.
+    """
+    if getattr(db.connection().connection.dbapi_connection, "in_transaction", True):
+        with db.begin_nested():
+            yield
+    else:
+        try:
+            yield
+        except Exception:
+            db.rollback()
+            raise
+
+
+def bulk_insert(db: Session, model, key: str, rows: Iterable[dict], partial: bool = False,
+                chunk_size: int = INSERT_CHUNK_SIZE) -> BulkResult:
+    """
+    Insert `rows` into `model`'s table, deduplicating on the unique `key`
+    column. Nothing is written when a conflict is found and `partial` is
+    false. The rows are written in the caller's transaction, and the caller
+    commits or rolls back.
+    """
+    column = getattr(model, key)
+    result = BulkResult()
+    fresh: List[dict] = []
+    seen: Set[str] = set()
+    for row in rows:
+        if row[key] in seen:
+            result.conflicts.append(row[key])
+        else:
+            seen.add(row[key])
+            fresh.append(row)
+
+    stored = existing_keys(db, column, list(seen))
+    if stored:
+        result.conflicts.extend(row[key] for row in fresh if row[key] in stored)
+        fresh = [row for row in fresh if row[key] not in stored]
+    if result.conflicts and not partial:
+        return result
+
+    statement = insert(model.__table__)
+    try:
+        with undo_on_error(db):
+            for start in range(0, len(fresh), chunk_size):
+                db.execute(statement, fresh[start:start + chunk_size])
+    except IntegrityError:
+        # A concurrent writer took some keys after the IN check; look again once.
+        raced = existing_keys(db, column, [row[key] for row in fresh])
+        if not raced:
+            raise  # not a race: some other constraint rejected the rows
+        result.conflicts.extend(row[key] for row in fresh if row[key] in raced)
+        fresh = [row for row in fresh if row[key] not in raced]
+        if not partial:
+            return result
+        for start in range(0, len(fresh), chunk_size):
+            db.execute(statement, fresh[start:start + chunk_size])
+
+    result.inserted = [row[key] for row in fresh]
+    return result
@@ -0,0 +1,121 @@
+"""
+In-process cache of item and container rows.
+
+The hot request paths (item lookup, search, retrieve, placement
+confirmation) look rows up by `itemId` / `containerId`. The catalog keeps a
+read-only snapshot of each row it has loaded, bounded in size (least
+recently used entries go first) and in age (entries older than the TTL are
+reloaded). Every endpoint that writes items or containers invalidates the
+keys it touched after committing.
+
+A load that started before an invalidation is not stored: callers read
+`generation` before going to the database and pass it back to `put`.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+import threading
+import time
+
+from sqlalchemy import inspect
+
+
+class Record:
+    """Read-only copy of a row's column values, safe to share between requests."""
+    __slots__ = ("_values",)
+
+    def __init__(self, values: Dict[str, Any]):
+        object.__setattr__(self, "_values", values)
+
+    def __getattr__(self, name: str):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError("catalog records are read-only")
+
+    def __repr__(self):
+        return f"Record({self._values!r})"
+
+
+def snapshot(row) -> Record:
+    """Copy the column attributes of an ORM instance."""
+    return Record({attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs})
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return  # Loaded before a write we have not seen
+            if self.maxsize <= 0:
+                return
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxSize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class Catalog:
+    """Item records keyed by itemId and container records keyed by containerId."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.items = LRUCache(maxsize, ttl)
+        self.containers = LRUCache(maxsize, ttl)
+
+    def clear(self):
+        self.items.clear()
+        self.containers.clear()
+
+    def stats(self) -> dict:
+        return {"items": self.items.stats(), "containers": self.containers.stats()}
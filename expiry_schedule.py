@@ -0,0 +1,105 @@
+"""
+Expiry schedule: live items ordered by expiry date.
+
+A binary min-heap of (expiry ordinal, itemId) answers the two time queries
+without touching the items table:
+
+    expiring_before(d)  items whose expiry date is before d, O(k) heap walk
+    advance(d)          the same items, removed from the schedule, O(k log n)
+
+Removals and date changes are lazy: the current expiry of each item is kept
+in a dict and heap entries that disagree with it are skipped, then dropped
+when they make up half the heap.
+"""
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import heapq
+import threading
+
+
+class ExpirySchedule:
+    """
+    Built lazily by `loader()`, which returns (itemId, expiryDate) for every
+    item that is not waste yet; kept in sync through `add`, `remove` and
+    `clear` (which makes the next query reload).
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[str, Optional[date]]]]):
+        self.loader = loader
+        self._loaded = False
+        self._heap: List[Tuple[int, str]] = []
+        self._expiry: Dict[str, int] = {}  # itemId -> expiry ordinal of its live heap entry
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._expiry)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            for item_id, expiry in self.loader():
+                if expiry is not None:
+                    self._expiry[item_id] = expiry.toordinal()
+            self._heap = [(ordinal, item_id) for item_id, ordinal in self._expiry.items()]
+            heapq.heapify(self._heap)
+            self._loaded = True
+
+    def add(self, item_id: str, expiry: Optional[date]):
+        with self._lock:
+            if not self._loaded:
+                return
+            if expiry is None:
+                self._expiry.pop(item_id, None)
+                return
+            ordinal = expiry.toordinal()
+            if self._expiry.get(item_id) != ordinal:
+                self._expiry[item_id] = ordinal
+                heapq.heappush(self._heap, (ordinal, item_id))
+
+    def remove(self, item_ids: Iterable[str]):
+        with self._lock:
+            if not self._loaded:
+                return
+            for item_id in item_ids:
+                self._expiry.pop(item_id, None)
+            if len(self._heap) > 2 * len(self._expiry) + 64:
+                self._heap = [(o, i) for o, i in self._heap if self._expiry.get(i) == o]
+                heapq.heapify(self._heap)
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+            self._expiry.clear()
+            self._loaded = False
+
+    def expiring_before(self, day: date) -> List[Tuple[date, str]]:
+        """(expiryDate, itemId) of items expiring before `day`, in no particular order."""
+        limit = day.toordinal()
+        with self._lock:
+            self._ensure_loaded()
+            heap, found = self._heap, {}
+            stack = [0] if heap else []
+            # Children never sort before their parent, so only nodes below the limit are visited
+            while stack:
+                i = stack.pop()
+                ordinal, item_id = heap[i]
+                if ordinal >= limit:
+                    continue
+                if self._expiry.get(item_id) == ordinal:
+                    found[item_id] = ordinal  # a re-added item can have two live-looking entries
+                stack.extend(j for j in (2 * i + 1, 2 * i + 2) if j < len(heap))
+            return [(date.fromordinal(ordinal), item_id) for item_id, ordinal in found.items()]
+
+    def advance(self, day: date) -> List[Tuple[date, str]]:
+        """Remove and return the items expiring before `day`, earliest first."""
+        limit = day.toordinal()
+        with self._lock:
+            self._ensure_loaded()
+            heap, popped = self._heap, []
+            while heap and heap[0][0] < limit:
+                ordinal, item_id = heapq.heappop(heap)
+                if self._expiry.get(item_id) == ordinal:
+                    del self._expiry[item_id]
+                    popped.append((date.fromordinal(ordinal), item_id))
+            return popped
@@ -0,0 +1,104 @@
+"""
+Cross-process invalidation of the in-memory indexes.
+
+Every worker process keeps its own indexes and caches of the station and
+updates them in place after its own writes. So that several workers can
+serve one database, each transaction that writes a mirrored table also
+bumps a one-row counter in the same transaction. Before handling a request
+a worker reads the counter; if it moved past the bumps this process made
+itself, another process has written since, and the worker drops its indexes
+so they reload from the database on next use.
+
+A worker learns the value of its own bumps (UPDATE ... RETURNING), so its
+own writes never cost it a reload. A request that overlaps another
+process's write may still see the state from before it; the next request
+sees it.
+"""
+from typing import Iterable, Optional, Set
+import threading
+
+from sqlalchemy import Table, event, select, update
+from sqlalchemy.orm import Session
+
+_WRITES = "station_writes"        # session.info key: this transaction wrote a watched table
+_GENERATION = "station_generation"  # session.info key: the counter value it bumped to
+
+
+class GenerationCounter:
+    """
+    `table` holds the counter in its `value` column, in the row with id 1.
+    Writes to the tables named in `watched` bump it.
+    """
+
+    def __init__(self, table: Table, watched: Iterable[str]):
+        self.table = table
+        self.watched = set(watched)
+        self._lock = threading.Lock()
+        self._seen: Optional[int] = None  # every bump up to this one is reflected in memory
+        self._own: Set[int] = set()       # bumps of this process above `_seen`
+
+    def install(self, session_class=Session):
+        """Bump the counter from every session of `session_class`, async sessions included."""
+        event.listen(session_class, "do_orm_execute", self._executed)
+        event.listen(session_class, "after_flush", self._flushed)
+        event.listen(session_class, "before_commit", self._before_commit)
+        event.listen(session_class, "after_commit", self._after_commit)
+        event.listen(session_class, "after_rollback", self._after_rollback)
+
+    def current(self):
+        """Statement reading the counter."""
+        return select(self.table.c.value).where(self.table.c.id == 1)
+
+    def sync(self, value: int) -> bool:
+        """
+        Account for the counter `value` just read. True if another process
+        (or, the first time, anyone) wrote since the last call: the caller
+        must then drop its indexes.
+        """
+        with self._lock:
+            self._advance()
+            if self._seen is not None and value <= self._seen:
+                return False
+            self._seen = value
+            self._own = {v for v in self._own if v > value}
+            return True
+
+    def _advance(self):
+        while self._seen is not None and self._seen + 1 in self._own:
+            self._seen += 1
+            self._own.discard(self._seen)
+
+    def _executed(self, state):
+        if state.is_insert or state.is_update or state.is_delete:
+            table = getattr(state.statement, "table", None)
+            if getattr(table, "name", None) in self.watched:
+                state.session.info[_WRITES] = True
+
+    def _flushed(self, session: Session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if getattr(obj, "__tablename__", None) in self.watched:
+                session.info[_WRITES] = True
+                return
+
+    def _before_commit(self, session: Session):
+        if session.in_nested_transaction():
+            return
+        session.flush()  # commit would flush after this hook, too late to notice the writes
+        if session.info.pop(_WRITES, False):
+            session.info[_GENERATION] = session.connection().execute(
+                update(self.table).where(self.table.c.id == 1)
+                .values(value=self.table.c.value + 1).returning(self.table.c.value)
+            ).scalar_one()
+
+    def _after_commit(self, session: Session):
+        value = session.info.pop(_GENERATION, None)
+        if value is not None:
+            with self._lock:
+                self._own.add(value)
+                self._advance()
+
+    def _after_rollback(self, session: Session):
+        if session.in_nested_transaction():
+            return  # a savepoint: writes before it still commit
+        session.info.pop(_WRITES, None)
+        session.info.pop(_GENERATION, None)
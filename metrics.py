@@ -0,0 +1,191 @@
+"""
+Request and database metrics, exposed in the Prometheus text format.
+
+`MetricsMiddleware` times every request by route template (the path with
+its parameters left in, e.g. /api/items/{item_id}) and `instrument_engine`
+hooks SQLAlchemy's cursor events so each statement is counted against the
+request that ran it. The per-request tally lives in a context variable,
+which Starlette copies into the thread pool for sync endpoints and
+streaming bodies, so queries from loaders and generators count too.
+
+Requests that run more than `query_warn_threshold` statements are logged
+as likely N+1 loops.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+import bisect
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+UNMATCHED_ROUTE = "unmatched"  # keeps unknown paths from creating a label each
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label tuple."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+class Metrics:
+    def __init__(self, query_warn_threshold: int = 50):
+        self.query_warn_threshold = query_warn_threshold
+        self._lock = threading.Lock()
+        self.latency = Histogram(LATENCY_BUCKETS)             # (method, route)
+        self.queries_per_request = Histogram(QUERY_COUNT_BUCKETS)  # (method, route)
+        self.requests: Dict[Tuple[str, str, str], int] = {}   # (method, route, status) -> count
+        self.query_seconds: Dict[Tuple[str, str], float] = {}  # (method, route) -> seconds in the database
+        self.query_heavy: Dict[Tuple[str, str], int] = {}     # (method, route) -> requests over the threshold
+        self.background_queries = 0                           # statements run outside any request
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        labels = (method, route)
+        heavy = stats.queries > self.query_warn_threshold
+        with self._lock:
+            self.latency.observe(labels, seconds)
+            self.queries_per_request.observe(labels, stats.queries)
+            key = (method, route, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.query_seconds[labels] = self.query_seconds.get(labels, 0.0) + stats.query_seconds
+            if heavy:
+                self.query_heavy[labels] = self.query_heavy.get(labels, 0) + 1
+        if heavy:
+            logging.warning(
+                "%s %s ran %d queries (%.1f ms in the database), over the N+1 threshold of %d",
+                method, route, stats.queries, stats.query_seconds * 1000, self.query_warn_threshold
+            )
+
+    def record_background_query(self):
+        with self._lock:
+            self.background_queries += 1
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            _histogram(lines, "http_request_duration_seconds", "Request latency by route.", self.latency)
+            _counter(lines, "http_requests_total", "Requests by route and status.",
+                     ("method", "route", "status"), self.requests)
+            _histogram(lines, "db_queries_per_request", "SQL statements run per request.", self.queries_per_request)
+            _counter(lines, "db_query_duration_seconds_total", "Time spent executing SQL, by route.",
+                     ("method", "route"), self.query_seconds)
+            _counter(lines, "db_query_heavy_requests_total", "Requests over the N+1 query threshold.",
+                     ("method", "route"), self.query_heavy)
+            _counter(lines, "db_background_queries_total", "SQL statements run outside a request.",
+                     (), {(): self.background_queries})
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _counter(lines: list, name: str, help_text: str, names: Sequence[str], values: dict):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(names, labels)} {value}")
+
+
+def _histogram(lines: list, name: str, help_text: str, histogram: Histogram):
+    names = ("method", "route")
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, series in sorted(histogram.series.items()):
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), series):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(names, labels)} {series[-1]}")
+        lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+
+
+def instrument_engine(engine: Engine, metrics: Metrics):
+    """Count and time every statement `engine` executes (pass `sync_engine` for async engines)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            metrics.record_background_query()
+            return
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - conn.info.get("query_started", time.perf_counter())
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware, so a streaming response is timed until its last
+    chunk is sent rather than until its headers are.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def finish():
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                route = scope.get("route")
+                path = getattr(route, "path", None) or UNMATCHED_ROUTE
+                self.metrics.record_request(scope["method"], path, status, time.perf_counter() - started, stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _current.reset(token)
@@ -0,0 +1,118 @@
+"""
+Mission clock, simulation event log and snapshots.
+
+Everything that changes an item's simulated state is appended to the event
+log in the same transaction as the change itself:
+
+    added      an item arrives (details: expiryDate, usageLimit, isWaste)
+    usage      `uses` uses were consumed; an item that reaches zero is waste
+    expiry     the item expired on `day`
+    deleted    the item was deleted
+    undocked   the item left the station with an undocking container
+
+A snapshot is the full state after a given event, so the state after any
+event is the nearest earlier snapshot plus the events in between. Mission
+days only move forward, so "state on day D" is the state after the last
+event logged on or before D.
+"""
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import zlib
+
+import numpy as np
+
+from simulation import NO_EXPIRY, NO_LIMIT
+
+ADDED = "added"
+USAGE = "usage"
+EXPIRY = "expiry"
+DELETED = "deleted"
+UNDOCKED = "undocked"
+
+
+@dataclass
+class MissionState:
+    """
+    Simulated state of every item on the station after event `event_id`.
+    items: itemId -> [expiry ordinal or None, remaining uses or None, is waste]
+    """
+    day: date
+    event_id: int = 0
+    items: Dict[str, list] = field(default_factory=dict)
+
+    def apply(self, event_id: int, day: date, event_type: str, item_id: str,
+              uses: Optional[int] = None, details: Optional[dict] = None):
+        self.event_id = event_id
+        self.day = max(self.day, day)
+        if event_type == ADDED:
+            expiry = details.get("expiryDate")
+            self.items[item_id] = [
+                date.fromisoformat(expiry).toordinal() if expiry else None,
+                details.get("usageLimit"),
+                bool(details.get("isWaste"))
+            ]
+            return
+        entry = self.items.get(item_id)
+        if entry is None:
+            return
+        if event_type == USAGE:
+            if entry[1] is not None:
+                entry[1] = max(entry[1] - (uses or 0), 0)
+                entry[2] = entry[2] or entry[1] == 0
+        elif event_type == EXPIRY:
+            entry[2] = True
+        elif event_type in (DELETED, UNDOCKED):
+            del self.items[item_id]
+
+    def copy(self) -> "MissionState":
+        return MissionState(self.day, self.event_id, {k: list(v) for k, v in self.items.items()})
+
+    def waste_ids(self) -> List[str]:
+        return [item_id for item_id, (_, _, waste) in self.items.items() if waste]
+
+    def to_bytes(self) -> bytes:
+        payload = {
+            "day": self.day.isoformat(),
+            "eventId": self.event_id,
+            "items": [[item_id, *entry] for item_id, entry in self.items.items()]
+        }
+        return zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MissionState":
+        payload = json.loads(zlib.decompress(data))
+        items = {row[0]: [row[1], row[2], bool(row[3])] for row in payload["items"]}
+        return cls(date.fromisoformat(payload["day"]), payload["eventId"], items)
+
+    def to_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Columns for simulation.simulate_days: (itemIds, expiry, remaining, is_waste)."""
+        ids = list(self.items)
+        n = len(ids)
+        entries = self.items.values()
+        expiry = np.fromiter((NO_EXPIRY if e[0] is None else e[0] for e in entries), dtype=np.int64, count=n)
+        remaining = np.fromiter((NO_LIMIT if e[1] is None else e[1] for e in entries), dtype=np.int64, count=n)
+        waste = np.fromiter((e[2] for e in entries), dtype=bool, count=n)
+        return ids, expiry, remaining, waste
+
+
+def added_details(expiry: Optional[date], usage_limit: Optional[int], is_waste: bool) -> dict:
+    return {
+        "expiryDate": expiry.isoformat() if expiry else None,
+        "usageLimit": usage_limit,
+        "isWaste": bool(is_waste)
+    }
+
+
+def event_row(day: date, event_type: str, item_id: str, uses: Optional[int] = None,
+              details: Optional[dict] = None) -> dict:
+    """Column values for one row of the simulation_events table."""
+    return {"day": day, "eventType": event_type, "itemId": item_id, "uses": uses, "details": details}
+
+
+def replay(state: MissionState, events: Iterable[tuple]) -> MissionState:
+    """Apply (id, day, eventType, itemId, uses, details) rows in log order."""
+    for event_id, day, event_type, item_id, uses, details in events:
+        state.apply(event_id, day, event_type, item_id, uses, details)
+    return state
@@ -0,0 +1,331 @@
+"""
+In-memory search index over item names.
+
+Names are normalized (case-folded, whitespace collapsed) and split into
+words. Every distinct name gets a small integer id; each word of the
+vocabulary keeps the set of names that contain it. The vocabulary itself is
+small (catalogs reuse a few thousand words), so a query is resolved word by
+word against the vocabulary first and then with set operations on the name
+postings, without touching each matching name in Python:
+
+    exact      the whole name equals the query
+    prefix     the first word starts with the first query word and every
+               other query word starts a word of the name
+    word       every query word starts a word of the name
+    substring  every query word appears inside a word of the name
+    fuzzy      every query word is within a small edit distance of a word
+               of the name (or of its beginning, for half-typed words)
+
+Inside a tier shorter names come first. Only the names needed for the
+requested page are ordered, so deep result lists stay cheap.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import bisect
+import threading
+
+MATCH_NAMES = ("exact", "prefix", "word", "substring", "fuzzy")
+
+
+@dataclass
+class NameMatch:
+    itemId: str
+    name: str
+    match: str
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(word: str) -> int:
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent
+    transpositions), or limit + 1 as soon as it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    Name index over all items, built lazily by `loader()`, which returns
+    (itemId, name) pairs. After that it is kept in sync through `add`,
+    `remove` and `clear` (which makes the next query reload).
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[str, str]]]):
+        self.loader = loader
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._names: Dict[str, str] = {}                 # itemId -> name as stored
+        self._name_ids: Dict[str, int] = {}              # normalized name -> name id
+        self._items: Dict[int, Set[str]] = {}            # name id -> itemIds
+        self._keys: Dict[int, str] = {}                  # name id -> normalized name
+        self._extra: Dict[int, int] = {}                 # name id -> items beyond the first, for shared names
+        self._shared: Set[int] = set()                   # keys of _extra, as a set for fast intersections
+        self._by_length: Dict[int, Set[int]] = {}        # name length -> name ids
+        self._postings: Dict[str, Set[int]] = {}         # word -> name ids containing it
+        self._first: Dict[str, Set[int]] = {}            # word -> name ids starting with it
+        self._vocabulary: List[str] = []                 # sorted words, for prefix lookups
+        self._word_grams: Dict[str, Set[str]] = {}       # trigram -> words, for substring/fuzzy lookups
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._names)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            for item_id, name in self.loader():
+                self._add(item_id, name)
+            self._loaded = True
+
+    def add(self, item_id: str, name: Optional[str]):
+        with self._lock:
+            if self._loaded:
+                self._remove(item_id)
+                self._add(item_id, name)
+
+    def remove(self, item_id: str):
+        with self._lock:
+            if self._loaded:
+                self._remove(item_id)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._loaded = False
+
+    def _add(self, item_id: str, name: Optional[str]):
+        if not name:
+            return
+        self._names[item_id] = name
+        key = normalize(name)
+        name_id = self._name_ids.get(key)
+        if name_id is None:
+            name_id = self._name_ids[key] = self._next_id
+            self._next_id += 1
+            self._items[name_id] = set()
+            self._keys[name_id] = key
+            self._by_length.setdefault(len(key), set()).add(name_id)
+            words = key.split()
+            for word in words:
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = set()
+                    bisect.insort(self._vocabulary, word)
+                    for gram in trigrams(word):
+                        self._word_grams.setdefault(gram, set()).add(word)
+                postings.add(name_id)
+            self._first.setdefault(words[0], set()).add(name_id)
+        ids = self._items[name_id]
+        ids.add(item_id)
+        if len(ids) > 1:
+            self._extra[name_id] = len(ids) - 1
+            self._shared.add(name_id)
+
+    def _remove(self, item_id: str):
+        name = self._names.pop(item_id, None)
+        if name is None:
+            return
+        key = normalize(name)
+        name_id = self._name_ids[key]
+        ids = self._items[name_id]
+        ids.discard(item_id)
+        if len(ids) > 1:
+            self._extra[name_id] = len(ids) - 1
+        else:
+            self._extra.pop(name_id, None)
+            self._shared.discard(name_id)
+        if ids:
+            return
+        del self._name_ids[key], self._items[name_id], self._keys[name_id]
+        self._discard(self._by_length, len(key), name_id)
+        words = key.split()
+        self._discard(self._first, words[0], name_id)
+        for word in words:
+            if self._discard(self._postings, word, name_id):
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+                for gram in trigrams(word):
+                    self._discard(self._word_grams, gram, word)
+
+    @staticmethod
+    def _discard(index: dict, key, value) -> bool:
+        """Remove `value` from index[key]; True when that emptied the entry."""
+        values = index.get(key)
+        if values is None:
+            return False
+        values.discard(value)
+        if not values:
+            del index[key]
+            return True
+        return False
+
+    def exact(self, name: str) -> List[str]:
+        """itemIds whose stored name is exactly `name`, in id order."""
+        with self._lock:
+            self._ensure_loaded()
+            name_id = self._name_ids.get(normalize(name))
+            if name_id is None:
+                return []
+            return sorted(i for i in self._items[name_id] if self._names[i] == name)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[NameMatch]]:
+        """Ranked matches for `query` as (total items matched, requested page)."""
+        key = normalize(query)
+        if not key:
+            return 0, []
+        with self._lock:
+            self._ensure_loaded()
+            tiers = self._tiers(key)
+            sizes = [self._count(tier) for tier in tiers]
+            page: List[NameMatch] = []
+            skip = offset
+            for rank, (tier, size) in enumerate(zip(tiers, sizes)):
+                if len(page) >= limit:
+                    break
+                if skip >= size:
+                    skip -= size
+                    continue
+                # Every name holds at least one item, so skip + limit names always cover the page
+                for name_id in self._first_names(tier, skip + limit - len(page)):
+                    ids = sorted(self._items[name_id])
+                    if skip >= len(ids):
+                        skip -= len(ids)
+                        continue
+                    for item_id in ids[skip:skip + limit - len(page)]:
+                        page.append(NameMatch(item_id, self._names[item_id], MATCH_NAMES[rank]))
+                    skip = 0
+                    if len(page) >= limit:
+                        break
+            return sum(sizes), page
+
+    def _count(self, names: Set[int]) -> int:
+        """Items held by a set of names."""
+        return len(names) + sum(map(self._extra.__getitem__, names & self._shared))
+
+    def _first_names(self, names: Set[int], count: int) -> List[int]:
+        """The `count` shortest names (ties by name), without ordering the whole set."""
+        picked: List[int] = []
+        for length in sorted(self._by_length):
+            if len(picked) >= count:
+                break
+            bucket = names & self._by_length[length]
+            picked.extend(sorted(bucket, key=self._keys.__getitem__))
+        return picked[:count]
+
+    def _tiers(self, key: str) -> List[Set[int]]:
+        # The tiers are nested (exact within prefix within word within substring
+        # within fuzzy); each is built from the previous one and then made disjoint.
+        words = key.split()
+        exact = {self._name_ids[key]} if key in self._name_ids else set()
+
+        word_sets = []
+        substring_sets = []
+        fuzzy_sets = []
+        for w in words:
+            starting = self._words_with_prefix(w)
+            containing = [c for c in self._words_containing(w) if not c.startswith(w)]
+            near = [n for n in self._words_near(w) if w not in n]
+            word_sets.append(self._postings_of(self._postings, starting))
+            substring_sets.append(word_sets[-1] + self._postings_of(self._postings, containing))
+            fuzzy_sets.append(substring_sets[-1] + self._postings_of(self._postings, near))
+
+        word = self._intersect_unions(word_sets)
+        prefix = word & self._intersect_unions([self._postings_of(self._first, self._words_with_prefix(words[0]))])
+        substring = self._intersect_unions(substring_sets) if substring_sets != word_sets else set()
+        fuzzy = self._intersect_unions(fuzzy_sets) if fuzzy_sets != substring_sets else set()
+
+        fuzzy -= substring or word
+        substring -= word
+        word -= prefix
+        prefix -= exact
+        return [exact, prefix, word, substring, fuzzy]
+
+    @staticmethod
+    def _postings_of(index: Dict[str, Set[int]], words: Iterable[str]) -> List[Set[int]]:
+        return [index[w] for w in words if w in index]
+
+    @staticmethod
+    def _intersect_unions(groups: List[List[Set[int]]]) -> Set[int]:
+        """
+        Names in at least one set of every group. Starts from the smallest
+        group and filters it against the others, so large posting sets are
+        probed rather than copied.
+        """
+        groups = sorted(groups, key=lambda sets: sum(map(len, sets)))
+        if not groups or not groups[0]:
+            return set()
+        result = set().union(*groups[0])
+        for sets in groups[1:]:
+            if not result:
+                break
+            if len(result) * len(sets) <= sum(map(len, sets)):
+                result = set().union(*(result & s for s in sets))
+            else:
+                result &= set().union(*sets)
+        return result
+
+    def _words_with_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\U0010ffff", start)
+        return self._vocabulary[start:end]
+
+    def _words_containing(self, part: str) -> List[str]:
+        if len(part) < 3:
+            return self._words_with_prefix(part)
+        grams = {part[i:i + 3] for i in range(len(part) - 2)}
+        sets = sorted((self._word_grams.get(g, set()) for g in grams), key=len)
+        if not sets[0]:
+            return []
+        return [w for w in sets[0].intersection(*sets[1:]) if part in w]
+
+    def _words_near(self, word: str) -> List[str]:
+        k = max_edits(word)
+        if not k:
+            return []
+        # q-gram lemma: a word within k edits shares at least |grams| - 3k padded trigrams
+        grams = trigrams(word)
+        needed = max(len(grams) - 3 * k, 1)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._word_grams.get(gram, ()))
+        near = []
+        for candidate, count in shared.items():
+            if count < needed - 1:  # allow one more miss for the half-typed comparison below
+                continue
+            # Compare with the whole word and with its beginning, for words still being typed
+            if (edit_distance(word, candidate, k) <= k or
+                    edit_distance(word, candidate[:len(word)], k) <= k):
+                near.append(candidate)
+        return near
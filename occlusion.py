@@ -0,0 +1,59 @@
+"""
+Blocks-access graph for retrieving items through a container's open face.
+
+Items are pulled out along the depth axis towards the depth == 0 face, so an
+item A blocks item B when A lies entirely in front of B (A.depth1 <= B.depth0)
+and their width/height footprints overlap. The graph keeps those edges per
+container and is updated incrementally from the spatial index, so working out
+what has to come out first only walks the blockers themselves.
+"""
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+Box = Tuple[int, int, int, int, int, int]
+
+
+class OcclusionGraph:
+    def __init__(self, tree, depth: int):
+        # `tree` is the container's spatial_index.RTree; the graph only reads it.
+        self.tree = tree
+        self.depth = depth
+        self.blockers: Dict[Hashable, Set[Hashable]] = {}  # item -> items directly in front of it
+        self.blocking: Dict[Hashable, Set[Hashable]] = {}  # item -> items directly behind it
+
+    def add(self, key, box: Box):
+        """Register an item that has just been inserted into `tree`."""
+        front = (box[0], 0, box[2], box[3], box[1], box[5])
+        behind = (box[0], box[4], box[2], box[3], self.depth, box[5])
+        in_front = {k for k in self.tree.search(front) if k != key}
+        behind_it = {k for k in self.tree.search(behind) if k != key}
+        self.blockers[key] = in_front
+        self.blocking[key] = behind_it
+        for k in in_front:
+            self.blocking.setdefault(k, set()).add(key)
+        for k in behind_it:
+            self.blockers.setdefault(k, set()).add(key)
+
+    def remove(self, key):
+        for k in self.blockers.pop(key, ()):
+            self.blocking.get(k, set()).discard(key)
+        for k in self.blocking.pop(key, ()):
+            self.blockers.get(k, set()).discard(key)
+
+    def blockers_of(self, targets: Iterable[Hashable]) -> Set[Hashable]:
+        """Every item that must be moved before all of `targets` can be pulled out."""
+        targets = set(targets)
+        seen: Set[Hashable] = set()
+        stack = list(targets)
+        while stack:
+            for k in self.blockers.get(stack.pop(), ()):
+                if k not in seen:
+                    seen.add(k)
+                    stack.append(k)
+        return seen - targets
+
+    def removal_order(self, keys: Iterable[Hashable]) -> List[Hashable]:
+        """
+        Order items front to back. Blocking edges always point from a smaller
+        depth to a larger one, so this is a topological order of the graph.
+        """
+        return sorted(keys, key=lambda k: (self.tree.box_of(k)[1], str(k)))
@@ -0,0 +1,322 @@
+"""
+3D placement engine used by /api/placement.
+
+Items are packed with an extreme-point heuristic: every placed box spawns
+new candidate corners, and each item is tried at the corners of a container
+in front-to-back order, in all six axis-aligned orientations. Corners whose
+free reach is too short for an item, or that already turned away a smaller
+one, are skipped without a collision check. Coordinates follow the API
+convention (width, depth, height) and the open face of a container is the
+depth == 0 plane, so higher-priority items, which are packed first, end up
+closest to the opening.
+"""
+from dataclasses import dataclass, field
+from itertools import permutations
+from typing import Dict, List, Optional, Set, Tuple
+import bisect
+import math
+
+from spatial_index import Box, ContainerOccupancy, fits_within, volume as box_volume
+
+
+@dataclass
+class PackItem:
+    itemId: str
+    width: int
+    depth: int
+    height: int
+    priority: int = 0
+    preferredZone: Optional[str] = None
+
+    @property
+    def volume(self) -> int:
+        return self.width * self.depth * self.height
+
+
+@dataclass
+class PackContainer:
+    containerId: str
+    zone: str
+    width: int
+    depth: int
+    height: int
+    occupancy: Optional[ContainerOccupancy] = None  # live index of already placed items
+    ignore: Set[str] = field(default_factory=set)  # placed items that are being re-planned
+    # Upper bound on the sorted dimensions of an item that can still fit, see
+    # ContainerOccupancy.fit_bound; it must ignore the same items. Defaults to
+    # the container's own dimensions.
+    fit: Optional[Tuple[int, int, int]] = None
+
+    def __post_init__(self):
+        if self.fit is None:
+            self.fit = tuple(sorted((self.width, self.depth, self.height)))
+        self._unbounded: List[Tuple[int, int, int]] = []  # extreme points added since `fit` was updated
+        # Boxes planned in this batch; the live occupancy is only read.
+        self.planned = ContainerOccupancy(self.width, self.depth, self.height)
+        self.free_volume = self.width * self.depth * self.height
+        self.points: Optional[List[Tuple[int, int, int]]] = None
+        if self.occupancy is not None:
+            self.free_volume = self.occupancy.free_volume
+            for key in self.ignore:
+                box = self.occupancy.box_of(key)
+                if box is not None:
+                    self.free_volume += box_volume(box)
+        # Sorted dimensions of items that did not fit; free space only shrinks,
+        # so anything at least as large in every dimension can be skipped.
+        self.rejected: List[Tuple[int, int, int]] = []
+        # The same per extreme point, along with the point's reach (free
+        # distance along each axis, then sorted) when first tried. Both stay
+        # valid bounds for the rest of the batch.
+        self._point_rejected: Dict[Tuple[int, int, int], List[Tuple[int, int, int]]] = {}
+        self._reach: Dict[Tuple[int, int, int], Tuple[int, ...]] = {}
+
+    def _ensure_points(self):
+        # Extreme points kept sorted front-to-back: (depth, height, width).
+        if self.points is None:
+            self.points = [(0, 0, 0)]
+            if self.occupancy is not None:
+                for _, box in self.occupancy.boxes(self.ignore):
+                    self._add_corner_points(box)
+            self._unbounded = []  # the stored layout is what `fit` was given for
+
+    def collides(self, box: Box) -> bool:
+        if self.planned.collides(box):
+            return True
+        return self.occupancy is not None and self.occupancy.collides(box, self.ignore)
+
+    def add(self, item_id: str, box: Box):
+        self._ensure_points()
+        self.planned.place(item_id, box)
+        self.free_volume -= box_volume(box)
+        self.points = [
+            p for p in self.points
+            if not (box[0] <= p[2] < box[3] and box[1] <= p[0] < box[4] and box[2] <= p[1] < box[5])
+        ]
+        self._add_corner_points(box)
+
+    def _add_corner_points(self, box: Box):
+        for w, d, h in ((box[3], box[1], box[2]), (box[0], box[4], box[2]), (box[0], box[1], box[5])):
+            if w < self.width and d < self.depth and h < self.height:
+                point = (d, h, w)
+                i = bisect.bisect_left(self.points, point)
+                if i == len(self.points) or self.points[i] != point:
+                    self.points.insert(i, point)
+                    self._unbounded.append((w, d, h))
+
+    def is_rejected(self, dims: Tuple[int, int, int]) -> bool:
+        return _dominates(dims, self.rejected)
+
+    def may_fit(self, dims: Tuple[int, int, int]) -> bool:
+        """
+        False when sorted `dims` certainly do not fit. Free space only
+        shrinks, so the bound stays valid as boxes are added; the new extreme
+        points they create are folded in only when an item would be ruled out.
+        """
+        if self.is_rejected(dims):
+            return False
+        if fits_within(dims, self.fit):
+            return True
+        if self._unbounded:
+            bound = self.fit
+            for point in self._unbounded:
+                reach = self.planned.reach(point)
+                if reach is None:
+                    continue
+                if self.occupancy is not None:
+                    stored = self.occupancy.reach(point, self.ignore)
+                    if stored is None:
+                        continue
+                    reach = tuple(map(min, reach, stored))
+                a, b, c = sorted(reach)
+                bound = (max(bound[0], a), max(bound[1], b), max(bound[2], c))
+            self.fit = bound
+            self._unbounded = []
+            return fits_within(dims, bound)
+        return False
+
+    def try_place(self, item: PackItem) -> Optional[Box]:
+        """
+        Return the first collision-free box for the item at one of the
+        container's extreme points, or None if it does not fit anywhere.
+        """
+        if item.volume > self.free_volume:
+            return None
+        dims = tuple(sorted((item.width, item.depth, item.height)))
+        if not self.may_fit(dims):
+            return None
+
+        self._ensure_points()
+        rotations = orientations(item.width, item.depth, item.height)
+        for point in self.points:
+            reach = self._reach.get(point)
+            if reach is None:
+                reach = self._reach[point] = self._measure(point)
+            if dims[0] > reach[3] or dims[1] > reach[4] or dims[2] > reach[5]:
+                continue
+            rejected = self._point_rejected.get(point)
+            if rejected is not None and _dominates(dims, rejected):
+                continue
+            d, h, w = point
+            for rw, rd, rh in rotations:
+                if rw > reach[0] or rd > reach[1] or rh > reach[2]:
+                    continue
+                box = (w, d, h, w + rw, d + rd, h + rh)
+                if not self.collides(box):
+                    return box
+            self._point_rejected.setdefault(point, []).append(dims)
+
+        self.rejected.append(dims)
+        return None
+
+    def _measure(self, point: Tuple[int, int, int]) -> Tuple[int, ...]:
+        """Reach from an extreme point (depth, height, width), then the same sorted; zeros if occupied."""
+        d, h, w = point
+        reach = self.planned.reach((w, d, h))
+        if reach is not None and self.occupancy is not None:
+            stored = self.occupancy.reach((w, d, h), self.ignore)
+            reach = None if stored is None else tuple(map(min, reach, stored))
+        if reach is None:
+            return (0,) * 6
+        return (*reach, *sorted(reach))
+
+
+def _dominates(dims: Tuple[int, int, int], rejected: List[Tuple[int, int, int]]) -> bool:
+    """Whether sorted `dims` are at least as large in every dimension as one of `rejected`."""
+    for r in rejected:
+        if dims[0] >= r[0] and dims[1] >= r[1] and dims[2] >= r[2]:
+            return True
+    return False
+
+
+def orientations(width: int, depth: int, height: int) -> List[Tuple[int, int, int]]:
+    """
+    All distinct axis-aligned orientations, shallowest first so items take
+    up as little of the container depth as possible.
+    """
+    unique = set(permutations((width, depth, height)))
+    return sorted(unique, key=lambda r: (r[1], r[2], r[0]))
+
+
+def box_to_position(box: Box) -> dict:
+    return {
+        "startCoordinates": {"width": box[0], "depth": box[1], "height": box[2]},
+        "endCoordinates": {"width": box[3], "depth": box[4], "height": box[5]},
+    }
+
+
+def position_to_box(position: dict) -> Box:
+    start = position["startCoordinates"]
+    end = position["endCoordinates"]
+    return (
+        int(start["width"]), int(start["depth"]), int(start["height"]),
+        int(end["width"]), int(end["depth"]), int(end["height"]),
+    )
+
+
+CONTAINER_ORDERS = ("emptiest", "fullest")
+
+
+class CandidateIndex:
+    """
+    Containers of a batch by zone, each zone kept sorted by free volume, so
+    the containers with room for an item are found by bisection instead of
+    sorting every zone for every item. Call `update` after adding to one.
+    """
+
+    def __init__(self, containers: List[PackContainer], container_order: str = "emptiest"):
+        self.fullest_first = container_order == "fullest"
+        self._keys: Dict[int, tuple] = {}
+        self._zones: Dict[str, List[tuple]] = {}
+        self._all: List[tuple] = []  # every zone, for items that fall back to the rest of the station
+        # Grouped by zone (in order of first appearance) so ties fall the same way in both lists
+        zone_rank: Dict[str, int] = {}
+        for container in containers:
+            zone_rank.setdefault(container.zone, len(zone_rank))
+        containers = sorted(containers, key=lambda c: zone_rank[c.zone])
+        self._containers = containers
+        for seq, container in enumerate(containers):
+            key = self._key(seq, container)
+            self._keys[seq] = key
+            self._zones.setdefault(container.zone, []).append(key)
+            self._all.append(key)
+        for ordered in (*self._zones.values(), self._all):
+            ordered.sort()
+        self._seq = {id(c): seq for seq, c in enumerate(containers)}
+
+    def _key(self, seq: int, container: PackContainer) -> tuple:
+        # Ties keep the caller's container order in either direction
+        return (container.free_volume, seq if self.fullest_first else -seq)
+
+    def in_zone(self, item: PackItem, zone: Optional[str]):
+        """Containers of `zone` that may fit `item`, in container order."""
+        return self._scan(self._zones.get(zone, []), item, skip_zone=None)
+
+    def outside_zone(self, item: PackItem, zone: Optional[str]):
+        """Containers of every other zone that may fit `item`, in container order."""
+        return self._scan(self._all, item, skip_zone=zone)
+
+    def _scan(self, ordered: List[tuple], item: PackItem, skip_zone: Optional[str]):
+        # Only the containers with enough free volume, then the free-box bound
+        start = bisect.bisect_left(ordered, (item.volume, -math.inf))
+        positions = range(start, len(ordered)) if self.fullest_first else range(len(ordered) - 1, start - 1, -1)
+        dims = tuple(sorted((item.width, item.depth, item.height)))
+        for i in positions:
+            container = self._containers[ordered[i][1] if self.fullest_first else -ordered[i][1]]
+            if (skip_zone is not None and container.zone == skip_zone) or not container.may_fit(dims):
+                continue
+            yield container
+
+    def update(self, container: PackContainer):
+        seq = self._seq[id(container)]
+        old, new = self._keys[seq], self._key(seq, container)
+        for ordered in (self._zones[container.zone], self._all):
+            del ordered[bisect.bisect_left(ordered, old)]
+            bisect.insort(ordered, new)
+        self._keys[seq] = new
+
+
+def plan_placements(items: List[PackItem], containers: List[PackContainer],
+                    container_order: str = "emptiest") -> Tuple[List[dict], List[str]]:
+    """
+    Place a batch of items into the given containers.
+
+    Items are packed highest priority first (largest first within a priority)
+    and each item tries the containers of its preferred zone before falling
+    back to the rest of the station. Within a zone the emptiest container is
+    tried first, which spreads load and keeps few items in front of each
+    other; `container_order="fullest"` tries the fullest first instead, which
+    packs tighter and leaves whole containers free. Containers without the
+    free volume or free-box size for an item are skipped before any
+    geometric search. Returns the placements in the /api/placement response
+    format and the ids of items that did not fit.
+    """
+    index = CandidateIndex(containers, container_order)
+    ordered = sorted(items, key=lambda i: (-i.priority, -i.volume, i.itemId))
+    placements = []
+    unplaced = []
+
+    for item in ordered:
+        box, container = _place_in(item, index.in_zone(item, item.preferredZone))
+        if box is None:
+            box, container = _place_in(item, index.outside_zone(item, item.preferredZone))
+        if box is None:
+            unplaced.append(item.itemId)
+            continue
+
+        container.add(item.itemId, box)
+        index.update(container)
+        placements.append({
+            "itemId": item.itemId,
+            "containerId": container.containerId,
+            "position": box_to_position(box),
+        })
+
+    return placements, unplaced
+
+
+def _place_in(item: PackItem, candidates):
+    for container in candidates:
+        box = container.try_place(item)
+        if box is not None:
+            return box, container
+    return None, None
@@ -0,0 +1,310 @@
+"""
+Rearrangement planning for /api/placement.
+
+When a batch item cannot be stowed in its preferred zone, the planner looks
+for a spot there that is only taken by lower-priority stored items and moves
+those items to other containers. A spot is a candidate box anchored at an
+extreme point of the container (a corner of the open space or the front
+corner of a stored item); the items it collides with are exactly the ones
+that have to move.
+
+Targets are handled highest priority first with a beam search. Each state is
+the list of moves so far; expanding it for the next target tries the
+cheapest spots in the target's zone and keeps the `beam_width` best states
+by (targets left out, moves, retrieval steps). Moving an item costs one step
+plus two for every item in front of it (taken out and put back). When the
+time budget runs out the remaining targets are left where the packer put
+them and the best state so far is returned.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import math
+import time
+
+from placement import PackContainer, PackItem, orientations
+from spatial_index import Box, overlaps, volume as box_volume
+
+BEAM_WIDTH = 4
+MAX_MOVES_PER_ITEM = 6
+
+
+@dataclass
+class StoredItem:
+    itemId: str
+    containerId: str
+    box: Box
+    priority: int
+    preferredZone: Optional[str] = None
+
+    @property
+    def dims(self) -> Tuple[int, int, int]:
+        return (self.box[3] - self.box[0], self.box[4] - self.box[1], self.box[5] - self.box[2])
+
+
+@dataclass
+class Move:
+    itemId: str
+    fromContainer: str
+    fromBox: Box
+    toContainer: str
+    toBox: Box
+
+
+@dataclass
+class RearrangementPlan:
+    moves: List[Move]
+    placements: Dict[str, Tuple[str, Box]]  # target itemId -> (containerId, box) in its preferred zone
+    steps: int                              # retrieval steps spent on the moves
+    complete: bool                          # False when the time budget ran out
+
+
+@dataclass
+class _State:
+    moves: List[Move] = field(default_factory=list)
+    placed: Dict[str, Tuple[str, Box]] = field(default_factory=dict)
+    added: Dict[str, List[Tuple[str, Box]]] = field(default_factory=dict)  # containerId -> new boxes
+    removed: Dict[str, Set[str]] = field(default_factory=dict)             # containerId -> keys moved out
+    steps: int = 0
+    skipped: int = 0
+
+    def score(self):
+        return (self.skipped, len(self.moves), self.steps)
+
+    def extend(self, changes: List[Tuple[str, str, Box, Optional[str]]], moves: List[Move], steps: int) -> "_State":
+        """A copy with (key, containerId, box, containerId it leaves) changes applied."""
+        state = _State(
+            moves=self.moves + moves,
+            placed=dict(self.placed),
+            added={k: list(v) for k, v in self.added.items()},
+            removed={k: set(v) for k, v in self.removed.items()},
+            steps=self.steps + steps,
+            skipped=self.skipped,
+        )
+        for key, container_id, box, left in changes:
+            if left is not None:
+                state.removed.setdefault(left, set()).add(key)
+                state.added[left] = [(k, b) for k, b in state.added.get(left, []) if k != key]
+            state.added.setdefault(container_id, []).append((key, box))
+        return state
+
+
+def plan_rearrangements(targets: List[PackItem], containers: List[PackContainer], stored: Dict[str, StoredItem],
+                        placed_in: Dict[str, str], beam_width: int = BEAM_WIDTH,
+                        max_moves: int = MAX_MOVES_PER_ITEM, time_budget: float = 1.0) -> RearrangementPlan:
+    """
+    Find moves of lower-priority `stored` items that let `targets` into their
+    preferred zones. `containers` are the packer's containers after
+    plan_placements; `placed_in` maps each target the packer did place to
+    its container. No layout is modified: the plan is applied by the caller.
+    Probing the untouched `containers` does fill their search caches
+    (rejected sizes, extreme-point reaches, fit bounds). Those caches stay
+    valid for the layouts they were probed with, but the containers are
+    meant to be dropped after the call rather than packed into again.
+    """
+    deadline = time.perf_counter() + time_budget
+    by_zone: Dict[str, List[PackContainer]] = {}
+    for container in containers:
+        by_zone.setdefault(container.zone, []).append(container)
+
+    beam = [_State()]
+    cache: dict = {}
+    complete = True
+    for target in sorted(targets, key=lambda t: (-t.priority, -t.volume, t.itemId)):
+        if time.perf_counter() > deadline:
+            complete = False
+            break
+        expanded = []
+        for state in beam:
+            skip = _State(state.moves, state.placed, state.added, state.removed, state.steps, state.skipped + 1)
+            expanded.append(skip)
+            for option in _options(target, state, by_zone.get(target.preferredZone, []), containers, stored,
+                                   placed_in, beam_width, max_moves, deadline, cache):
+                expanded.append(option)
+        expanded.sort(key=_State.score)
+        beam = expanded[:beam_width]
+
+    best = beam[0]
+    return RearrangementPlan(best.moves, best.placed, best.steps, complete)
+
+
+def _options(target: PackItem, state: _State, zone: List[PackContainer], containers: List[PackContainer],
+             stored: Dict[str, StoredItem], placed_in: Dict[str, str], beam_width: int, max_moves: int,
+             deadline: float, cache: dict) -> List[_State]:
+    """Up to `beam_width` successor states that place `target` in one of `zone`."""
+    spots = []  # (moves, container, box, colliding keys)
+    for container in zone:
+        for count, top_priority, box, colliders in _spots(container, state, target, stored, cache, deadline):
+            if count <= max_moves and top_priority < target.priority:
+                spots.append((count, container, box, colliders))
+    # Retrieval steps only for the spots that can make the cut on move count
+    spots = heapq.nsmallest(4 * beam_width, spots, key=lambda s: (s[0], s[1].containerId, s[2]))
+    ranked = sorted(
+        ((_move_steps(container, state, colliders), container, box, colliders) for _, container, box, colliders in spots),
+        key=lambda s: (len(s[3]), s[0], s[1].containerId, s[2])
+    )
+
+    options = []
+    for steps, container, box, movable in ranked:
+        if len(options) >= beam_width or time.perf_counter() > deadline:
+            break
+        relocated = _relocate(movable, container, state, containers, stored)
+        if relocated is None:
+            continue
+        moves = [
+            Move(item_id, container.containerId, stored[item_id].box, to_container, to_box)
+            for item_id, to_container, to_box in relocated
+        ]
+        changes = [(m.itemId, m.toContainer, m.toBox, m.fromContainer) for m in moves]
+        changes.append((target.itemId, container.containerId, box, placed_in.get(target.itemId)))
+        option = state.extend(changes, moves, steps)
+        option.placed[target.itemId] = (container.containerId, box)
+        options.append(option)
+    return options
+
+
+def _spots(container: PackContainer, state: _State, item: PackItem, stored: Dict[str, StoredItem],
+           cache: dict, deadline: float) -> List[tuple]:
+    """
+    (stored items in the way, their highest priority, box, their keys) for
+    each distinct set of items a box for `item` would displace. Depends only
+    on the container's layout under `state` and the item's size, so it is
+    shared by every beam state and target with the same ones.
+    """
+    cid = container.containerId
+    key = (cid, frozenset(state.removed.get(cid, ())), tuple(state.added.get(cid, ())),
+           tuple(sorted((item.width, item.depth, item.height))))
+    spots = cache.get(key)
+    if spots is not None:
+        return spots
+    spots, seen = [], set()
+    for box in _candidate_boxes(container, state, item):
+        if time.perf_counter() > deadline:
+            return spots  # partial, so not cached
+        colliders = _colliders(container, state, box, stored)
+        if colliders is None:
+            continue
+        keys = frozenset(colliders)
+        if keys in seen:
+            continue
+        seen.add(keys)
+        top = max((stored[k].priority for k in colliders), default=-math.inf)
+        spots.append((len(colliders), top, box, colliders))
+    cache[key] = spots
+    return spots
+
+
+def _candidate_boxes(container: PackContainer, state: _State, item: PackItem):
+    """Boxes for `item` anchored at the extreme points of the container's current layout."""
+    points = {(0, 0, 0)}
+    for _, box in _layout(container, state):
+        points.add((box[0], box[1], box[2]))
+        points.update(((box[3], box[1], box[2]), (box[0], box[4], box[2]), (box[0], box[1], box[5])))
+    rotations = orientations(item.width, item.depth, item.height)
+    # Front to back, like the packer, so cheaper-to-reach spots are tried first
+    for w, d, h in sorted(points, key=lambda p: (p[1], p[2], p[0])):
+        for rw, rd, rh in rotations:
+            if w + rw <= container.width and d + rd <= container.depth and h + rh <= container.height:
+                yield (w, d, h, w + rw, d + rd, h + rh)
+
+
+def _layout(container: PackContainer, state: _State):
+    """(key, box) of everything in the container under `state`."""
+    removed = state.removed.get(container.containerId, ())
+    if container.occupancy is not None:
+        for key, box in container.occupancy.boxes(container.ignore):
+            if key not in removed:
+                yield key, box
+    for key, box in container.planned.tree.items():
+        if key not in removed:
+            yield key, box
+    yield from state.added.get(container.containerId, ())
+
+
+def _colliders(container: PackContainer, state: _State, box: Box,
+               stored: Dict[str, StoredItem]) -> Optional[List[str]]:
+    """Stored items in the way of `box`, or None if anything else is in the way."""
+    removed = state.removed.get(container.containerId, ())
+    for key, other in state.added.get(container.containerId, ()):
+        if overlaps(box, other):
+            return None
+    if any(key not in removed for key in container.planned.tree.search(box)):
+        return None
+    colliders = []
+    if container.occupancy is not None:
+        for key in container.occupancy.collisions(box, container.ignore):
+            if key in removed:
+                continue
+            if key not in stored:
+                return None
+            colliders.append(key)
+    return colliders
+
+
+def _move_steps(container: PackContainer, state: _State, keys: List[str]) -> int:
+    """Retrieval steps to take `keys` out: one each, plus out-and-back for every item in front."""
+    if not keys:
+        return 0
+    in_front = container.occupancy.blockers_of(keys) - state.removed.get(container.containerId, set())
+    return len(keys) + 2 * len(in_front)
+
+
+def _relocate(keys: List[str], source: PackContainer, state: _State, containers: List[PackContainer],
+              stored: Dict[str, StoredItem]) -> Optional[List[Tuple[str, str, Box]]]:
+    """New homes outside `source` for `keys`, each preferring its own zone, or None."""
+    if not keys:
+        return []
+    front_to_back = source.occupancy.removal_order(keys)
+    packers: Dict[str, PackContainer] = {}
+    relocated = []
+    # Largest first so the hard cases grab space while there is most of it
+    for key in sorted(front_to_back, key=lambda k: -box_volume(stored[k].box)):
+        item = stored[key]
+        w, d, h = item.dims
+        pack_item = PackItem(key, w, d, h, item.priority, item.preferredZone)
+        home = None
+        for container in sorted(
+            (c for c in containers if c is not source),
+            key=lambda c: (c.zone != item.preferredZone, -_free_volume(c, state, stored))
+        ):
+            packer = packers.get(container.containerId)
+            if packer is None:
+                untouched = container.containerId not in state.removed and container.containerId not in state.added
+                # The packer's own container already holds the untouched layout; probe it before copying.
+                # This only adds to its caches, which stay true for that layout.
+                if untouched and container.try_place(pack_item) is None:
+                    continue
+                packer = packers[container.containerId] = _packer(container, state)
+            box = packer.try_place(pack_item)
+            if box is not None:
+                packer.add(key, box)
+                home = (key, container.containerId, box)
+                break
+        if home is None:
+            return None
+        relocated.append(home)
+    order = {k: i for i, k in enumerate(front_to_back)}
+    relocated.sort(key=lambda r: order[r[0]])  # moved front to back
+    return relocated
+
+
+def _packer(container: PackContainer, state: _State) -> PackContainer:
+    """A packer for the container's layout under `state`."""
+    removed = state.removed.get(container.containerId, set())
+    packer = PackContainer(container.containerId, container.zone, container.width, container.depth,
+                           container.height, container.occupancy, container.ignore | removed)
+    for key, box in container.planned.tree.items():
+        if key not in removed:
+            packer.add(key, box)
+    for key, box in state.added.get(container.containerId, ()):
+        packer.add(key, box)
+    return packer
+
+
+def _free_volume(container: PackContainer, state: _State, stored: Dict[str, StoredItem]) -> int:
+    cid = container.containerId
+    free = container.free_volume - sum(box_volume(box) for _, box in state.added.get(cid, ()))
+    for key in state.removed.get(cid, ()):
+        box = stored[key].box if key in stored else container.planned.tree.box_of(key)
+        free += box_volume(box) if box is not None else 0
+    return free
@@ -0,0 +1,127 @@
+"""
+Waste return planning: pick which waste items go into the undocking container.
+
+This is a 0/1 knapsack with two capacities (mass and volume). Each
+candidate's value is what it frees on the station (volume or mass) minus a
+penalty for the items that have to be moved to get it out. The solver is a
+depth-first branch and bound seeded with a greedy solution; it stops when the
+time budget runs out and returns the best plan found so far.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+import bisect
+import math
+import time
+
+
+@dataclass
+class WasteCandidate:
+    itemId: str
+    volume: int
+    mass: float
+    blockers: int = 0  # items that must be moved to retrieve this one
+
+
+@dataclass
+class ReturnPlanResult:
+    selected: List[WasteCandidate]
+    value: float
+    optimal: bool
+    nodes: int
+
+
+def candidate_values(candidates: List[WasteCandidate], objective: str = "volume",
+                     retrieval_cost: float = 0.1) -> List[float]:
+    """
+    Value of returning each candidate. Every blocker move costs
+    `retrieval_cost` times the average candidate's size.
+    """
+    sizes = [c.mass if objective == "mass" else float(c.volume) for c in candidates]
+    if not sizes:
+        return []
+    unit = retrieval_cost * (sum(sizes) / len(sizes))
+    return [size - unit * c.blockers for size, c in zip(sizes, candidates)]
+
+
+def solve_return_plan(candidates: List[WasteCandidate], max_volume: float, max_weight: Optional[float] = None,
+                      objective: str = "volume", retrieval_cost: float = 0.1,
+                      time_budget: float = 0.5) -> ReturnPlanResult:
+    """
+    Choose the subset of candidates with the highest total value whose mass
+    and volume fit the capacities. `time_budget` is in seconds.
+    """
+    max_weight = math.inf if max_weight is None else max_weight
+    values = candidate_values(candidates, objective, retrieval_cost)
+    pool = [
+        (v, c) for v, c in zip(values, candidates)
+        if v > 0 and c.volume <= max_volume and c.mass <= max_weight
+    ]
+
+    # Surrogate constraint: any feasible plan uses at most 2 "capacity units"
+    # when mass and volume are each scaled to their capacity.
+    weight_bound = 0 < max_weight < math.inf
+    volume_bound = max_volume > 0
+
+    def load(c: WasteCandidate) -> float:
+        return (c.mass / max_weight if weight_bound else 0.0) + (c.volume / max_volume if volume_bound else 0.0)
+
+    capacity = float(weight_bound + volume_bound)
+    pool = [(v, c, load(c)) for v, c in pool]
+    pool.sort(key=lambda e: e[0] / e[2] if e[2] else math.inf, reverse=True)
+    n = len(pool)
+
+    # Prefix sums in density order make the LP bound a binary search.
+    prefix_load = [0.0]
+    prefix_value = [0.0]
+    for v, _, l in pool:
+        prefix_load.append(prefix_load[-1] + l)
+        prefix_value.append(prefix_value[-1] + v)
+
+    def bound(i: int, value: float, used: float) -> float:
+        # Fractional (LP) relaxation of the surrogate knapsack from item i on.
+        limit = prefix_load[i] + capacity - used
+        k = bisect.bisect_right(prefix_load, limit, i, n + 1) - 1  # items i..k-1 fit whole
+        value += prefix_value[k] - prefix_value[i]
+        if k < n:
+            v, _, l = pool[k]
+            value += v * (limit - prefix_load[k]) / l
+        return value
+
+    # Greedy incumbent: take candidates in density order while they fit.
+    best_value = 0.0
+    best_chain = None
+    weight = volume = 0.0
+    for j, (v, c, _) in enumerate(pool):
+        if weight + c.mass <= max_weight and volume + c.volume <= max_volume:
+            weight += c.mass
+            volume += c.volume
+            best_value += v
+            best_chain = (j, best_chain)
+
+    deadline = time.perf_counter() + time_budget
+    nodes = 0
+    optimal = True
+    # Frames: (next index, value, weight, volume, surrogate load, chosen chain)
+    stack = [(0, 0.0, 0.0, 0.0, 0.0, None)]
+    while stack:
+        nodes += 1
+        if nodes & 1023 == 0 and time.perf_counter() > deadline:
+            optimal = False
+            break
+        i, value, weight, volume, used, chain = stack.pop()
+        if value > best_value:
+            best_value, best_chain = value, chain
+        if i >= n or bound(i, value, used) <= best_value + 1e-9:
+            continue
+        v, c, l = pool[i]
+        # Push the exclude branch first so the include branch is explored first.
+        stack.append((i + 1, value, weight, volume, used, chain))
+        if weight + c.mass <= max_weight and volume + c.volume <= max_volume:
+            stack.append((i + 1, value + v, weight + c.mass, volume + c.volume, used + l, (i, chain)))
+
+    selected = []
+    while best_chain is not None:
+        j, best_chain = best_chain
+        selected.append(pool[j][1])
+    selected.reverse()
+    return ReturnPlanResult(selected=selected, value=best_value, optimal=optimal, nodes=nodes)
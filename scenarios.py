@@ -0,0 +1,279 @@
+"""
+What-if scenarios over a forked, read-only copy of the station.
+
+`fork_station` reads the catalog and the placements once and lays them out
+as NumPy columns in shared memory. Scenarios then run in a process pool:
+every worker attaches to the same blocks (nothing is copied per scenario)
+and works only on private copies of what it changes, so a scenario never
+touches the database.
+
+A scenario simulates `numOfDays` of use from the current mission date and
+can optionally stow a resupply manifest with a placement strategy and plan
+an undocking. Results are summary metrics that can be compared side by side.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from multiprocessing import get_context, shared_memory
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+
+import numpy as np
+
+from placement import PackContainer, PackItem, plan_placements
+from return_planner import WasteCandidate, solve_return_plan
+from simulation import NEVER, NO_LIMIT, date_ordinals, simulate_days, usage_array
+from spatial_index import ContainerOccupancy
+
+
+@dataclass
+class StationFork:
+    """Labels travel to each worker once; the arrays live in shared memory."""
+    start: date
+    item_ids: List[str]
+    item_names: List[str]
+    container_ids: List[str]
+    container_zones: List[str]
+    blocks: Dict[str, Tuple[str, tuple, str]]  # column -> (shared memory name, shape, dtype)
+
+
+class SharedArrays:
+    """Owns the shared memory blocks of a fork; unlink them with `close`."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._segments = []
+        self.blocks = {}
+        self.arrays: Dict[str, np.ndarray] = {}  # read-only views for running scenarios in this process
+        for name, array in arrays.items():
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+            view[...] = array
+            view.flags.writeable = False
+            self._segments.append(segment)
+            self.blocks[name] = (segment.name, array.shape, array.dtype.str)
+            self.arrays[name] = view
+
+    def close(self):
+        self.arrays = {}  # the segments cannot close while views of them exist
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+
+def attach(blocks: Dict[str, Tuple[str, tuple, str]]):
+    """Read-only NumPy views of a fork's shared blocks, plus the handles keeping them open."""
+    arrays, handles = {}, []
+    for name, (segment_name, shape, dtype) in blocks.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+        view.flags.writeable = False
+        arrays[name] = view
+        handles.append(segment)
+    return arrays, handles
+
+
+def fork_station(start: date, items: List[tuple], containers: List[tuple], placements: List[tuple]):
+    """
+    Build the shared copy of the station.
+
+    items:      (itemId, name, width, depth, height, mass, expiryDate, usageLimit, is_waste)
+    containers: (containerId, zone, width, depth, height)
+    placements: (itemId, containerId, box)
+    Returns (StationFork, SharedArrays); the caller closes the SharedArrays.
+    """
+    n = len(items)
+    item_row = {row[0]: i for i, row in enumerate(items)}
+    container_row = {row[0]: j for j, row in enumerate(containers)}
+    container = np.full(n, -1, dtype=np.int32)
+    boxes = np.zeros((n, 6), dtype=np.int32)
+    blockers = np.zeros(n, dtype=np.int32)
+
+    # Blocks-access graphs of the forked placements, for retrieval costs
+    occupancies: Dict[str, ContainerOccupancy] = {}
+    for item_id, container_id, box in placements:
+        i, j = item_row.get(item_id), container_row.get(container_id)
+        if i is None or j is None:
+            continue
+        occ = occupancies.get(container_id)
+        if occ is None:
+            _, _, width, depth, height = containers[j]
+            occ = occupancies[container_id] = ContainerOccupancy(width, depth, height, track_occlusion=True)
+        occ.place(item_id, box)
+        container[i] = j
+        boxes[i] = box
+    for occ in occupancies.values():
+        for item_id, _ in occ.boxes():
+            blockers[item_row[item_id]] = len(occ.blockers_of([item_id]))
+
+    arrays = {
+        "expiry": date_ordinals(r[6] for r in items),
+        "remaining": usage_array(r[7] for r in items),
+        "waste": np.fromiter((bool(r[8]) for r in items), dtype=bool, count=n),
+        "volume": np.fromiter((r[2] * r[3] * r[4] for r in items), dtype=np.int64, count=n),
+        "mass": np.fromiter((r[5] for r in items), dtype=np.float64, count=n),
+        "blockers": blockers,
+        "container": container,
+        "boxes": boxes,
+        "dims": np.array([c[2:5] for c in containers], dtype=np.int64).reshape(len(containers), 3),
+    }
+    shared = SharedArrays(arrays)
+    fork = StationFork(
+        start=start,
+        item_ids=[r[0] for r in items],
+        item_names=[r[1] for r in items],
+        container_ids=[c[0] for c in containers],
+        container_zones=[c[1] for c in containers],
+        blocks=shared.blocks,
+    )
+    return fork, shared
+
+
+class ForkState:
+    """A fork's arrays in one process, with the itemId and name lookups scenarios use."""
+
+    def __init__(self, fork: StationFork, arrays: Dict[str, np.ndarray]):
+        self.fork = fork
+        self.arrays = arrays
+        self.row_of_id = {item_id: i for i, item_id in enumerate(fork.item_ids)}
+        self.row_of_name: Dict[str, int] = {}
+        for i, name in enumerate(fork.item_names):
+            self.row_of_name.setdefault(name, i)
+
+
+# Worker state, set once per pool process by `_init_worker`; the handles keep the blocks attached
+_worker: Optional[ForkState] = None
+_handles: list = []
+
+
+def _init_worker(fork: StationFork):
+    global _worker, _handles
+    arrays, _handles = attach(fork.blocks)
+    _worker = ForkState(fork, arrays)
+
+
+def _run_in_worker(spec: dict) -> dict:
+    return run_scenario(_worker, spec)
+
+
+def run_scenario(state: ForkState, spec: dict) -> dict:
+    """Run one scenario against a fork and return its metrics."""
+    started = time.perf_counter()
+    a, fork = state.arrays, state.fork
+    n = len(fork.item_ids)
+    num_days = int(spec.get("numOfDays") or 0)
+
+    uses_per_day = np.zeros(n, dtype=np.int64)
+    for used in spec.get("itemsToBeUsedPerDay") or []:
+        row = state.row_of_id.get(used.get("itemId"))
+        if row is None and used.get("name"):
+            row = state.row_of_name.get(used["name"])
+        if row is not None:
+            uses_per_day[row] += 1
+
+    result = simulate_days(a["expiry"], a["remaining"], uses_per_day, fork.start, num_days)
+    # Expired by the last simulated day, including items that were already past due
+    expired = a["expiry"] < fork.start.toordinal() + num_days
+    depleted = (a["remaining"] != NO_LIMIT) & (result.remaining == 0)
+    waste = a["waste"] | expired | depleted
+    used_rows = np.flatnonzero(result.uses > 0)
+
+    metrics = {
+        "name": spec.get("name"),
+        "numOfDays": num_days,
+        "usesConsumed": int(result.uses.sum()),
+        "itemsExpired": int(np.count_nonzero(result.expired_day != NEVER)),
+        "itemsDepleted": int(np.count_nonzero(result.depleted_day != NEVER)),
+        "wasteCount": int(np.count_nonzero(waste)),
+        "wasteVolume": int(a["volume"][waste].sum()),
+        "wasteMass": round(float(a["mass"][waste].sum()), 3),
+        # Each use means retrieving the item: move its blockers out and back, then take it
+        "retrievalSteps": int((result.uses[used_rows] * (1 + 2 * a["blockers"][used_rows].astype(np.int64))).sum()),
+    }
+
+    capacity = int(a["dims"].prod(axis=1).sum()) if len(a["dims"]) else 0
+    stowed = a["container"] >= 0
+    used_volume = int(a["volume"][stowed].sum())
+    metrics["utilisationBefore"] = round(used_volume / capacity, 4) if capacity else 0.0
+
+    resupply = spec.get("resupply") or []
+    if resupply:
+        placed_volume, placed, unplaced = _stow(state, resupply, spec.get("placementStrategy") or "emptiest")
+        used_volume += placed_volume
+        metrics["resupplyPlaced"] = placed
+        metrics["resupplyUnplaced"] = unplaced
+    metrics["utilisation"] = round(used_volume / capacity, 4) if capacity else 0.0
+
+    undocking = spec.get("undocking")
+    if undocking:
+        metrics.update(_undock(state, waste, undocking))
+
+    metrics["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return metrics
+
+
+def _stow(state: ForkState, resupply: List[dict], strategy: str) -> Tuple[int, int, int]:
+    """Stow a resupply manifest into private copies of the forked containers."""
+    a, fork = state.arrays, state.fork
+    occupied: Dict[int, List[int]] = {}
+    for i in np.flatnonzero(a["container"] >= 0):
+        occupied.setdefault(int(a["container"][i]), []).append(int(i))
+    containers = []
+    for j, container_id in enumerate(fork.container_ids):
+        width, depth, height = (int(v) for v in a["dims"][j])
+        occ = ContainerOccupancy(width, depth, height)
+        for i in occupied.get(j, ()):
+            occ.place(fork.item_ids[i], tuple(int(v) for v in a["boxes"][i]))
+        containers.append(PackContainer(container_id, fork.container_zones[j], width, depth, height, occ))
+    items = [
+        PackItem(r["itemId"], int(r["width"]), int(r["depth"]), int(r["height"]),
+                 int(r.get("priority", 0)), r.get("preferredZone", ""))
+        for r in resupply
+    ]
+    placements, unplaced = plan_placements(items, containers, container_order=strategy)
+    volume_of = {item.itemId: item.volume for item in items}
+    return sum(volume_of[p["itemId"]] for p in placements), len(placements), len(unplaced)
+
+
+def _undock(state: ForkState, waste: np.ndarray, undocking: dict) -> dict:
+    a, fork = state.arrays, state.fork
+    try:
+        j = fork.container_ids.index(undocking.get("undockingContainerId"))
+    except ValueError:
+        return {"returnError": "unknown undocking container"}
+    rows = np.flatnonzero(waste)
+    candidates = [
+        WasteCandidate(fork.item_ids[i], int(a["volume"][i]), float(a["mass"][i]), int(a["blockers"][i]))
+        for i in rows
+    ]
+    plan = solve_return_plan(
+        candidates,
+        max_volume=int(a["dims"][j].prod()),
+        max_weight=undocking.get("maxWeight"),
+        objective=undocking.get("objective") or "volume",
+        time_budget=0.2
+    )
+    return {
+        "returnItems": len(plan.selected),
+        "returnVolume": sum(c.volume for c in plan.selected),
+        "returnMass": round(sum(c.mass for c in plan.selected), 3),
+        "returnOptimal": plan.optimal,
+    }
+
+
+def run_scenarios(fork: StationFork, shared: SharedArrays, specs: List[dict],
+                  max_workers: Optional[int] = None) -> List[dict]:
+    """
+    Run `specs` against `fork` and return the results in order: in worker
+    processes attached to its shared blocks, or in this process on the views
+    of `shared` when a single worker would do.
+    """
+    workers = min(len(specs), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        state = ForkState(fork, shared.arrays)
+        return [run_scenario(state, spec) for spec in specs]
+    # spawn: workers import only this module, never the web app or its database engine
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(fork,)) as pool:
+        return list(pool.map(_run_in_worker, specs))
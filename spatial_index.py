@@ -0,0 +1,461 @@
+"""
+In-memory spatial occupancy index for containers.
+
+Each container gets an R-tree over the boxes of the items placed in it, so
+collision checks and free-space probes cost O(log n) instead of a scan of the
+placement table. Boxes use the placement engine convention
+(width0, depth0, height0, width1, depth1, height1) with exclusive upper bounds.
+"""
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+import threading
+
+from occlusion import OcclusionGraph
+
+Box = Tuple[int, int, int, int, int, int]
+
+MAX_ENTRIES = 16
+
+
+def overlaps(a: Box, b: Box) -> bool:
+    return (a[0] < b[3] and b[0] < a[3] and
+            a[1] < b[4] and b[1] < a[4] and
+            a[2] < b[5] and b[2] < a[5])
+
+
+def union(a: Box, b: Box) -> Box:
+    return (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]),
+            max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+
+def volume(box: Box) -> int:
+    return (box[3] - box[0]) * (box[4] - box[1]) * (box[5] - box[2])
+
+
+def fits_within(dims: Tuple[int, int, int], bound: Tuple[int, int, int]) -> bool:
+    """Whether sorted item dimensions fit under a sorted free-box bound (see fit_bound)."""
+    return dims[0] <= bound[0] and dims[1] <= bound[1] and dims[2] <= bound[2]
+
+
+class _Node:
+    __slots__ = ("leaf", "entries", "mbr", "parent")
+
+    def __init__(self, leaf: bool, parent=None):
+        self.leaf = leaf
+        self.entries: List[tuple] = []  # (box, key) in leaves, (mbr, _Node) otherwise
+        self.mbr: Optional[Box] = None
+        self.parent = parent
+
+    def recompute(self):
+        mbr = None
+        for box, _ in self.entries:
+            mbr = box if mbr is None else union(mbr, box)
+        self.mbr = mbr
+
+
+class RTree:
+    """
+    Dynamic R-tree keyed by a hashable id (the itemId).
+
+    Insertion descends by least enlargement and splits overflowing nodes
+    along their widest axis. Deletion shrinks bounding boxes up to the root
+    and prunes empty nodes rather than reinserting orphans, which keeps the
+    hot path short at the cost of slightly looser trees after heavy churn.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.root = _Node(leaf=True)
+        self._leaf_of: Dict[Hashable, _Node] = {}
+        self._boxes: Dict[Hashable, Box] = {}
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key) -> bool:
+        return key in self._boxes
+
+    def box_of(self, key) -> Optional[Box]:
+        return self._boxes.get(key)
+
+    def items(self) -> Iterator[Tuple[Hashable, Box]]:
+        return iter(self._boxes.items())
+
+    def insert(self, key, box: Box):
+        if key in self._boxes:
+            self.remove(key)
+        self._boxes[key] = box
+        node = self.root
+        while not node.leaf:
+            node = self._choose_child(node, box)
+        node.entries.append((box, key))
+        self._leaf_of[key] = node
+        self._adjust(node)
+
+    def remove(self, key) -> bool:
+        box = self._boxes.pop(key, None)
+        if box is None:
+            return False
+        node = self._leaf_of.pop(key)
+        node.entries = [e for e in node.entries if e[1] != key]
+        while node is not self.root and not node.entries:
+            parent = node.parent
+            parent.entries = [e for e in parent.entries if e[1] is not node]
+            node = parent
+        while node is not None:
+            node.recompute()
+            if node.parent is not None:
+                node.parent.entries = [(node.mbr, n) if n is node else (b, n) for b, n in node.parent.entries]
+            node = node.parent
+        if not self.root.leaf and len(self.root.entries) == 1:
+            self.root = self.root.entries[0][1]
+            self.root.parent = None
+        elif not self.root.entries:
+            self.root = _Node(leaf=True)
+        return True
+
+    def search(self, box: Box) -> Iterator[Hashable]:
+        """Yield the keys of every stored box overlapping `box`."""
+        x0, y0, z0, x1, y1, z1 = box
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for b, entry in node.entries:
+                if x0 < b[3] and b[0] < x1 and y0 < b[4] and b[1] < y1 and z0 < b[5] and b[2] < z1:
+                    if node.leaf:
+                        yield entry
+                    else:
+                        stack.append(entry)
+
+    def intersects(self, box: Box, ignore: Iterable = ()) -> bool:
+        # Same walk as search(), without generator overhead: this is the
+        # placement engine's inner loop.
+        x0, y0, z0, x1, y1, z1 = box
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for b, entry in node.entries:
+                if x0 < b[3] and b[0] < x1 and y0 < b[4] and b[1] < y1 and z0 < b[5] and b[2] < z1:
+                    if not node.leaf:
+                        stack.append(entry)
+                    elif entry not in ignore:
+                        return True
+        return False
+
+    def _choose_child(self, node: _Node, box: Box) -> _Node:
+        best = None
+        best_cost = None
+        for mbr, child in node.entries:
+            size = volume(mbr)
+            cost = (volume(union(mbr, box)) - size, size)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = child, cost
+        return best
+
+    def _adjust(self, node: _Node):
+        while node is not None:
+            split = self._split(node) if len(node.entries) > self.max_entries else None
+            node.recompute()
+            parent = node.parent
+            if parent is None:
+                if split is not None:
+                    self.root = _Node(leaf=False)
+                    for n in (node, split):
+                        n.parent = self.root
+                        self.root.entries.append((n.mbr, n))
+                    self.root.recompute()
+                return
+            parent.entries = [(node.mbr, n) if n is node else (b, n) for b, n in parent.entries]
+            if split is not None:
+                split.parent = parent
+                parent.entries.append((split.mbr, split))
+            node = parent
+
+    def _split(self, node: _Node) -> _Node:
+        mbr = node.mbr or node.entries[0][0]
+        for box, _ in node.entries:
+            mbr = union(mbr, box)
+        axis = max(range(3), key=lambda a: mbr[a + 3] - mbr[a])
+        node.entries.sort(key=lambda e: e[0][axis] + e[0][axis + 3])
+        half = len(node.entries) // 2
+        sibling = _Node(leaf=node.leaf)
+        sibling.entries = node.entries[half:]
+        node.entries = node.entries[:half]
+        if node.leaf:
+            for _, key in sibling.entries:
+                self._leaf_of[key] = sibling
+        else:
+            for _, child in sibling.entries:
+                child.parent = sibling
+        sibling.recompute()
+        return sibling
+
+
+class ContainerOccupancy:
+    """
+    Occupied space of one container, optionally with its blocks-access graph
+    (see occlusion.py) maintained alongside the R-tree.
+
+    The methods that walk the tree hold `lock`, which OccupancyIndex shares
+    across its containers, so readers in other threads never see a
+    half-updated tree. Read through them (`boxes` for a snapshot of the
+    contents) rather than through `tree` or `occlusion`.
+    """
+
+    def __init__(self, width: int, depth: int, height: int, track_occlusion: bool = False,
+                 lock: Optional[threading.RLock] = None):
+        self.width = width
+        self.depth = depth
+        self.height = height
+        self.tree = RTree()
+        self.used_volume = 0
+        self.occlusion = OcclusionGraph(self.tree, depth) if track_occlusion else None
+        self.lock = lock if lock is not None else threading.RLock()
+
+    @property
+    def free_volume(self) -> int:
+        return self.width * self.depth * self.height - self.used_volume
+
+    def in_bounds(self, box: Box) -> bool:
+        return (0 <= box[0] <= box[3] <= self.width and
+                0 <= box[1] <= box[4] <= self.depth and
+                0 <= box[2] <= box[5] <= self.height)
+
+    def __contains__(self, key) -> bool:
+        return key in self.tree
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def box_of(self, key) -> Optional[Box]:
+        return self.tree.box_of(key)
+
+    def boxes(self, ignore: Iterable = ()) -> List[Tuple[Hashable, Box]]:
+        """(key, box) of everything stored, except `ignore`d keys, as of now."""
+        with self.lock:
+            return [(key, box) for key, box in self.tree.items() if key not in ignore]
+
+    def place(self, key, box: Box):
+        with self.lock:
+            self.remove(key)
+            self.tree.insert(key, box)
+            self.used_volume += volume(box)
+            if self.occlusion is not None:
+                self.occlusion.add(key, box)
+
+    def remove(self, key) -> bool:
+        with self.lock:
+            box = self.tree.box_of(key)
+            if box is None:
+                return False
+            if self.occlusion is not None:
+                self.occlusion.remove(key)
+            self.tree.remove(key)
+            self.used_volume -= volume(box)
+            return True
+
+    def collisions(self, box: Box, ignore: Iterable = ()) -> List[Hashable]:
+        with self.lock:
+            return [key for key in self.tree.search(box) if key not in ignore]
+
+    def collides(self, box: Box, ignore: Iterable = ()) -> bool:
+        with self.lock:
+            return self.tree.intersects(box, ignore)
+
+    def blockers_of(self, keys: Iterable) -> set:
+        """Stored items in front of any of `keys` (see OcclusionGraph.blockers_of)."""
+        with self.lock:
+            return self.occlusion.blockers_of([k for k in keys if k in self.tree])
+
+    def removal_order(self, keys: Iterable) -> list:
+        """The stored ones of `keys`, front to back (see OcclusionGraph.removal_order)."""
+        with self.lock:
+            return self.occlusion.removal_order([k for k in keys if k in self.tree])
+
+    def reach(self, point: Tuple[int, int, int], ignore: Iterable = ()) -> Optional[Tuple[int, int, int]]:
+        """
+        Free distance from `point` to the nearest item or wall along each
+        axis (width, depth, height), or None if the point is occupied. A box
+        with its near corner at the point can be no larger than this.
+        """
+        pw, pd, ph = point
+        if not (0 <= pw < self.width and 0 <= pd < self.depth and 0 <= ph < self.height):
+            return None
+        with self.lock:
+            if self.tree.intersects((pw, pd, ph, pw + 1, pd + 1, ph + 1), ignore):
+                return None
+            rays = (
+                (0, (pw, pd, ph, self.width, pd + 1, ph + 1), self.width),
+                (1, (pw, pd, ph, pw + 1, self.depth, ph + 1), self.depth),
+                (2, (pw, pd, ph, pw + 1, pd + 1, self.height), self.height),
+            )
+            reach = []
+            for axis, ray, wall in rays:
+                hits = (self.tree.box_of(k)[axis] for k in self.tree.search(ray) if k not in ignore)
+                reach.append(min(hits, default=wall) - point[axis])
+            return tuple(reach)
+
+    def largest_free_box(self, point: Tuple[int, int, int], ignore: Iterable = ()) -> Optional[Box]:
+        """
+        Largest empty box by volume with its near corner at `point` (width,
+        depth, height), or None if the point is occupied.
+
+        Only the items in the region between the point and the far corner of
+        the container matter, and the R-tree finds those. Each one rules out
+        exactly the boxes that reach past its near corner on all three axes,
+        so the best box ends at a wall or at an item's near face along every
+        axis. Each such width is tried; the best depth and height for it
+        come from one sorted pass over the items it does not clear.
+        """
+        pw, pd, ph = point
+        if not (0 <= pw < self.width and 0 <= pd < self.depth and 0 <= ph < self.height):
+            return None
+        with self.lock:
+            region = (pw, pd, ph, self.width, self.depth, self.height)
+            corners = [
+                (max(box[0] - pw, 0), max(box[1] - pd, 0), max(box[2] - ph, 0))
+                for box in (self.tree.box_of(k) for k in self.tree.search(region) if k not in ignore)
+            ]
+        best, best_volume = None, 0
+        for w in sorted({c[0] for c in corners if c[0] > 0} | {self.width - pw}):
+            # Items this width does not clear; a box past one in depth must stay under it
+            limits = sorted((d, h) for a, d, h in corners if a < w)
+            h, i = self.height - ph, 0
+            for d in sorted({c[0] for c in limits if c[0] > 0} | {self.depth - pd}):
+                while i < len(limits) and limits[i][0] < d:
+                    h = min(h, limits[i][1])
+                    i += 1
+                if w * d * h > best_volume:
+                    best, best_volume = (pw, pd, ph, pw + w, pd + d, ph + h), w * d * h
+        return best
+
+    def fit_bound(self, ignore: Iterable = ()) -> Tuple[int, int, int]:
+        """
+        Upper bound on the sorted dimensions of any item the placement engine
+        could still put here: the component-wise maximum of the sorted reach
+        from each extreme point (the origin and the outer corners of every
+        item). An item whose sorted dimensions exceed it in any component
+        cannot fit, so containers can be ruled out without a geometric search.
+        """
+        with self.lock:
+            points = {(0, 0, 0)}
+            for _, box in self.boxes(ignore):
+                points.update(((box[3], box[1], box[2]), (box[0], box[4], box[2]), (box[0], box[1], box[5])))
+            bound = (0, 0, 0)
+            for point in points:
+                reach = self.reach(point, ignore)
+                if reach is not None:
+                    a, b, c = sorted(reach)
+                    bound = (max(bound[0], a), max(bound[1], b), max(bound[2], c))
+            return bound
+
+
+class OccupancyIndex:
+    """
+    Per-container occupancy indexes, built lazily from the placement table.
+
+    `loader(container_id)` must return `((width, depth, height), [(item_id, box), ...])`
+    or None when the container does not exist; `bulk_loader(container_ids)`,
+    if given, returns those pairs by containerId for several containers at
+    once (see `get_many`). After that the index is kept in sync
+    incrementally through `place`, `remove` and `drop_container`.
+    Each of those calls every listener with the id of the container that
+    changed (None after `clear`).
+    """
+
+    def __init__(self, loader: Callable[[str], Optional[tuple]],
+                 bulk_loader: Optional[Callable[[List[str]], Dict[str, tuple]]] = None):
+        self.loader = loader
+        self.bulk_loader = bulk_loader
+        self._containers: Dict[str, ContainerOccupancy] = {}
+        self._location: Dict[str, str] = {}  # itemId -> containerId
+        self._lock = threading.RLock()
+        self._reservations: Dict[str, threading.Lock] = {}
+        self.listeners: List[Callable[[Optional[str]], None]] = []
+
+    def _notify(self, container_id: Optional[str]):
+        for listener in self.listeners:
+            listener(container_id)
+
+    def get(self, container_id: str) -> Optional[ContainerOccupancy]:
+        with self._lock:
+            occ = self._containers.get(container_id)
+            if occ is None:
+                loaded = self.loader(container_id)
+                if loaded is None:
+                    return None
+                occ = self._build(container_id, *loaded)
+            return occ
+
+    def get_many(self, container_ids: Iterable[str]) -> Dict[str, ContainerOccupancy]:
+        """Like `get` for several containers, loading the missing ones in one `bulk_loader` call."""
+        with self._lock:
+            container_ids = list(container_ids)
+            missing = [c for c in container_ids if c not in self._containers]
+            if missing and self.bulk_loader is not None:
+                for container_id, (dims, placed) in self.bulk_loader(missing).items():
+                    self._build(container_id, dims, placed)
+            found = {}
+            for container_id in container_ids:
+                occ = self._containers.get(container_id) if self.bulk_loader is not None else self.get(container_id)
+                if occ is not None:
+                    found[container_id] = occ
+            return found
+
+    def _build(self, container_id: str, dims: Tuple[int, int, int], placed: Iterable[tuple]) -> ContainerOccupancy:
+        occ = ContainerOccupancy(*dims, track_occlusion=True, lock=self._lock)
+        for item_id, box in placed:
+            occ.place(item_id, box)
+            self._location[item_id] = container_id
+        self._containers[container_id] = occ
+        return occ
+
+    @contextmanager
+    def reserve(self, container_id: str):
+        """
+        Hold a container for one writer: check for collisions, commit and
+        `place` inside the block, so no other writer can claim the same space
+        in between. Readers are not held up.
+        """
+        with self._lock:
+            lock = self._reservations.setdefault(container_id, threading.Lock())
+        with lock:
+            yield
+
+    def is_loaded(self, container_id: str) -> bool:
+        return container_id in self._containers
+
+    def container_of(self, item_id: str) -> Optional[str]:
+        return self._location.get(item_id)
+
+    def place(self, container_id: str, item_id: str, box: Box):
+        with self._lock:
+            self.remove(item_id)
+            occ = self._containers.get(container_id)
+            if occ is not None:
+                occ.place(item_id, box)
+                self._location[item_id] = container_id
+                self._notify(container_id)
+
+    def remove(self, item_id: str) -> bool:
+        with self._lock:
+            container_id = self._location.pop(item_id, None)
+            occ = self._containers.get(container_id)
+            if occ is None or not occ.remove(item_id):
+                return False
+            self._notify(container_id)
+            return True
+
+    def drop_container(self, container_id: str):
+        with self._lock:
+            occ = self._containers.pop(container_id, None)
+            if occ is not None:
+                for item_id, _ in occ.boxes():
+                    self._location.pop(item_id, None)
+            self._notify(container_id)
+
+    def clear(self):
+        with self._lock:
+            self._containers.clear()
+            self._location.clear()
+            self._notify(None)
@@ -0,0 +1,285 @@
+"""
+Compact in-memory model of the station's items.
+
+Every item is a row of a struct of NumPy arrays (dimensions, mass,
+priority, expiry ordinal, remaining uses, waste flag, container and
+placement box), with an itemId -> row map. Names, zones and container ids
+repeat across rows, so they are stored once and referenced by integer
+codes. A row costs well under a tenth of an ORM instance, and the scans
+behind the item listing, waste identification, return planning and
+simulation are vectorized over whole columns.
+
+The model is loaded once by `loader()` and kept in sync like the catalog:
+writers call `invalidate(item_ids)` after committing and those rows are
+re-read on the next access; `clear` reloads everything. Rows of deleted
+items are recycled.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import threading
+
+import numpy as np
+
+from placement import box_to_position
+from simulation import NO_EXPIRY, NO_LIMIT
+
+# (column, dtype, shape of one row); expiry and remaining match simulation.py
+COLUMNS = (
+    ("pk", np.int64, ()),
+    ("width", np.int32, ()),
+    ("depth", np.int32, ()),
+    ("height", np.int32, ()),
+    ("mass", np.float64, ()),
+    ("priority", np.int32, ()),
+    ("expiry", np.int64, ()),      # date ordinal, NO_EXPIRY if none
+    ("remaining", np.int64, ()),   # uses left, NO_LIMIT if unlimited
+    ("waste", np.bool_, ()),
+    ("alive", np.bool_, ()),       # False for recycled rows
+    ("name", np.int32, ()),        # code into StationModel.names
+    ("zone", np.int32, ()),        # code into StationModel.zones
+    ("container", np.int32, ()),   # code into StationModel.containers, -1 if not placed
+    ("box", np.int32, (6,)),
+)
+
+INITIAL_CAPACITY = 1024
+LOAD_CHUNK_SIZE = 10000
+
+
+class Strings:
+    """Distinct strings and their integer codes."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+
+@dataclass
+class StationView:
+    """Columns trimmed to the used rows. Only valid inside `StationModel.read`."""
+    columns: Dict[str, np.ndarray]
+    item_ids: List[Optional[str]]
+    names: List[str]
+    zones: List[str]
+    containers: List[str]
+    row_of: Dict[str, int]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def rows(self, item_ids: Iterable[str]) -> np.ndarray:
+        """Rows of the given items that exist, in the order given."""
+        row_of = self.row_of
+        return np.fromiter((row_of[i] for i in item_ids if i in row_of), dtype=np.int64)
+
+    def live(self, mask: np.ndarray) -> np.ndarray:
+        """Rows where `mask` holds, in insertion (primary key) order."""
+        rows = np.flatnonzero(mask & self.columns["alive"])
+        return rows[np.argsort(self.columns["pk"][rows], kind="stable")]
+
+    def container_of(self, row: int) -> Optional[str]:
+        code = int(self.columns["container"][row])
+        return self.containers[code] if code >= 0 else None
+
+    def position_of(self, row: int) -> Optional[dict]:
+        if self.columns["container"][row] < 0:
+            return None
+        return box_to_position(tuple(int(v) for v in self.columns["box"][row]))
+
+    def item_dicts(self, rows: np.ndarray) -> List[dict]:
+        """Rows in the /api/items format (the fields of ItemSchema), ready for JSON."""
+        c = self.columns
+        dates: Dict[int, Optional[str]] = {NO_EXPIRY: None}
+        expiry = []
+        for ordinal in c["expiry"][rows].tolist():
+            if ordinal not in dates:
+                dates[ordinal] = date.fromordinal(ordinal).isoformat()
+            expiry.append(dates[ordinal])
+        names, zones = self.names, self.zones
+        return [
+            {
+                "itemId": self.item_ids[row], "name": names[name], "width": width, "depth": depth,
+                "height": height, "mass": mass, "priority": priority, "expiryDate": expiry_date,
+                "usageLimit": None if remaining == NO_LIMIT else remaining, "preferredZone": zones[zone],
+            }
+            for row, name, width, depth, height, mass, priority, expiry_date, remaining, zone in zip(
+                rows.tolist(), c["name"][rows].tolist(), c["width"][rows].tolist(), c["depth"][rows].tolist(),
+                c["height"][rows].tolist(), c["mass"][rows].tolist(), c["priority"][rows].tolist(), expiry,
+                c["remaining"][rows].tolist(), c["zone"][rows].tolist()
+            )
+        ]
+
+
+class StationModel:
+    """
+    `loader(item_ids)` yields (id, itemId, name, width, depth, height, mass,
+    priority, expiryDate, usageLimit, preferredZone, is_waste, containerId,
+    *box) for the given items, or for every item when `item_ids` is None;
+    containerId and box are None for items that are not placed.
+    """
+
+    def __init__(self, loader: Callable[[Optional[List[str]]], Iterable[tuple]]):
+        self.loader = loader
+        self._lock = threading.RLock()
+        # Writers only touch these, under their own lock, so they never wait for a load
+        self._changes = threading.Lock()
+        self._reload = True
+        self._stale: set = set()
+        self._reset()
+
+    def _reset(self):
+        self._columns = {
+            name: np.zeros((INITIAL_CAPACITY, *shape), dtype=dtype) for name, dtype, shape in COLUMNS
+        }
+        self._size = 0
+        self._free: List[int] = []
+        self._item_ids: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self.names, self.zones, self.containers = Strings(), Strings(), Strings()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure()
+            return len(self._row_of)
+
+    def invalidate(self, item_ids: Iterable[str]):
+        with self._changes:
+            self._stale.update(item_ids)
+
+    def invalidate_container(self, container_id: str):
+        """Re-read every item placed in the container (it was emptied or deleted)."""
+        with self._lock:
+            code = self.containers.find(container_id)
+            if code is not None:
+                rows = np.flatnonzero(self._columns["container"][:self._size] == code)
+                self.invalidate(self._item_ids[i] for i in rows.tolist())
+
+    def clear(self):
+        with self._changes:
+            self._reload = True
+
+    @contextmanager
+    def read(self) -> Iterator[StationView]:
+        """
+        A view of the current columns. The model is locked while the view is
+        in use, so keep the block to the scan itself.
+        """
+        with self._lock:
+            self._ensure()
+            size = self._size
+            yield StationView(
+                {name: column[:size] for name, column in self._columns.items()},
+                self._item_ids, self.names.values, self.zones.values, self.containers.values, self._row_of
+            )
+
+    def _ensure(self):
+        with self._changes:
+            reload, self._reload = self._reload, False
+            stale, self._stale = self._stale, set()
+        try:
+            if reload:
+                self._reset()
+                self._store_all(self.loader(None), fresh=True)
+                # Drop the slack left by doubling, keeping a little room for new items
+                size = self._size + self._size // 8 + INITIAL_CAPACITY
+                self._columns = {name: column[:size].copy() for name, column in self._columns.items()}
+            elif stale:
+                found = self._store_all(self.loader(list(stale)))
+                for item_id in stale - found:
+                    self._drop(item_id)
+        except Exception:
+            with self._changes:
+                self._reload = self._reload or reload
+                self._stale |= stale
+            raise
+
+    def _store_all(self, rows: Iterable[tuple], fresh: bool = False) -> set:
+        """
+        Store loader rows in chunks, a column at a time; returns the itemIds
+        stored. `fresh` rows are all new to the model.
+        """
+        stored, chunk = set(), []
+        for values in rows:
+            chunk.append(values)
+            if len(chunk) == LOAD_CHUNK_SIZE:
+                stored.update(self._store(chunk, fresh))
+                chunk = []
+        if chunk:
+            stored.update(self._store(chunk, fresh))
+        return stored
+
+    def _store(self, chunk: List[tuple], fresh: bool = False):
+        (pk, item_ids, names, width, depth, height, mass, priority,
+         expiry, usage, zones, waste, container_ids, *box) = zip(*chunk)
+        if fresh:
+            start = self._extend(len(chunk))
+            rows = np.arange(start, start + len(chunk))
+            self._row_of.update(zip(item_ids, range(start, start + len(chunk))))
+            self._item_ids[start:] = item_ids
+        else:
+            rows = np.fromiter((self._row(item_id) for item_id in item_ids), dtype=np.int64, count=len(chunk))
+        c = self._columns
+        c["pk"][rows] = pk
+        c["width"][rows] = width
+        c["depth"][rows] = depth
+        c["height"][rows] = height
+        c["mass"][rows] = mass
+        c["priority"][rows] = priority
+        c["expiry"][rows] = [d.toordinal() if d else NO_EXPIRY for d in expiry]
+        c["remaining"][rows] = [NO_LIMIT if u is None else u for u in usage]
+        c["waste"][rows] = [bool(w) for w in waste]
+        c["alive"][rows] = True
+        c["name"][rows] = [self.names.code(n or "") for n in names]
+        c["zone"][rows] = [self.zones.code(z or "") for z in zones]
+        c["container"][rows] = [-1 if cid is None else self.containers.code(cid) for cid in container_ids]
+        c["box"][rows] = np.array([[v or 0 for v in column] for column in box], dtype=np.int32).T
+        return item_ids
+
+    def _row(self, item_id: str) -> int:
+        row = self._row_of.get(item_id)
+        if row is None:
+            row = self._row_of[item_id] = self._allocate()
+            self._item_ids[row] = item_id
+        return row
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        return self._extend(1)
+
+    def _extend(self, count: int) -> int:
+        """First of `count` new rows at the end, growing the columns as needed."""
+        if self._size + count > len(self._columns["pk"]):
+            capacity = max(2 * len(self._columns["pk"]), self._size + count)
+            for name, column in self._columns.items():
+                grown = np.zeros((capacity, *column.shape[1:]), dtype=column.dtype)
+                grown[:len(column)] = column
+                self._columns[name] = grown
+        start = self._size
+        self._size += count
+        self._item_ids.extend([None] * count)
+        return start
+
+    def _drop(self, item_id: str):
+        row = self._row_of.pop(item_id, None)
+        if row is None:
+            return
+        self._columns["alive"][row] = False
+        self._columns["waste"][row] = False
+        self._columns["container"][row] = -1
+        self._item_ids[row] = None
+        self._free.append(row)
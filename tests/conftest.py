@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# The app binds its engine at import, so point it at a scratch database first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='cargo-test-'), 'test.db')}"
+os.environ["AUDIT_LOG_SYNC"] = "1"
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_module.app) as client:
+        yield client
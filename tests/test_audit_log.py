@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, func, select
+from sqlalchemy.orm import Session, declarative_base
+
+from audit_log import AuditLogWriter
+
+Base = declarative_base()
+
+
+class Entry(Base):
+    __tablename__ = "entries"
+    id = Column(Integer, primary_key=True)
+    text = Column(String, nullable=False)
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(engine)
+    opened = []
+
+    def factory():
+        opened.append(1)
+        return Session(engine)
+
+    def count():
+        with Session(engine) as db:
+            return db.execute(select(func.count(Entry.id))).scalar_one()
+
+    factory.opened = opened
+    factory.count = count
+    yield factory
+    engine.dispose()
+
+
+def test_rows_are_written_in_batches(sessions):
+    writer = AuditLogWriter(sessions, Entry, flush_interval=5, batch_size=100)
+    for i in range(250):
+        writer.submit({"text": f"row {i}"})
+    writer.flush(timeout=5)
+    assert sessions.count() == 250
+    assert len(sessions.opened) <= 4  # two full batches, then the rest when flushed
+    writer.stop()
+
+
+def test_stop_writes_what_is_still_queued(sessions):
+    writer = AuditLogWriter(sessions, Entry, flush_interval=60)
+    for i in range(10):
+        writer.submit({"text": f"row {i}"})
+    writer.stop()
+    assert sessions.count() == 10
+
+
+def test_a_failed_batch_does_not_stop_the_writer(sessions):
+    writer = AuditLogWriter(sessions, Entry, flush_interval=0.01)
+    writer.submit({"text": None})  # violates NOT NULL
+    writer.flush(timeout=5)
+    writer.submit({"text": "after"})
+    writer.flush(timeout=5)
+    assert sessions.count() == 1
+    writer.stop()
+
+
+def test_synchronous_mode_writes_before_returning(sessions):
+    writer = AuditLogWriter(sessions, Entry, synchronous=True)
+    writer.submit({"text": "now"})
+    assert sessions.count() == 1
@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import date
+
+from benchmark import StationSpec, generate_station
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_same_seed_builds_the_same_station():
+    spec = StationSpec(containers=10, items=200, zone_skew=1.5, seed=7)
+    assert generate_station(spec, date(2025, 1, 1)) == generate_station(spec, date(2025, 1, 1))
+    other = generate_station(StationSpec(containers=10, items=200, zone_skew=1.5, seed=8), date(2025, 1, 1))
+    assert other != generate_station(spec, date(2025, 1, 1))
+
+
+def test_a_small_run_reports_every_benchmark(tmp_path):
+    # A separate process: the harness points the app at its own scratch database before importing it
+    output = tmp_path / "bench.json"
+    subprocess.run([sys.executable, os.path.join(ROOT, "benchmark.py"), "--containers", "5", "--items", "60",
+                    "--iterations", "2", "--output", str(output)],
+                   cwd=tmp_path, check=True, capture_output=True, timeout=120)
+    report = json.loads(output.read_text())
+    assert report["station"]["items"] == 60
+    kinds = {r["kind"] for r in report["results"]}
+    assert kinds == {"endpoint", "algorithm"}
+    assert all(r["errors"] == 0 and r["p50_ms"] <= r["p99_ms"] for r in report["results"])
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, declarative_base
+
+import bulk_ingest
+from bulk_ingest import bulk_insert
+
+Base = declarative_base()
+
+
+class Thing(Base):
+    __tablename__ = "things"
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, nullable=False)
+    other = Column(String, unique=True)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Thing(key="stored"))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def stored(db):
+    return sorted(db.execute(select(Thing.key)).scalars())
+
+
+def rows(*keys):
+    return [{"key": k} for k in keys]
+
+
+def test_strict_mode_writes_nothing_on_conflict(db):
+    result = bulk_insert(db, Thing, "key", rows("a", "stored", "b", "a"))
+    db.commit()
+    assert result.inserted == [] and sorted(result.conflicts) == ["a", "stored"]
+    assert stored(db) == ["stored"]
+
+
+def test_partial_mode_skips_conflicts(db):
+    result = bulk_insert(db, Thing, "key", rows("a", "stored", "b", "a"), partial=True, chunk_size=1)
+    db.commit()
+    assert result.inserted == ["a", "b"] and sorted(result.conflicts) == ["a", "stored"]
+    assert stored(db) == ["a", "b", "stored"]
+
+
+@pytest.mark.parametrize("earlier", [False, True])
+@pytest.mark.parametrize("partial", [False, True])
+def test_keys_taken_after_the_check_are_reported(db, monkeypatch, partial, earlier):
+    if earlier:
+        db.add(Thing(key="earlier"))  # the caller's own pending write must survive
+        db.flush()
+    real = bulk_ingest.existing_keys
+    calls = []
+
+    def misses_first_time(*args):
+        calls.append(1)
+        return set() if len(calls) == 1 else real(*args)
+
+    monkeypatch.setattr(bulk_ingest, "existing_keys", misses_first_time)
+    result = bulk_insert(db, Thing, "key", rows("a", "stored"), partial=partial)
+    db.commit()
+    assert result.conflicts == ["stored"]
+    assert stored(db) == sorted(["stored"] + ["a"] * partial + ["earlier"] * earlier)
+
+
+def test_other_constraint_errors_are_raised(db):
+    with pytest.raises(IntegrityError):
+        bulk_insert(db, Thing, "key", [{"key": "a", "other": "x"}, {"key": "b", "other": "x"}])
@@ -0,0 +1,48 @@
+from catalog_cache import LRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # b is now the oldest
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.put("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_loads_that_overlap_a_write_are_not_cached():
+    cache = LRUCache()
+    generation = cache.generation  # read started
+    cache.invalidate(["a"])        # a writer committed meanwhile
+    cache.put("a", "stale", generation)
+    assert cache.get("a") is None
+    cache.put("a", "fresh", cache.generation)
+    assert cache.get("a") == "fresh"
+
+
+def test_zero_size_caches_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,55 @@
+import io
+
+HEADER = "itemId,name,width,depth,height,mass,priority,expiryDate,usageLimit,preferredZone\n"
+
+
+def upload(client, path, text):
+    return client.post(path, files={"file": ("upload.csv", io.BytesIO(text.encode()), "text/csv")}).json()
+
+
+def test_duplicate_rows_only_fail_themselves(client):
+    rows = [f"csv-dup-{i},Thing {i},10,10,10,1,50,,5,A\n" for i in range(5)]
+    result = upload(client, "/api/import/items", HEADER + "".join(rows) + rows[2])
+    assert result["itemsImported"] == 5
+    assert [e["line"] for e in result["errors"]] == [7]
+
+    again = upload(client, "/api/import/items", HEADER + rows[0] + "csv-dup-5,Thing 5,10,10,10,1,50,,5,A\n")
+    assert again["itemsImported"] == 1
+    assert [e["line"] for e in again["errors"]] == [2]
+
+
+def test_invalid_rows_are_reported_with_their_line(client):
+    result = upload(client, "/api/import/items", HEADER + "csv-bad-1,Bad,ten,10,10,1,50,,5,A\n"
+                                                         "csv-bad-2,Good,10,10,10,1,50,,5,A\n")
+    assert result["itemsImported"] == 1
+    assert result["errors"][0]["line"] == 2
+
+
+def test_blank_usage_limit_means_no_limit(client):
+    result = upload(client, "/api/import/items", HEADER + "csv-nolimit-1,Wrench,10,10,10,1,50,,,A\n")
+    assert result["itemsImported"] == 1 and result["errors"] == []
+    item = client.get("/api/items/csv-nolimit-1").json()
+    assert item["usageLimit"] is None
+
+
+def test_import_updates_the_indexes_in_place(client, app_module, monkeypatch):
+    m = app_module
+    client.get("/api/search/items", params={"q": "warmup"})
+    client.get("/api/items")
+    m.expiry_schedule.expiring_before(m.date(2100, 1, 1))
+
+    def no_reload(*args, **kwargs):
+        raise AssertionError("index reloaded")
+
+    monkeypatch.setattr(m.name_index, "loader", no_reload)
+    monkeypatch.setattr(m.expiry_schedule, "loader", no_reload)
+    monkeypatch.setattr(m.station, "loader", lambda item_ids=None: no_reload() if item_ids is None
+                        else m.load_station_rows(item_ids))
+
+    result = upload(client, "/api/import/items", HEADER + "csv-idx-1,Zeppelin Gasket,10,10,10,1,50,2099-01-01,5,A\n")
+    assert result["itemsImported"] == 1
+    names = client.get("/api/search/items", params={"q": "zeppelin"}).json()
+    assert [r["itemId"] for r in names["results"]] == ["csv-idx-1"]
+    assert (m.date(2099, 1, 1), "csv-idx-1") in m.expiry_schedule.expiring_before(m.date(2100, 1, 1))
+    with m.station.read() as view:
+        assert "csv-idx-1" in view.row_of
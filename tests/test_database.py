@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, text
+
+from database import ASYNC_DRIVERS, add_missing_columns, build_engine, pool_options, rebuild_table, with_driver
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./a.db", "sqlite+aiosqlite:///./a.db"),
+    ("sqlite+pysqlite:///./a.db", "sqlite+aiosqlite:///./a.db"),
+    ("postgresql://u:p@h/db", "postgresql+asyncpg://u:p@h/db"),
+    ("postgresql+psycopg://u:p@h/db", "postgresql+psycopg://u:p@h/db"),  # explicit driver kept
+])
+def test_async_driver_is_swapped_in(url, expected):
+    assert with_driver(url, ASYNC_DRIVERS) == expected
+
+
+def test_pool_sizing_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "12")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "3")
+    options = pool_options("postgresql://u:p@h/db")
+    assert options["pool_size"] == 12 and options["max_overflow"] == 3
+    assert "pool_size" not in pool_options("sqlite://")  # in-memory: one shared connection
+
+
+def test_sqlite_connections_use_wal(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+    engine.dispose()
+
+
+def table(*columns):
+    return Table("things", MetaData(), Column("id", Integer, primary_key=True), *columns)
+
+
+def test_missing_columns_are_added(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'add.db'}")
+    table(Column("name", String)).create(engine)
+    added = add_missing_columns(engine, table(Column("name", String), Column("size", Integer)))
+    assert added == ["size"]
+    assert {c["name"] for c in inspect(engine).get_columns("things")} == {"id", "name", "size"}
+    engine.dispose()
+
+
+def test_rebuild_changes_nullability_and_keeps_rows(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'rebuild.db'}")
+    table(Column("name", String, nullable=False, index=True)).create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO things (id, name) VALUES (1, 'a'), (2, 'b')"))
+
+    new = table(Column("name", String, nullable=True, index=True))
+    assert rebuild_table(engine, new, lambda row: {**row, "name": row["name"].upper()}) == 2
+    columns = {c["name"]: c for c in inspect(engine).get_columns("things")}
+    assert columns["name"]["nullable"]
+    assert [i["name"] for i in inspect(engine).get_indexes("things")] == ["ix_things_name"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM things ORDER BY id")).scalars().all() == ["A", "B"]
+        assert "things_old" not in inspect(conn).get_table_names()
+    engine.dispose()
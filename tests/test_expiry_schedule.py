@@ -0,0 +1,66 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from expiry_schedule import ExpirySchedule
+
+START = date(2025, 1, 1)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_a_plain_dict_under_random_updates(seed):
+    rng = random.Random(seed)
+    model = {f"i{k}": START + timedelta(days=rng.randrange(100)) for k in range(200)}
+    schedule = ExpirySchedule(lambda: list(model.items()) + [("no-expiry", None)])
+    today = START
+
+    for _ in range(3000):
+        op = rng.random()
+        item_id = f"i{rng.randrange(300)}"
+        if op < 0.35:
+            expiry = rng.choice([None, today + timedelta(days=rng.randrange(-3, 100))])
+            schedule.add(item_id, expiry)
+            if expiry is None:
+                model.pop(item_id, None)
+            else:
+                model[item_id] = expiry
+        elif op < 0.7:
+            schedule.remove([item_id])
+            model.pop(item_id, None)
+        elif op < 0.9:
+            day = today + timedelta(days=rng.randrange(30))
+            assert sorted(schedule.expiring_before(day)) == sorted((d, i) for i, d in model.items() if d < day)
+        else:
+            today += timedelta(days=rng.randrange(3))
+            expected = sorted((d, i) for i, d in model.items() if d < today)
+            popped = schedule.advance(today)
+            assert sorted(popped) == expected
+            assert [d for d, _ in popped] == sorted(d for d, _ in popped)
+            for _, i in popped:
+                del model[i]
+        assert len(schedule) == len(model)
+
+
+def test_stale_entries_are_dropped_once_they_fill_half_the_heap():
+    schedule = ExpirySchedule(lambda: [(f"i{k}", START) for k in range(100)])
+    len(schedule)
+    for days in range(1, 6):
+        for k in range(100):
+            schedule.add(f"i{k}", START + timedelta(days=days))  # each move leaves a stale entry
+    assert len(schedule._heap) == 600
+    schedule.remove(["i0"])
+    assert len(schedule._heap) == 99
+    assert len(schedule.advance(START + timedelta(days=10))) == 99
+
+
+def test_writes_before_the_first_query_wait_for_the_load():
+    loads = []
+    schedule = ExpirySchedule(lambda: loads.append(1) or [("a", START)])
+    schedule.add("b", START)  # not loaded yet: the loader will return it
+    schedule.remove(["a"])
+    assert loads == []
+    assert schedule.expiring_before(START + timedelta(days=1)) == [(START, "a")]
+    schedule.clear()
+    assert schedule.advance(START + timedelta(days=1)) == [(START, "a")]
+    assert loads == [1, 1]
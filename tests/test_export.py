@@ -0,0 +1,45 @@
+import csv
+import gzip
+import io
+
+
+def export(client, **params):
+    return client.get("/api/export/arrangement", params=params)
+
+
+def rows_of(text):
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_export_lists_placed_and_unplaced_items(client):
+    client.post("/api/containers", json=[{"containerId": "exp-c", "zone": "E", "width": 10, "depth": 10, "height": 10}])
+    client.post("/api/items", json=[
+        {"itemId": f"exp-{k}", "name": f"Export {k}", "width": 2, "depth": 2, "height": 2, "mass": 1, "priority": 1,
+         "preferredZone": "E"} for k in range(2)
+    ])
+    assert client.post("/api/place", json={
+        "itemId": "exp-0", "userId": "u", "timestamp": "2025-01-01T00:00:00", "containerId": "exp-c",
+        "position": {"startCoordinates": {"width": 1, "depth": 2, "height": 3},
+                     "endCoordinates": {"width": 3, "depth": 4, "height": 5}}
+    }).json()["success"]
+
+    rows = rows_of(export(client).text)
+    assert rows[0] == ["ItemID", "ContainerID", "Start Coordinates", "End Coordinates"]
+    by_id = {row[0]: row for row in rows[1:]}
+    assert by_id["exp-0"] == ["exp-0", "exp-c", "(1,2,3)", "(3,4,5)"]
+    assert by_id["exp-1"][1] == "N/A"
+
+    chosen = rows_of(export(client, columns="name,zone").text)
+    assert chosen[0] == ["Name", "Zone"] and ["Export 0", "E"] in chosen
+
+
+def test_compressed_export_matches_the_plain_one(client):
+    plain = export(client)
+    packed = export(client, compress=True)
+    assert packed.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(packed.content) == plain.content
+
+
+def test_unknown_columns_are_rejected(client):
+    response = export(client, columns="itemId,colour")
+    assert response.status_code == 400 and "colour" in response.json()["detail"]
@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+
+def other_worker_adds(m, item_id, name):
+    """Write like another process would: straight to the database, bumping the counter."""
+    engine = create_engine(m.DATABASE_URL)
+    try:
+        with Session(engine) as db:
+            db.add(m.Item(itemId=item_id, name=name, width=10, depth=10, height=10, mass=1.0,
+                          priority=50, preferredZone="A"))
+            db.execute(update(m.StationGeneration).values(value=m.StationGeneration.value + 1))
+            db.commit()
+    finally:
+        engine.dispose()
+
+
+def search(client, q):
+    return [r["itemId"] for r in client.get("/api/search/items", params={"q": q}).json()["results"]]
+
+
+def test_writes_of_another_worker_are_seen(client, app_module):
+    assert search(client, "quokka") == []  # index loaded without the item
+    other_worker_adds(app_module, "inv-foreign-1", "Quokka Clamp")
+    assert search(client, "quokka") == ["inv-foreign-1"]
+    assert client.get("/api/items/inv-foreign-1").status_code == 200
+
+
+def test_own_writes_do_not_reload(client, app_module, monkeypatch):
+    m = app_module
+    search(client, "warmup")
+
+    def no_reload(*args, **kwargs):
+        raise AssertionError("index reloaded")
+
+    monkeypatch.setattr(m.name_index, "loader", no_reload)
+    item = {"itemId": "inv-own-1", "name": "Wombat Hinge", "width": 10, "depth": 10, "height": 10,
+            "mass": 1, "priority": 50, "expiryDate": None, "usageLimit": 5, "preferredZone": "A"}
+    assert client.post("/api/items", json=[item]).status_code == 200
+    assert search(client, "wombat") == ["inv-own-1"]
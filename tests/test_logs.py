@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+
+def add_logs(m, user_id, timestamps):
+    with m.SessionLocal() as db:
+        db.add_all(m.Log(timestamp=t, user_id=user_id, action_type="placement", details={"n": i})
+                   for i, t in enumerate(timestamps))
+        db.commit()
+
+
+def pages(client, limit, **params):
+    cursor = None
+    while True:
+        body = client.get("/api/logs", params={**params, "limit": limit,
+                                               **({"cursor": cursor} if cursor else {})}).json()
+        yield body["logs"]
+        cursor = body["nextCursor"]
+        if cursor is None:
+            return
+
+
+def test_pages_cover_every_row_once_in_order(client, app_module):
+    base = datetime(2025, 3, 10, 12)
+    # Several rows share each timestamp, so the id breaks the ties
+    add_logs(app_module, "logs-order", [base + timedelta(minutes=i // 3) for i in range(20)])
+
+    seen = [log["details"]["n"] for page in pages(client, 3, userId="logs-order") for log in page]
+    assert sorted(seen) == list(range(20))
+    assert seen == sorted(seen, key=lambda n: (n // 3, n), reverse=True)
+
+
+def test_new_rows_do_not_shift_later_pages(client, app_module):
+    base = datetime(2025, 3, 10, 12)
+    add_logs(app_module, "logs-stable", [base] * 10)
+
+    walk = pages(client, 4, userId="logs-stable")
+    first = next(walk)
+    add_logs(app_module, "logs-stable", [base + timedelta(hours=1)] * 5)  # newer than the cursor
+    rest = [log for page in walk for log in page]
+    assert [log["details"]["n"] for log in first + rest] == list(range(9, -1, -1))
+
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get("/api/logs", params={"cursor": "not-a-cursor"}).status_code == 400
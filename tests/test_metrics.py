@@ -0,0 +1,63 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from metrics import Metrics, MetricsMiddleware, instrument_engine
+
+
+@pytest.fixture
+def setup():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    metrics = Metrics(query_warn_threshold=3)
+    instrument_engine(engine, metrics)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/things/{n}")
+    def things(n: int):
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT 1")).scalar() for _ in range(n)]
+
+    @app.get("/stream")
+    def stream():
+        def rows():
+            with engine.connect() as conn:
+                for _ in range(2):
+                    yield f"{conn.execute(text('SELECT 2')).scalar()}\n"
+        return StreamingResponse(rows())
+
+    with TestClient(app) as client:
+        yield client, metrics, engine
+    engine.dispose()
+
+
+def line(metrics, prefix):
+    return [l for l in metrics.render().splitlines() if l.startswith(prefix)]
+
+
+def test_queries_are_counted_per_route_template(setup):
+    client, metrics, _ = setup
+    client.get("/things/2")
+    client.get("/things/5")
+    client.get("/nowhere")
+    assert line(metrics, 'http_requests_total{method="GET",route="/things/{n}",status="200"}') == \
+           ['http_requests_total{method="GET",route="/things/{n}",status="200"} 2']
+    assert line(metrics, 'http_requests_total{method="GET",route="unmatched",status="404"}')
+    assert line(metrics, 'db_queries_per_request_sum{method="GET",route="/things/{n}"}') == \
+           ['db_queries_per_request_sum{method="GET",route="/things/{n}"} 7.0']
+    assert line(metrics, 'db_queries_per_request_bucket{method="GET",route="/things/{n}",le="2"}')[0].endswith(" 1")
+    # Only the five-query request is over the threshold of three
+    assert line(metrics, 'db_query_heavy_requests_total{method="GET",route="/things/{n}"}') == \
+           ['db_query_heavy_requests_total{method="GET",route="/things/{n}"} 1']
+
+
+def test_streaming_bodies_and_background_queries(setup):
+    client, metrics, engine = setup
+    assert client.get("/stream").text == "2\n2\n"
+    assert line(metrics, 'db_queries_per_request_sum{method="GET",route="/stream"}')[0].endswith(" 2.0")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 3"))
+    assert line(metrics, "db_background_queries_total") == ["db_background_queries_total 1"]
@@ -0,0 +1,81 @@
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from mission_log import ADDED, DELETED, EXPIRY, UNDOCKED, USAGE, MissionState, added_details, replay
+from simulation import NO_EXPIRY, NO_LIMIT
+
+START = date(2025, 1, 1)
+
+
+def random_events(seed, n=2000):
+    rng = random.Random(seed)
+    events = []
+    for event_id in range(1, n + 1):
+        day = START + timedelta(days=event_id // 50)
+        item_id = f"i{rng.randrange(100)}"
+        kind = rng.choice([ADDED, ADDED, USAGE, USAGE, USAGE, EXPIRY, DELETED, UNDOCKED])
+        if kind == ADDED:
+            expiry = rng.choice([None, day + timedelta(days=rng.randrange(60))])
+            events.append((event_id, day, kind, item_id, None,
+                           added_details(expiry, rng.choice([None, rng.randrange(10)]), rng.random() < 0.1)))
+        else:
+            events.append((event_id, day, kind, item_id, rng.randint(1, 3) if kind == USAGE else None, None))
+    return events
+
+
+def test_usage_runs_an_item_out_and_marks_it_waste():
+    state = replay(MissionState(START), [
+        (1, START, ADDED, "a", None, added_details(None, 3, False)),
+        (2, START, USAGE, "a", 2, None),
+    ])
+    assert state.items["a"] == [None, 1, False]
+    replay(state, [(3, START + timedelta(days=1), USAGE, "a", 5, None)])
+    assert state.items["a"] == [None, 0, True]
+    assert state.waste_ids() == ["a"] and state.day == START + timedelta(days=1)
+    replay(state, [(4, START, UNDOCKED, "a", None, None), (5, START, USAGE, "gone", 1, None)])
+    assert state.items == {} and state.event_id == 5
+
+
+def test_snapshot_plus_later_events_equals_a_full_replay():
+    events = random_events(0)
+    full = replay(MissionState(START), events)
+    for cut in (0, 1, 700, 1999, 2000):
+        snapshot = MissionState.from_bytes(replay(MissionState(START), events[:cut]).to_bytes())
+        assert replay(snapshot, events[cut:]) == full
+
+
+def test_columns_follow_the_items():
+    state = replay(MissionState(START), random_events(1, 300))
+    ids, expiry, remaining, waste = state.to_arrays()
+    assert ids == list(state.items)
+    for i, item_id in enumerate(ids):
+        e, r, w = state.items[item_id]
+        assert expiry[i] == (NO_EXPIRY if e is None else e)
+        assert remaining[i] == (NO_LIMIT if r is None else r)
+        assert waste[i] == w
+
+
+def test_state_endpoint_replays_from_the_nearest_snapshot(client, app_module):
+    m = app_module
+    item = {"itemId": "mlog-1", "name": "Log Probe", "width": 5, "depth": 5, "height": 5, "mass": 1,
+            "priority": 50, "usageLimit": 4, "preferredZone": "A"}
+    assert client.post("/api/items", json=[item]).status_code == 200
+    with m.SessionLocal() as db:
+        last = db.execute(select(m.func.max(m.SimulationEvent.id))).scalar_one()
+        state = client.get("/api/simulate/state", params={"eventId": last}).json()
+        base = db.execute(select(m.SimulationSnapshot.state)
+                          .where(m.SimulationSnapshot.event_id == state["snapshotEventId"])).scalars().first()
+        rows = db.execute(select(m.SimulationEvent.id, m.SimulationEvent.day, m.SimulationEvent.event_type,
+                                 m.SimulationEvent.item_id, m.SimulationEvent.uses, m.SimulationEvent.details)
+                          .where(m.SimulationEvent.id > state["snapshotEventId"], m.SimulationEvent.id <= last)
+                          .order_by(m.SimulationEvent.id)).all()
+    expected = replay(MissionState.from_bytes(base), rows)
+    assert (state["eventId"], state["replayedEvents"]) == (last, len(rows)) and rows
+    assert (state["items"], state["wasteItems"]) == (len(expected.items), len(expected.waste_ids()))
+    assert "mlog-1" in expected.items
+
+    assert client.post("/api/simulate/snapshot").json()["eventId"] == last
+    state = client.get("/api/simulate/state", params={"eventId": last}).json()
+    assert (state["snapshotEventId"], state["replayedEvents"]) == (last, 0)
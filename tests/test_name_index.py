@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from name_index import MATCH_NAMES, NameIndex, edit_distance, max_edits, normalize
+
+WORDS = ["bolt", "bolts", "boltcutter", "wrench", "wren", "oxygen", "oxy", "tank", "food", "pack",
+         "medical", "kit", "filter", "water", "pump"]
+QUERIES = ["bolt", "Bolt Cutter", "wren", "ox", "tank oxy", "lter", "ygen", "medical kit", "food pack",
+           "wrnch", "oxgyen", "fiter", "tnak", "pu", "k", "water pump filter", "nothing"]
+
+
+def brute_force_tier(key, name):
+    """Tier of `name` for the normalized query `key`, for the tiers with an exact definition."""
+    words, parts = normalize(name).split(), key.split()
+    if normalize(name) == key:
+        return "exact"
+    if all(any(w.startswith(p) for w in words) for p in parts):
+        return "prefix" if words[0].startswith(parts[0]) else "word"
+    if all(any(p in w if len(p) >= 3 else w.startswith(p) for w in words) for p in parts):
+        return "substring"
+    return None
+
+
+def random_items(seed, n=300):
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+        name = rng.choice([" ", "  "]).join(w.capitalize() if rng.random() < 0.5 else w for w in words)
+        items.append((f"it{i:03d}", name))
+    return items
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("query", QUERIES)
+def test_tiers_and_order_match_brute_force(seed, query):
+    items = random_items(seed)
+    index = NameIndex(lambda: items)
+    key = normalize(query)
+    total, results = index.search(query, limit=1000)
+
+    expected = []
+    for item_id, name in items:
+        tier = brute_force_tier(key, name)
+        if tier is not None:
+            expected.append((MATCH_NAMES.index(tier), len(normalize(name)), normalize(name), item_id))
+    expected.sort()
+    exact_tiers = [r for r in results if r.match != "fuzzy"]
+    assert [(r.itemId, r.match) for r in exact_tiers] == [(e[3], MATCH_NAMES[e[0]]) for e in expected]
+
+    # Fuzzy matches come last and are each within the allowed edits of a word (or its beginning)
+    fuzzy = results[len(exact_tiers):]
+    assert all(r.match == "fuzzy" for r in fuzzy)
+    for r in fuzzy:
+        words = normalize(r.name).split()
+        for p in key.split():
+            k = max_edits(p)
+            assert any(edit_distance(p, w, k) <= k or edit_distance(p, w[:len(p)], k) <= k or p in w
+                       for w in words)
+    assert total == len(results)
+
+
+def test_typos_are_found():
+    index = NameIndex(lambda: [("a", "Oxygen Tank"), ("b", "Wrench"), ("c", "Water Filter")])
+    assert [(r.itemId, r.match) for r in index.search("oxgyen")[1]] == [("a", "fuzzy")]
+    assert [(r.itemId, r.match) for r in index.search("wrnch")[1]] == [("b", "fuzzy")]
+    assert [r.itemId for r in index.search("fitler")[1]] == ["c"]
+
+
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_pages_concatenate_to_the_full_list(limit):
+    index = NameIndex(lambda: random_items(0))
+    total, everything = index.search("bolt", limit=1000)
+    paged = []
+    for offset in range(0, total, limit):
+        assert index.search("bolt", limit=limit, offset=offset)[0] == total
+        paged.extend(index.search("bolt", limit=limit, offset=offset)[1])
+    assert paged == everything
+
+
+def test_add_and_remove_keep_the_index_in_sync():
+    items = random_items(1, 100)
+    index = NameIndex(lambda: items)
+    len(index)  # load
+    index.add("new-1", "Plasma Torch")
+    index.add("it000", "Plasma Cutter")  # renamed
+    index.remove("it001")
+    current = dict(items)
+    current.update({"new-1": "Plasma Torch", "it000": "Plasma Cutter"})
+    del current["it001"]
+
+    rebuilt = NameIndex(lambda: current.items())
+    for query in QUERIES + ["plasma"]:
+        assert index.search(query, limit=1000) == rebuilt.search(query, limit=1000)
+    assert [r.itemId for r in index.search("plasma")[1]] == ["new-1", "it000"]
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from spatial_index import ContainerOccupancy
+
+
+def blocks(a, b):
+    """Brute force: `a` is in front of `b` and their width/height footprints overlap."""
+    return a[4] <= b[1] and a[0] < b[3] and b[0] < a[3] and a[2] < b[5] and b[2] < a[5]
+
+
+def random_container(seed):
+    rng = random.Random(seed)
+    occ = ContainerOccupancy(20, 20, 20, track_occlusion=True)
+    for k in range(80):
+        w, d, h = (rng.randrange(18) for _ in range(3))
+        box = (w, d, h, w + rng.randint(1, 3), d + rng.randint(1, 3), h + rng.randint(1, 3))
+        if not occ.collides(box):
+            occ.place(f"k{k}", box)
+        if rng.random() < 0.2 and len(occ):
+            occ.remove(rng.choice(occ.boxes())[0])
+    return rng, dict(occ.boxes()), occ
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_blockers_are_the_transitive_items_in_front(seed):
+    rng, boxes, occ = random_container(seed)
+    for _ in range(20):
+        targets = set(rng.sample(sorted(boxes), 3))
+        expected, stack = set(), list(targets)
+        while stack:
+            box = boxes[stack.pop()]
+            for key, other in boxes.items():
+                if key not in expected and blocks(other, box):
+                    expected.add(key)
+                    stack.append(key)
+        assert occ.blockers_of(targets) == expected - targets
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_removal_order_takes_blockers_first(seed):
+    _, boxes, occ = random_container(seed)
+    order = occ.removal_order(boxes)
+    assert sorted(order) == sorted(boxes)
+    position = {key: i for i, key in enumerate(order)}
+    for a in boxes:
+        for b in boxes:
+            if blocks(boxes[a], boxes[b]):
+                assert position[a] < position[b]
+
+
+def test_keys_not_stored_are_skipped():
+    occ = ContainerOccupancy(10, 10, 10, track_occlusion=True)
+    occ.place("back", (0, 5, 0, 10, 10, 10))
+    occ.place("front", (0, 0, 0, 10, 5, 10))
+    assert occ.blockers_of(["back", "gone"]) == {"front"}
+    assert occ.removal_order(["back", "gone", "front"]) == ["front", "back"]
+    occ.remove("front")
+    assert occ.blockers_of(["back"]) == set()
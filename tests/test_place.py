@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def position(w0, d0, h0, w1, d1, h1):
+    return {"startCoordinates": {"width": w0, "depth": d0, "height": h0},
+            "endCoordinates": {"width": w1, "depth": d1, "height": h1}}
+
+
+def place(client, item_id, container_id, pos):
+    return client.post("/api/place", json={"itemId": item_id, "containerId": container_id, "position": pos,
+                                           "userId": "u", "timestamp": "2025-01-01T00:00:00"})
+
+
+def test_concurrent_placements_never_overlap(client, app_module):
+    m = app_module
+    assert client.post("/api/containers", json=[{"containerId": "place-c", "zone": "P", "width": 20, "depth": 20,
+                                                 "height": 20}]).json()["success"]
+    items = [{"itemId": f"place-{k}", "name": "Crate", "width": 10, "depth": 10, "height": 10, "mass": 1,
+              "priority": 10, "preferredZone": "P"} for k in range(16)]
+    assert client.post("/api/items", json=items).json()["success"]
+
+    def place_one(k):
+        # Every request wants the same corner, shifted by at most a few units
+        return place(client, f"place-{k}", "place-c", position(k % 3, 0, 0, k % 3 + 10, 10, 10)).status_code
+
+    with ThreadPoolExecutor(16) as pool:
+        statuses = list(pool.map(place_one, range(16)))
+    assert statuses.count(200) == 1 and statuses.count(400) == 15
+
+    with m.SessionLocal() as db:
+        container = db.query(m.Container).filter_by(containerId="place-c").one()
+        assert db.query(m.ItemPlacement).filter_by(container_id=container.id).count() == 1
+    assert len(m.occupancy.get("place-c")) == 1
+
+
+def test_overlaps_are_rejected_and_moves_ignore_the_item_itself(client):
+    assert client.post("/api/containers", json=[{"containerId": "place-d", "zone": "P", "width": 20, "depth": 20,
+                                                 "height": 20}]).json()["success"]
+    items = [{"itemId": f"place-d{k}", "name": "Crate", "width": 10, "depth": 10, "height": 10, "mass": 1,
+              "priority": 10, "preferredZone": "P"} for k in range(2)]
+    assert client.post("/api/items", json=items).json()["success"]
+
+    def status(item_id, *box):
+        return place(client, item_id, "place-d", position(*box)).status_code
+
+    assert status("place-d0", 0, 0, 0, 10, 10, 10) == 200
+    overlapping = place(client, "place-d1", "place-d", position(5, 5, 5, 15, 15, 15))
+    assert overlapping.status_code == 400 and "place-d0" in overlapping.json()["detail"]
+    assert status("place-d1", 10, 0, 0, 20, 10, 10) == 200  # touching is fine
+    assert status("place-d0", 0, 0, 5, 10, 10, 15) == 200   # overlaps only its own old spot
+    assert status("place-d1", 10, 0, 0, 20, 25, 10) == 400  # outside the container
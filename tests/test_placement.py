@@ -0,0 +1,66 @@
+from datetime import date
+import time
+
+from benchmark import StationSpec, generate_station
+from placement import PackContainer, PackItem, plan_placements, position_to_box
+from spatial_index import ContainerOccupancy, overlaps
+
+# /api/placement target: a 5,000 item batch over 500 containers in well under a second
+TARGET_CONTAINERS = 500
+TARGET_ITEMS = 5000
+TARGET_SECONDS = 1.0
+
+
+def synthetic(containers: int, items: int, seed: int = 42):
+    spec = StationSpec(containers=containers, items=items, seed=seed)
+    conts, rows = generate_station(spec, date(2026, 1, 1))
+    packs = [PackContainer(c["containerId"], c["zone"], c["width"], c["depth"], c["height"]) for c in conts]
+    pack_items = [PackItem(i["itemId"], i["width"], i["depth"], i["height"], i["priority"], i["preferredZone"])
+                  for i in rows]
+    return packs, pack_items
+
+
+def assert_valid(placements, containers):
+    dims = {c.containerId: (c.width, c.depth, c.height) for c in containers}
+    by_container = {}
+    for p in placements:
+        box = position_to_box(p["position"])
+        w, d, h = dims[p["containerId"]]
+        assert 0 <= box[0] < box[3] <= w and 0 <= box[1] < box[4] <= d and 0 <= box[2] < box[5] <= h
+        for other in by_container.setdefault(p["containerId"], []):
+            assert not overlaps(box, other)
+        by_container[p["containerId"]].append(box)
+
+
+def test_placements_are_in_bounds_and_disjoint():
+    containers, items = synthetic(20, 2000, seed=7)
+    placements, unplaced = plan_placements(items, containers)
+    assert len(placements) + len(unplaced) == len(items)
+    assert_valid(placements, containers)
+
+
+def test_preferred_zone_first_and_priority_order():
+    containers = [PackContainer("a", "A", 10, 10, 10), PackContainer("b", "B", 10, 10, 10)]
+    items = [PackItem("low", 10, 10, 10, priority=1, preferredZone="B"),
+             PackItem("high", 10, 10, 10, priority=90, preferredZone="B")]
+    placements, unplaced = plan_placements(items, containers)
+    assert {p["itemId"]: p["containerId"] for p in placements} == {"high": "b", "low": "a"}
+    assert unplaced == []
+
+
+def test_stored_items_are_avoided_unless_ignored():
+    occ = ContainerOccupancy(10, 10, 10)
+    occ.place("stored", (0, 0, 0, 10, 10, 5))
+    items = [PackItem("new", 10, 10, 10)]
+    assert plan_placements(items, [PackContainer("c", "A", 10, 10, 10, occ)])[1] == ["new"]
+    placements, _ = plan_placements(items, [PackContainer("c", "A", 10, 10, 10, occ, {"stored"})])
+    assert position_to_box(placements[0]["position"]) == (0, 0, 0, 10, 10, 10)
+
+
+def test_placement_target():
+    containers, items = synthetic(TARGET_CONTAINERS, TARGET_ITEMS)
+    started = time.perf_counter()
+    placements, _ = plan_placements(items, containers)
+    elapsed = time.perf_counter() - started
+    assert_valid(placements, containers)
+    assert elapsed < TARGET_SECONDS, f"{TARGET_ITEMS} items into {TARGET_CONTAINERS} containers took {elapsed:.2f}s"
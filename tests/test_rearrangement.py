@@ -0,0 +1,48 @@
+from placement import PackContainer, PackItem, plan_placements
+from rearrangement import StoredItem, plan_rearrangements
+from spatial_index import ContainerOccupancy, overlaps
+
+
+def station():
+    full = ContainerOccupancy(10, 10, 10, track_occlusion=True)
+    stored = {}
+    for i in range(2):
+        box = (0, 0, 5 * i, 10, 10, 5 * i + 5)
+        full.place(f"low{i}", box)
+        stored[f"low{i}"] = StoredItem(f"low{i}", "A", box, priority=i + 1, preferredZone="A")
+    spare = ContainerOccupancy(10, 10, 10, track_occlusion=True)
+    containers = [PackContainer("A", "A", 10, 10, 10, full), PackContainer("B", "B", 10, 10, 10, spare)]
+    return containers, stored
+
+
+def test_moves_lower_priority_items_out_of_the_preferred_zone():
+    containers, stored = station()
+    target = PackItem("high", 10, 10, 5, priority=90, preferredZone="A")
+    placements, unplaced = plan_placements([target], containers)
+    assert placements[0]["containerId"] == "B"
+
+    plan = plan_rearrangements([target], containers, stored, {"high": "B"})
+    assert plan.complete
+    container_id, box = plan.placements["high"]
+    assert container_id == "A"
+    moved = {m.itemId: m for m in plan.moves}
+    assert len(moved) == 1
+    (move,) = moved.values()
+    assert overlaps(move.fromBox, box) and move.toContainer == "B"
+    assert stored[move.itemId].priority < target.priority
+
+
+def test_layouts_are_left_alone():
+    containers, stored = station()
+    target = PackItem("high", 10, 10, 5, priority=90, preferredZone="A")
+    plan_placements([target], containers)
+    before = [(sorted(c.planned.boxes()), sorted(c.occupancy.boxes())) for c in containers]
+    plan_rearrangements([target], containers, stored, {"high": "B"})
+    assert [(sorted(c.planned.boxes()), sorted(c.occupancy.boxes())) for c in containers] == before
+
+
+def test_higher_priority_items_stay_put():
+    containers, stored = station()
+    target = PackItem("mid", 10, 10, 5, priority=1, preferredZone="A")
+    plan = plan_rearrangements([target], containers, stored, {})
+    assert plan.moves == [] and plan.placements == {}
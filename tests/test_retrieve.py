@@ -0,0 +1,51 @@
+from mission_log import USAGE
+
+
+def usage_events(m, item_id):
+    with m.SessionLocal() as db:
+        return db.query(m.SimulationEvent).filter(m.SimulationEvent.event_type == USAGE,
+                                                  m.SimulationEvent.item_id == item_id).count()
+
+
+def add_item(client, item_id, usage_limit):
+    assert client.post("/api/items", json=[{
+        "itemId": item_id, "name": "Battery", "width": 5, "depth": 5, "height": 5, "mass": 1, "priority": 10,
+        "usageLimit": usage_limit, "preferredZone": "A"
+    }]).json()["success"]
+
+
+def retrieve(client, item_id):
+    return client.post("/api/retrieve", json={"itemId": item_id, "userId": "u", "timestamp": "2025-01-01T00:00:00"})
+
+
+def test_retrieval_counts_each_use_once(client, app_module):
+    add_item(client, "ret-1", 2)
+    for _ in range(3):
+        assert retrieve(client, "ret-1").json()["success"]
+    assert usage_events(app_module, "ret-1") == 2
+    with app_module.SessionLocal() as db:
+        item = db.query(app_module.Item).filter_by(itemId="ret-1").one()
+        assert (item.usageLimit, item.is_waste) == (0, True)
+
+
+def test_stale_cached_limit_does_not_count_a_use(client, app_module, monkeypatch):
+    add_item(client, "ret-2", 1)
+    with app_module.SessionLocal() as db:
+        stale = app_module.get_item_record(db, "ret-2")
+    assert retrieve(client, "ret-2").json()["success"]
+    retrieved = []
+    monkeypatch.setattr(app_module, "item_retrieved", lambda item_id, used_up: retrieved.append(used_up))
+
+    async def cached(db, item_id):
+        return stale
+
+    monkeypatch.setattr(app_module, "get_item_record_async", cached)
+    assert retrieve(client, "ret-2").json()["success"]
+    assert usage_events(app_module, "ret-2") == 1
+    assert retrieved == [False]
+
+
+def test_unlimited_items_are_never_used_up(client, app_module):
+    add_item(client, "ret-3", None)
+    assert retrieve(client, "ret-3").json()["success"]
+    assert usage_events(app_module, "ret-3") == 0
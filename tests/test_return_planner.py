@@ -0,0 +1,55 @@
+import itertools
+import random
+
+import pytest
+
+from return_planner import WasteCandidate, candidate_values, solve_return_plan
+
+
+def random_candidates(rng, n):
+    return [WasteCandidate(f"w{i}", rng.randint(1, 50), round(rng.uniform(0.5, 20), 1), rng.randint(0, 4))
+            for i in range(n)]
+
+
+def brute_force(candidates, max_volume, max_weight, objective):
+    values = candidate_values(candidates, objective)
+    best = 0.0
+    for r in range(1, len(candidates) + 1):
+        for subset in itertools.combinations(range(len(candidates)), r):
+            if (sum(candidates[i].volume for i in subset) <= max_volume and
+                    sum(candidates[i].mass for i in subset) <= max_weight):
+                best = max(best, sum(values[i] for i in subset))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("objective", ["volume", "mass"])
+def test_plan_matches_brute_force(seed, objective):
+    rng = random.Random(seed)
+    candidates = random_candidates(rng, 11)
+    max_volume = rng.randint(40, 200)
+    max_weight = rng.choice([None, rng.uniform(10, 60)])
+    result = solve_return_plan(candidates, max_volume, max_weight, objective=objective, time_budget=10)
+
+    assert result.optimal
+    assert sum(c.volume for c in result.selected) <= max_volume
+    if max_weight is not None:
+        assert sum(c.mass for c in result.selected) <= max_weight
+    values = dict(zip((c.itemId for c in candidates), candidate_values(candidates, objective)))
+    assert result.value == pytest.approx(sum(values[c.itemId] for c in result.selected))
+    expected = brute_force(candidates, max_volume, float("inf") if max_weight is None else max_weight, objective)
+    assert result.value == pytest.approx(expected)
+
+
+def test_out_of_time_still_returns_a_feasible_plan():
+    candidates = random_candidates(random.Random(1), 200)
+    result = solve_return_plan(candidates, 1500, 400, time_budget=0)
+    assert not result.optimal
+    assert result.selected
+    assert sum(c.volume for c in result.selected) <= 1500
+    assert sum(c.mass for c in result.selected) <= 400
+
+
+def test_nothing_fits():
+    result = solve_return_plan([WasteCandidate("big", 100, 1.0)], max_volume=50)
+    assert result.selected == [] and result.value == 0
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from scenarios import fork_station, run_scenarios
+
+START = date(2025, 6, 1)
+
+
+@pytest.fixture
+def station():
+    items = [(f"i{k}", f"Item {k % 7}", 5, 5, 5, 1.5, START + timedelta(days=k % 40) if k % 3 else None,
+              k % 6 or None, k % 17 == 0) for k in range(60)]
+    containers = [("c0", "A", 50, 50, 50), ("c1", "B", 20, 20, 20), ("dock", "X", 30, 30, 30)]
+    # Two columns of three along the depth axis, so the back items have blockers
+    placements = [(f"i{k}", "c0", (5 * (k % 2), 5 * (k // 2), 0, 5 * (k % 2) + 5, 5 * (k // 2) + 5, 5))
+                  for k in range(6)]
+    fork, shared = fork_station(START, items, containers, placements)
+    yield fork, shared
+    shared.close()
+
+
+SPECS = [
+    {"name": "idle", "numOfDays": 0},
+    {"name": "month", "numOfDays": 30, "itemsToBeUsedPerDay": [{"itemId": "i4"}, {"name": "Item 2"}]},
+    {"name": "resupply", "numOfDays": 5, "placementStrategy": "fullest",
+     "resupply": [{"itemId": f"r{k}", "width": 30, "depth": 30, "height": 30, "priority": 50, "preferredZone": "B"}
+                  for k in range(4)]},
+    {"name": "undock", "numOfDays": 40, "undocking": {"undockingContainerId": "dock", "maxWeight": 20.0}},
+]
+
+
+def without_timing(results):
+    return [{k: v for k, v in r.items() if k != "elapsedMs"} for r in results]
+
+
+def test_worker_processes_match_a_single_process(station):
+    fork, shared = station
+    in_process = run_scenarios(fork, shared, SPECS, max_workers=1)
+    pooled = run_scenarios(fork, shared, SPECS, max_workers=2)
+    assert without_timing(pooled) == without_timing(in_process)
+
+
+def test_scenario_metrics(station):
+    fork, shared = station
+    idle, month, resupply, undock = run_scenarios(fork, shared, SPECS, max_workers=1)
+    assert idle["usesConsumed"] == 0 and idle["wasteCount"] == int(shared.arrays["waste"].sum())
+    # i4 has 4 uses left, so it runs out; the first item named "Item 2" is i2 with 2 uses
+    assert month["usesConsumed"] == 6 and month["itemsDepleted"] == 2
+    # i4 sits behind i2 and i0: each use moves both out and back
+    assert month["retrievalSteps"] == 4 * 5 + 2 * 3
+    # One 30-cube fits in c0 and one in the dock; none in c1
+    assert resupply["resupplyPlaced"] == 2 and resupply["resupplyUnplaced"] == 2
+    assert resupply["utilisation"] == pytest.approx(resupply["utilisationBefore"] + 2 * 27000 / 160000, abs=1e-4)
+    assert undock["returnItems"] == 13 and undock["returnMass"] == 19.5  # 1.5 each, under 20
+
+
+def test_the_fork_is_read_only(station):
+    _, shared = station
+    with pytest.raises(ValueError):
+        shared.arrays["remaining"][0] = 0
+    assert isinstance(shared.arrays["boxes"], np.ndarray)
@@ -0,0 +1,44 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from simulation import NEVER, NO_LIMIT, date_ordinals, simulate_days, usage_array
+
+
+def day_by_day(expiry, limit, per_day, start, num_days):
+    """Reference: walk the window one day at a time for one item."""
+    expired = depleted = NEVER
+    uses = 0
+    remaining = limit
+    for day in range(1, num_days + 1):
+        today = start + timedelta(days=day)
+        if expiry is not None and today > expiry:
+            if today - timedelta(days=1) <= expiry:
+                expired = day
+            continue
+        use = per_day if remaining is None else min(per_day, remaining)
+        uses += use
+        if remaining is not None:
+            remaining -= use
+            if use and remaining == 0:
+                depleted = day
+    return expired, depleted, uses, NO_LIMIT if remaining is None else remaining
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_window_matches_day_by_day_loop(seed):
+    rng = random.Random(seed)
+    start = date(2025, 3, 1)
+    num_days = rng.randint(1, 40)
+    expiries = [rng.choice([None, start + timedelta(days=rng.randint(-5, 50))]) for _ in range(300)]
+    limits = [rng.choice([None, rng.randint(0, 30)]) for _ in range(300)]
+    per_day = [rng.choice([0, 1, 1, 2, 3]) for _ in range(300)]
+
+    result = simulate_days(date_ordinals(expiries), usage_array(limits), np.array(per_day, dtype=np.int64),
+                           start, num_days)
+    for i in range(300):
+        expected = day_by_day(expiries[i], limits[i], per_day[i], start, num_days)
+        actual = (result.expired_day[i], result.depleted_day[i], result.uses[i], result.remaining[i])
+        assert actual == expected, (expiries[i], limits[i], per_day[i])
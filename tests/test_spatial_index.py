@@ -0,0 +1,108 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from placement import PackContainer, PackItem, plan_placements
+from spatial_index import ContainerOccupancy, OccupancyIndex, volume
+from zone_index import ZoneIndex
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_readers_see_consistent_trees_while_writers_run(fast_switching):
+    index = OccupancyIndex(lambda container_id: ((60, 60, 60), []))
+    zones = ZoneIndex(lambda: [("c", "A", 60, 60, 60)], index)
+    occ = index.get("c")
+    stop = threading.Event()
+    errors = []
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            key = f"k{rng.randrange(200)}"
+            if rng.random() < 0.5:
+                w, d, h = (rng.randrange(55) for _ in range(3))
+                index.place("c", key, (w, d, h, w + rng.randint(1, 5), d + rng.randint(1, 5), h + rng.randint(1, 5)))
+            else:
+                index.remove(key)
+
+    def reader():
+        try:
+            for _ in range(40):
+                occ.fit_bound()
+                zones.fit("c", {"k1", "k2"})
+                plan_placements([PackItem(f"n{i}", 3, 3, 3) for i in range(10)],
+                                [PackContainer("c", "A", 60, 60, 60, occ, {"k3"})])
+                occ.removal_order(f"k{i}" for i in range(200))
+        except Exception as e:
+            errors.append(e)
+
+    writers = [threading.Thread(target=writer, args=(seed,)) for seed in range(3)]
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in writers + readers:
+        thread.start()
+    for thread in readers:
+        thread.join()
+    stop.set()
+    for thread in writers:
+        thread.join()
+    assert errors == []
+
+
+def brute_force_largest(occupied, dims, point):
+    """Largest empty box volume at `point` by checking every size against a unit grid."""
+    pw, pd, ph = point
+    if occupied[pw][pd][ph]:
+        return 0
+    best = 0
+    for w in range(1, dims[0] - pw + 1):
+        for d in range(1, dims[1] - pd + 1):
+            for h in range(1, dims[2] - ph + 1):
+                if all(not occupied[x][y][z] for x in range(pw, pw + w) for y in range(pd, pd + d)
+                       for z in range(ph, ph + h)):
+                    best = max(best, w * d * h)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_largest_free_box_matches_brute_force(seed):
+    rng = random.Random(seed)
+    dims = (6, 5, 4)
+    occ = ContainerOccupancy(*dims)
+    occupied = [[[False] * dims[2] for _ in range(dims[1])] for _ in range(dims[0])]
+    for k in range(12):
+        w, d, h = (rng.randrange(n) for n in dims)
+        box = (w, d, h, min(w + rng.randint(1, 3), dims[0]), min(d + rng.randint(1, 3), dims[1]),
+               min(h + rng.randint(1, 2), dims[2]))
+        if not occ.collides(box):
+            occ.place(f"k{k}", box)
+            for x in range(box[0], box[3]):
+                for y in range(box[1], box[4]):
+                    for z in range(box[2], box[5]):
+                        occupied[x][y][z] = True
+
+    for point in ((w, d, h) for w in range(dims[0]) for d in range(dims[1]) for h in range(dims[2])):
+        expected = brute_force_largest(occupied, dims, point)
+        box = occ.largest_free_box(point)
+        if expected == 0:
+            assert box is None
+            continue
+        assert box[:3] == point and occ.in_bounds(box)
+        assert not occ.collides(box)
+        assert volume(box) == expected
+
+
+def test_largest_free_box_ignores_items():
+    occ = ContainerOccupancy(10, 10, 10)
+    occ.place("a", (0, 5, 0, 10, 10, 10))
+    assert occ.largest_free_box((0, 0, 0)) == (0, 0, 0, 10, 5, 10)
+    assert occ.largest_free_box((0, 0, 0), ignore={"a"}) == (0, 0, 0, 10, 10, 10)
+    assert occ.largest_free_box((0, 6, 0)) is None
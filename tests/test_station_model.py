@@ -0,0 +1,81 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from station_model import StationModel
+
+
+class FakeTable:
+    """Items by itemId, served in the loader's row format."""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_pk = 1
+        self.fail = False
+
+    def put(self, rng, item_id, container_id=None):
+        pk = self.rows[item_id][0] if item_id in self.rows else self.next_pk
+        self.next_pk += item_id not in self.rows
+        box = (rng.randrange(10), 0, 0, 20, 5, 5) if container_id else (None,) * 6
+        self.rows[item_id] = (pk, item_id, rng.choice(["Bolt", "Tank", None]), rng.randint(1, 9),
+                              rng.randint(1, 9), rng.randint(1, 9), rng.uniform(0, 5), rng.randint(0, 100),
+                              rng.choice([None, date(2025, 1, 1) + timedelta(days=rng.randrange(90))]),
+                              rng.choice([None, rng.randrange(5)]), rng.choice(["A", "B"]),
+                              rng.random() < 0.2, container_id, *box)
+
+    def load(self, item_ids=None):
+        if self.fail:
+            raise RuntimeError("database down")
+        wanted = self.rows if item_ids is None else [i for i in item_ids if i in self.rows]
+        return [self.rows[i] for i in wanted]
+
+
+def snapshot(model):
+    with model.read() as view:
+        rows = view.live(np.ones(len(view.pk), dtype=bool))
+        return [(d, view.container_of(row), view.position_of(row), bool(view.waste[row]))
+                for d, row in zip(view.item_dicts(rows), rows.tolist())]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_invalidated_rows_match_a_fresh_load(seed):
+    rng = random.Random(seed)
+    table = FakeTable()
+    for k in range(1100):  # past the initial capacity
+        table.put(rng, f"i{k}", rng.choice([None, "c1", "c2"]))
+    model = StationModel(table.load)
+    assert len(model) == 1100
+
+    for _ in range(20):
+        changed = set()
+        for _ in range(rng.randint(1, 60)):
+            item_id = f"i{rng.randrange(1300)}"
+            if rng.random() < 0.3:
+                table.rows.pop(item_id, None)
+            else:
+                table.put(rng, item_id, rng.choice([None, "c1", "c2", "c3"]))
+            changed.add(item_id)
+        model.invalidate(changed)
+        if rng.random() < 0.2:
+            for item_id, row in table.rows.items():
+                if row[12] == "c1":
+                    table.rows[item_id] = row[:12] + (None,) * 7
+            model.invalidate_container("c1")
+        assert snapshot(model) == snapshot(StationModel(table.load))
+
+
+def test_a_failed_load_is_retried():
+    rng = random.Random(0)
+    table = FakeTable()
+    table.put(rng, "a")
+    model = StationModel(table.load)
+    assert len(model) == 1
+    table.put(rng, "b")
+    model.invalidate(["b"])
+    table.fail = True
+    with pytest.raises(RuntimeError):
+        len(model)
+    table.fail = False
+    assert len(model) == 2
@@ -0,0 +1,46 @@
+from mission_log import UNDOCKED
+
+
+def setup_station(client):
+    client.post("/api/containers", json=[
+        {"containerId": "undock-c", "zone": "U", "width": 10, "depth": 10, "height": 10},
+        {"containerId": "undock-s", "zone": "U", "width": 10, "depth": 10, "height": 10},
+    ])
+    client.post("/api/items", json=[
+        {"itemId": f"undock-{k}", "name": "Spent Filter", "width": 5, "depth": 5, "height": 5, "mass": 1,
+         "priority": 1, "preferredZone": "U"} for k in range(4)
+    ])
+    for k, container_id in enumerate(["undock-c", "undock-c", "undock-s", "undock-s"]):
+        assert client.post("/api/place", json={
+            "itemId": f"undock-{k}", "userId": "u", "timestamp": "2025-01-01T00:00:00", "containerId": container_id,
+            "position": {"startCoordinates": {"width": 5 * (k % 2), "depth": 0, "height": 0},
+                         "endCoordinates": {"width": 5 * (k % 2) + 5, "depth": 5, "height": 5}}
+        }).json()["success"]
+
+
+def test_undocking_removes_the_container_contents_and_listed_items(client, app_module):
+    m = app_module
+    setup_station(client)
+    undock = {"undockingContainerId": "undock-c", "timestamp": "2025-01-05T00:00:00", "itemIds": ["undock-2"]}
+    assert client.post("/api/waste/complete-undocking", json=undock).json()["success"]
+
+    gone = ["undock-0", "undock-1", "undock-2"]
+    for item_id in gone:
+        assert client.get(f"/api/items/{item_id}").status_code == 404
+    assert client.get("/api/items/undock-3").status_code == 200
+    found = [r["itemId"] for r in client.get("/api/search/items", params={"q": "spent filter"}).json()["results"]]
+    assert found == ["undock-3"]
+    assert m.occupancy.get("undock-s").boxes() == [("undock-3", (5, 0, 0, 10, 5, 5))]
+    with m.SessionLocal() as db:
+        assert db.query(m.ItemPlacement).filter(m.ItemPlacement.item_id.notin_(db.query(m.Item.id))).count() == 0
+        logged = db.query(m.SimulationEvent.item_id).filter(m.SimulationEvent.event_type == UNDOCKED,
+                                                            m.SimulationEvent.item_id.in_(gone)).all()
+        assert sorted(i for (i,) in logged) == gone
+
+    assert client.post("/api/waste/complete-undocking", json=undock).status_code == 409
+    placed = client.post("/api/place", json={
+        "itemId": "undock-3", "userId": "u", "timestamp": "2025-01-05T00:00:00", "containerId": "undock-c",
+        "position": {"startCoordinates": {"width": 0, "depth": 0, "height": 0},
+                     "endCoordinates": {"width": 5, "depth": 5, "height": 5}}
+    })
+    assert placed.status_code == 409
@@ -0,0 +1,47 @@
+def item(item_id, height, usage_limit):
+    return {"itemId": item_id, "name": "Crate", "width": 10, "depth": 10, "height": height, "mass": 1,
+            "priority": 10, "usageLimit": usage_limit, "preferredZone": "W"}
+
+
+def place(client, item_id, container_id, start, end):
+    response = client.post("/api/place", json={
+        "itemId": item_id, "userId": "u", "timestamp": "2025-01-01T00:00:00", "containerId": container_id,
+        "position": {"startCoordinates": dict(zip(("width", "depth", "height"), start)),
+                     "endCoordinates": dict(zip(("width", "depth", "height"), end))}
+    })
+    assert response.json()["success"]
+
+
+def test_return_plan_fits_the_room_left_in_the_undocking_container(client):
+    client.post("/api/containers", json=[
+        {"containerId": "waste-undock", "zone": "W", "width": 10, "depth": 10, "height": 10},
+        {"containerId": "waste-store", "zone": "W", "width": 10, "depth": 10, "height": 10},
+    ])
+    client.post("/api/items", json=[item("waste-keep", 8, 5), item("waste-a", 2, 0), item("waste-b", 2, 0)])
+    place(client, "waste-keep", "waste-undock", (0, 0, 0), (10, 10, 8))
+    place(client, "waste-a", "waste-store", (0, 0, 0), (10, 10, 2))
+    place(client, "waste-b", "waste-store", (0, 0, 2), (10, 10, 4))
+
+    plan = client.post("/api/waste/return-plan", json={
+        "undockingContainerId": "waste-undock", "undockingDate": "2025-01-02", "maxWeight": 100
+    }).json()
+    assert plan["returnManifest"]["totalVolume"] == 200
+    assert len(plan["returnPlan"]) == 1
+
+
+def test_expired_and_used_up_items_are_identified_as_waste(client, app_module):
+    client.post("/api/items", json=[
+        {**item("waste-old", 1, 5), "expiryDate": "2000-01-01"},
+        item("waste-last", 1, 1),
+        item("waste-fresh", 1, 1),
+    ])
+    assert client.post("/api/retrieve", json={"itemId": "waste-last", "userId": "u",
+                                              "timestamp": "2025-01-01T00:00:00"}).json()["success"]
+
+    waste = {w["itemId"]: w["reason"] for w in client.get("/api/waste/identify").json()["wasteItems"]}
+    assert waste["waste-old"] == "Expired" and waste["waste-last"] == "Out of Uses"
+    assert "waste-fresh" not in waste
+    with app_module.SessionLocal() as db:
+        flags = dict(db.query(app_module.Item.itemId, app_module.Item.is_waste)
+                     .filter(app_module.Item.itemId.in_(["waste-old", "waste-last", "waste-fresh"])))
+    assert flags == {"waste-old": True, "waste-last": True, "waste-fresh": False}
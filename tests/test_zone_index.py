@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from placement import PackContainer, PackItem, plan_placements
+from spatial_index import OccupancyIndex, fits_within
+from zone_index import ZoneIndex
+
+CONTAINERS = [("a1", "A", 10, 10, 10), ("a2", "A", 10, 10, 10), ("a3", "A", 6, 6, 6), ("b1", "B", 8, 8, 8)]
+
+
+def make_index():
+    def load(container_id):
+        dims = {c[0]: c[2:] for c in CONTAINERS}
+        return (dims[container_id], []) if container_id in dims else None
+
+    occupancy = OccupancyIndex(load)
+    return occupancy, ZoneIndex(lambda: CONTAINERS, occupancy)
+
+
+def fill(occupancy, rng, container_id, count):
+    occ = occupancy.get(container_id)
+    for k in range(count):
+        w, d, h = (rng.randrange(n) for n in (occ.width, occ.depth, occ.height))
+        box = (w, d, h, min(w + rng.randint(1, 4), occ.width), min(d + rng.randint(1, 4), occ.depth),
+               min(h + rng.randint(1, 4), occ.height))
+        if not occ.collides(box):
+            occupancy.place(container_id, f"{container_id}-{k}", box)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fit_bound_admits_everything_the_engine_can_place(seed):
+    rng = random.Random(seed)
+    occupancy, zones = make_index()
+    fill(occupancy, rng, "a1", 25)
+    occ = occupancy.get("a1")
+    bound = zones.fit("a1")
+    for w in range(1, 11):
+        for d in range(1, 11):
+            for h in range(1, 11):
+                placed, _ = plan_placements([PackItem("x", w, d, h)], [PackContainer("a1", "A", 10, 10, 10, occ)])
+                if placed:
+                    assert fits_within(tuple(sorted((w, d, h))), bound)
+
+
+def test_candidates_follow_free_space_through_changes():
+    rng = random.Random(0)
+    occupancy, zones = make_index()
+    found = [e.containerId for e in zones.candidates(1, (1, 1, 1), "A")]
+    assert sorted(found[:2]) == ["a1", "a2"] and found[2] == "a3"
+    found = [e.containerId for e in zones.candidates(300, (1, 1, 1))]  # every zone; a3 is too small
+    assert sorted(found[:2]) == ["a1", "a2"] and found[2] == "b1"
+
+    fill(occupancy, rng, "a1", 30)
+    occupancy.place("a2", "big", (0, 0, 0, 10, 10, 7))
+    for volume in (1, 100, 216, 400):
+        found = [e.containerId for e in zones.candidates(volume, (1, 1, 1), "A")]
+        assert set(found) == {c[0] for c in CONTAINERS[:3] if occupancy.get(c[0]).free_volume >= volume}
+        assert [zones.get(c).free_volume for c in found] == sorted((zones.get(c).free_volume for c in found),
+                                                                   reverse=True)
+
+    # a2 has a 10x10x3 slab left: a 4-high item is ruled out, and comes back once the slab is emptied
+    assert "a2" not in [e.containerId for e in zones.candidates(64, (4, 4, 4), "A")]
+    occupancy.remove("big")
+    assert "a2" in [e.containerId for e in zones.candidates(64, (4, 4, 4), "A")]
+    assert "a2" in [e.containerId for e in zones.candidates(10 ** 6, (4, 4, 4), "A", include={"a2"})]
+
+
+def test_clear_reloads_the_container_list():
+    occupancy, zones = make_index()
+    assert zones.zones() == {"A", "B"}
+    CONTAINERS.append(("c1", "C", 5, 5, 5))
+    try:
+        assert zones.zones() == {"A", "B"}
+        zones.clear()
+        assert zones.zones() == {"A", "B", "C"}
+    finally:
+        CONTAINERS.pop()
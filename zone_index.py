@@ -0,0 +1,153 @@
+"""
+In-memory index of the station's containers by zone, for placement.
+
+Every zone keeps its containers sorted by remaining free volume, and each
+container carries an upper bound on the size of item that can still fit (see
+ContainerOccupancy.fit_bound). A placement batch can then rule out full
+containers by bisection and cheap comparisons, without loading their
+occupancy or searching their geometry.
+
+Free volumes come from the occupancy index: the zone index listens to its
+changes and re-sorts the containers that changed on the next query. Adding,
+removing or undocking containers calls `clear`, which reloads the list.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import bisect
+import threading
+
+from spatial_index import OccupancyIndex, fits_within
+
+
+@dataclass
+class ZoneEntry:
+    containerId: str
+    zone: str
+    width: int
+    depth: int
+    height: int
+    free_volume: int
+    fit: Optional[Tuple[int, int, int]] = None  # None until needed after a change
+
+
+class ZoneIndex:
+    """
+    `loader()` returns (containerId, zone, width, depth, height) for every
+    container that can take items.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[tuple]], occupancy: OccupancyIndex):
+        self.loader = loader
+        self.occupancy = occupancy
+        self._entries: Dict[str, ZoneEntry] = {}
+        self._zones: Dict[str, List[Tuple[int, str]]] = {}  # zone -> [(free volume, containerId)], ascending
+        self._stale: Set[str] = set()
+        # Bumped by every clear; the load that saw the current value is still good
+        self._generation = 0
+        self._loaded: Optional[int] = None
+        self._lock = threading.RLock()
+        occupancy.listeners.append(self._changed)
+
+    def _changed(self, container_id: Optional[str]):
+        # Called under the occupancy lock: only note the change here
+        if container_id is None:
+            self._generation += 1
+        else:
+            self._stale.add(container_id)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+
+    def _ensure(self):
+        if self._loaded != self._generation:
+            generation = self._generation
+            self._stale.clear()
+            entries, zones = {}, {}
+            rows = list(self.loader())
+            occupancies = self.occupancy.get_many(row[0] for row in rows)
+            for container_id, zone, width, depth, height in rows:
+                occ = occupancies.get(container_id)
+                if occ is None:
+                    continue
+                entry = entries[container_id] = ZoneEntry(container_id, zone, width, depth, height, occ.free_volume)
+                zones.setdefault(zone, []).append((entry.free_volume, container_id))
+            for ordered in zones.values():
+                ordered.sort()
+            # Only a complete load counts, and a clear() meanwhile forces another one
+            self._entries, self._zones, self._loaded = entries, zones, generation
+        while self._stale:
+            self._refresh(self._stale.pop())
+
+    def _refresh(self, container_id: str):
+        entry = self._entries.get(container_id)
+        if entry is None:
+            return
+        ordered = self._zones[entry.zone]
+        del ordered[bisect.bisect_left(ordered, (entry.free_volume, container_id))]
+        occ = self.occupancy.get(container_id)
+        if occ is None:  # deleted
+            del self._entries[container_id]
+            return
+        entry.free_volume = occ.free_volume
+        entry.fit = None
+        bisect.insort(ordered, (entry.free_volume, container_id))
+
+    def _fit(self, entry: ZoneEntry) -> Tuple[int, int, int]:
+        if entry.fit is None:
+            occ = self.occupancy.get(entry.containerId)
+            if occ is None:  # deleted since the last refresh
+                return (0, 0, 0)
+            entry.fit = occ.fit_bound()
+        return entry.fit
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure()
+            return len(self._entries)
+
+    def get(self, container_id: str) -> Optional[ZoneEntry]:
+        with self._lock:
+            self._ensure()
+            return self._entries.get(container_id)
+
+    def zones(self) -> Set[str]:
+        with self._lock:
+            self._ensure()
+            return {zone for zone, ordered in self._zones.items() if ordered}
+
+    def candidates(self, volume: int, dims: Tuple[int, int, int], zone: Optional[str] = None,
+                   include: Iterable[str] = ()) -> List[ZoneEntry]:
+        """
+        Containers (of `zone`, or of every zone) with at least `volume` free
+        and a free-box bound admitting sorted `dims`, plus those in `include`
+        whatever their free space, emptiest first.
+        """
+        include = set(include)
+        with self._lock:
+            self._ensure()
+            groups = [self._zones.get(zone, [])] if zone is not None else self._zones.values()
+            found = []
+            for ordered in groups:
+                low = bisect.bisect_left(ordered, (volume, ""))
+                for i in range(len(ordered) - 1, -1 if include else low - 1, -1):
+                    entry = self._entries[ordered[i][1]]
+                    if entry.containerId in include or (i >= low and fits_within(dims, self._fit(entry))):
+                        found.append(entry)
+            found.sort(key=lambda e: -e.free_volume)
+            return found
+
+    def fit(self, container_id: str, ignore: Iterable = ()) -> Optional[Tuple[int, int, int]]:
+        """
+        Free-box bound of a container with the `ignore`d items taken out
+        (cached when none of them are in it), or None if it is not stored.
+        """
+        with self._lock:
+            occ = self.occupancy.get(container_id)
+            if occ is None:
+                return None
+            if any(key in occ for key in ignore):
+                return occ.fit_bound(ignore)
+            self._ensure()
+            entry = self._entries.get(container_id)
+            return self._fit(entry) if entry is not None else occ.fit_bound()